@@ -0,0 +1,164 @@
+# backend/bench/load.py
+"""Simulated players speaking the game's Socket.IO protocol.
+
+    python backend/bench/load.py --url http://127.0.0.1:5055 --clients 500 --first 0
+
+run.py starts one of these per --processes; each prints its Stats as
+JSON. eventlet.monkey_patch() turns each client's socket and reader
+threads into greenthreads, so thousands of clients fit in one process.
+"""
+import eventlet
+eventlet.monkey_patch()
+
+import argparse
+import json
+import random
+import time
+
+import socketio
+
+WORLD_COLS = WORLD_ROWS = 100
+DIRECTIONS = {'up': (0, -1), 'down': (0, 1), 'left': (-1, 0), 'right': (1, 0)}
+
+
+class Stats:
+    """What all clients of one run saw, on the client's clock."""
+
+    def __init__(self):
+        self.connected = 0
+        self.connect_errors = 0
+        self.moves_sent = 0
+        self.received = {}
+        # (username, x, y) -> when that move was sent; shared by every client
+        self.pending_moves = {}
+        # seconds from a move being sent to another client seeing it in a tick
+        self.delivery = []
+        self.join_latency = []
+
+    def got(self, event):
+        self.received[event] = self.received.get(event, 0) + 1
+
+    def to_dict(self):
+        return {
+            'connected': self.connected,
+            'connect_errors': self.connect_errors,
+            'moves_sent': self.moves_sent,
+            'received': self.received,
+            'delivery': self.delivery,
+            'join_latency': self.join_latency,
+        }
+
+
+class SimClient:
+    """One player: joins, then takes a random step every 1/move_rate seconds."""
+
+    def __init__(self, url, username, stats, move_rate, view):
+        self.url = url
+        self.username = username
+        self.stats = stats
+        self.move_rate = move_rate
+        self.view = view
+        self.position = None
+        self.joined = eventlet.event.Event()
+        self.sio = socketio.Client(reconnection=False)
+        self._joined_at = None
+
+        for event in ('grid_snapshot', 'chunk_state', 'game_state', 'scores',
+                      'player_joined', 'player_left'):
+            self.sio.on(event, self._counter(event))
+        self.sio.on('player_data', self._on_player_data)
+        self.sio.on('tick', self._on_tick)
+
+    def _counter(self, event):
+        def handler(*args):
+            self.stats.got(event)
+        return handler
+
+    def _on_player_data(self, data):
+        self.stats.got('player_data')
+        if data.get('username') == self.username and self.position is None:
+            self.position = dict(data['position'])
+            self.stats.join_latency.append(time.perf_counter() - self._joined_at)
+            self.joined.send(True)
+
+    def _on_tick(self, data):
+        self.stats.got('tick')
+        now = time.perf_counter()
+        for move in data.get('moves', ()):
+            if move['username'] == self.username:
+                continue
+            pos = move['position']
+            sent = self.stats.pending_moves.get((move['username'], pos['x'], pos['y']))
+            if sent is not None:
+                self.stats.delivery.append(now - sent)
+
+    def run(self, until):
+        try:
+            self.sio.connect(self.url, transports=['websocket'])
+        except Exception:
+            self.stats.connect_errors += 1
+            return
+        self.stats.connected += 1
+        self._joined_at = time.perf_counter()
+        self.sio.emit('join_game', {'username': self.username, 'room': 'main',
+                                    'binary': True, 'aoi': True, 'view': self.view})
+        if not self.joined.wait(30):
+            self.stats.connect_errors += 1
+            self.sio.disconnect()
+            return
+
+        interval = 1.0 / self.move_rate
+        # spread clients over the interval instead of moving in lockstep
+        eventlet.sleep(random.random() * interval)
+        while time.perf_counter() < until:
+            self.step()
+            eventlet.sleep(interval)
+        self.sio.disconnect()
+
+    def step(self):
+        # the server clamps too, but a step into the wall would never show up in a tick
+        options = [(d, dx, dy) for d, (dx, dy) in DIRECTIONS.items()
+                   if 0 <= self.position['x'] + dx < WORLD_COLS and 0 <= self.position['y'] + dy < WORLD_ROWS]
+        direction, dx, dy = random.choice(options)
+        x, y = self.position['x'] + dx, self.position['y'] + dy
+        self.position = {'x': x, 'y': y}
+        self.stats.pending_moves[(self.username, x, y)] = time.perf_counter()
+        self.sio.emit('move', {'dir': direction})
+        self.stats.moves_sent += 1
+
+
+def run_load(url, clients, move_rate, duration, ramp, first=0, view=None, prefix='bench'):
+    """Connect `clients` players over `ramp` seconds and let them move for `duration`.
+
+    Players are named prefix<first>, prefix<first + 1>, ...; returns the
+    Stats once every client has disconnected.
+    """
+    stats = Stats()
+    view = view or {'cols': 25, 'rows': 25}
+    until = time.perf_counter() + ramp + duration
+    pool = eventlet.GreenPool(clients)
+    for i in range(first, first + clients):
+        client = SimClient(url, f"{prefix}{i}", stats, move_rate, view)
+        pool.spawn_n(client.run, until)
+        if ramp:
+            eventlet.sleep(ramp / clients)
+    pool.waitall()
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--url', required=True)
+    parser.add_argument('--clients', type=int, required=True)
+    parser.add_argument('--first', type=int, default=0, help='number of the first player')
+    parser.add_argument('--move-rate', type=float, default=2.0)
+    parser.add_argument('--duration', type=float, default=30)
+    parser.add_argument('--ramp', type=float, default=10)
+    args = parser.parse_args()
+
+    stats = run_load(args.url, args.clients, args.move_rate, args.duration, args.ramp, args.first)
+    print(json.dumps(stats.to_dict()))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,263 @@
+# backend/bench/run.py
+"""Load-test the game server and compare against a saved baseline.
+
+    python backend/bench/run.py --clients 1000 --move-rate 2 --duration 30
+    python backend/bench/run.py --save-baseline default      # after a known-good run
+    python backend/bench/run.py --compare default            # exit 1 on a regression
+
+Starts bench/server.py (the real app on mongomock) in a subprocess,
+drives it with simulated clients from load.py processes and reports
+server-side handler latency (from /api/metrics), move->tick delivery
+latency, messages per second and the server's RSS over time.
+
+Python clients are not cheap: if the clients receive noticeably less
+than the server sends, the load generator is the bottleneck, so use
+more --processes (or another machine) before trusting the numbers.
+"""
+import argparse
+import json
+import math
+import os
+import re
+import subprocess
+import sys
+import threading
+import time
+
+import requests
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+BASELINES = os.path.join(HERE, 'baselines')
+
+# compared by --compare: (result path, higher is worse)
+CHECKS = [
+    (('server_latency_ms', 'move', 'p95'), True),
+    (('server_latency_ms', 'join_game', 'p95'), True),
+    (('delivery_latency_ms', 'p95'), True),
+    (('messages_per_second', 'received'), False),
+    (('rss_mb', 'max'), True),
+]
+
+_SAMPLE = re.compile(r'^(\w+)(?:\{(.*)\})? (\S+)$')
+
+
+def parse_metrics(text):
+    """{(name, ((label, value), ...)): float} from the Prometheus text format."""
+    samples = {}
+    for line in text.splitlines():
+        match = _SAMPLE.match(line)
+        if not match:
+            continue
+        name, labels, value = match.groups()
+        pairs = tuple(tuple(p.split('=', 1)) for p in labels.split(',')) if labels else ()
+        samples[(name, tuple((k, v.strip('"')) for k, v in pairs))] = float(value)
+    return samples
+
+
+def histogram_quantile(samples, before, name, event, q):
+    """Estimate a quantile of `name`{event} from bucket counts gathered during the run."""
+    buckets = []
+    for key, count in samples.items():
+        metric, labels = key[0], dict(key[1])
+        if metric == f'{name}_bucket' and labels.get('event') == event:
+            bound = math.inf if labels['le'] == '+Inf' else float(labels['le'])
+            buckets.append((bound, count - before.get(key, 0)))
+    buckets.sort()
+    if not buckets or buckets[-1][1] == 0:
+        return None
+    rank = q * buckets[-1][1]
+    lower, seen = 0.0, 0
+    for bound, cumulative in buckets:
+        if cumulative >= rank:
+            if bound == math.inf:
+                return lower
+            # linear within the bucket, as Prometheus does
+            return lower + (bound - lower) * (rank - seen) / max(cumulative - seen, 1)
+        lower, seen = bound, cumulative
+    return lower
+
+
+def percentiles(values):
+    if not values:
+        return None
+    ordered = sorted(values)
+    pick = lambda p: ordered[min(int(p / 100 * len(ordered)), len(ordered) - 1)]
+    return {'p50': pick(50) * 1000, 'p95': pick(95) * 1000, 'p99': pick(99) * 1000,
+            'max': ordered[-1] * 1000, 'count': len(ordered)}
+
+
+def rss_mb(pid):
+    try:
+        with open(f'/proc/{pid}/status') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        return None
+
+
+def start_server(port, log):
+    env = dict(os.environ, PYTHONUNBUFFERED='1')
+    proc = subprocess.Popen([sys.executable, os.path.join(HERE, 'server.py'), '--port', str(port)],
+                            stdout=log, stderr=subprocess.STDOUT, env=env)
+    url = f'http://127.0.0.1:{port}'
+    for _ in range(100):
+        try:
+            # ready once the grids are loaded; sockets are refused before that
+            if requests.get(f'{url}/readyz', timeout=1).ok:
+                return proc, url
+        except requests.ConnectionError:
+            pass
+        if proc.poll() is not None:
+            raise RuntimeError('bench server exited, see its log')
+        time.sleep(0.2)
+    proc.kill()
+    raise RuntimeError('bench server did not start')
+
+
+def run_clients(url, args):
+    """Run the clients split over args.processes load.py processes; merged Stats dicts."""
+    procs = []
+    per_process = math.ceil(args.clients / args.processes)
+    for first in range(0, args.clients, per_process):
+        count = min(per_process, args.clients - first)
+        procs.append(subprocess.Popen(
+            [sys.executable, os.path.join(HERE, 'load.py'), '--url', url,
+             '--clients', str(count), '--first', str(first), '--move-rate', str(args.move_rate),
+             '--duration', str(args.duration), '--ramp', str(args.ramp)],
+            stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True))
+
+    merged = {'connected': 0, 'connect_errors': 0, 'moves_sent': 0, 'received': {},
+              'delivery': [], 'join_latency': []}
+    for proc in procs:
+        out, _ = proc.communicate()
+        if proc.returncode:
+            raise RuntimeError(f'load process exited with {proc.returncode}')
+        stats = json.loads(out.strip().splitlines()[-1])
+        for key in ('connected', 'connect_errors', 'moves_sent'):
+            merged[key] += stats[key]
+        for event, n in stats['received'].items():
+            merged['received'][event] = merged['received'].get(event, 0) + n
+        # each process times only deliveries between its own clients
+        merged['delivery'] += stats['delivery']
+        merged['join_latency'] += stats['join_latency']
+    return merged
+
+
+def benchmark(args):
+    with open(args.server_log, 'w') as log:
+        proc, url = start_server(args.port, log)
+    try:
+        before = parse_metrics(requests.get(f'{url}/api/metrics').text)
+        rss = []
+        done = threading.Event()
+
+        def sample_rss():
+            while not done.wait(1):
+                rss.append(rss_mb(proc.pid))
+        threading.Thread(target=sample_rss, daemon=True).start()
+
+        started = time.perf_counter()
+        stats = run_clients(url, args)
+        elapsed = time.perf_counter() - started
+        done.set()
+        after = parse_metrics(requests.get(f'{url}/api/metrics').text)
+    finally:
+        proc.terminate()
+        proc.wait(10)
+
+    sent = sum(v - before.get(k, 0) for k, v in after.items() if k[0] == 'socketio_messages_sent_total')
+    server_latency = {}
+    for event in ('join_game', 'move', 'disconnect'):
+        quantiles = {f'p{q}': histogram_quantile(after, before, 'game_event_duration_seconds', event, q / 100)
+                     for q in (50, 95, 99)}
+        server_latency[event] = {k: v * 1000 if v is not None else None for k, v in quantiles.items()}
+
+    rss = [r for r in rss if r is not None]
+    return {
+        'config': {'clients': args.clients, 'move_rate': args.move_rate,
+                   'duration': args.duration, 'ramp': args.ramp, 'processes': args.processes},
+        'connected': stats['connected'],
+        'connect_errors': stats['connect_errors'],
+        'moves_sent': stats['moves_sent'],
+        'received': stats['received'],
+        'server_latency_ms': server_latency,
+        'join_latency_ms': percentiles(stats['join_latency']),
+        'delivery_latency_ms': percentiles(stats['delivery']),
+        'messages_per_second': {
+            'moves': stats['moves_sent'] / elapsed,
+            'received': sum(stats['received'].values()) / elapsed,
+            'server_sent': sent / elapsed,
+        },
+        'rss_mb': {'start': rss[0] if rss else None, 'max': max(rss, default=None),
+                   'end': rss[-1] if rss else None, 'samples': rss},
+    }
+
+
+def lookup(result, path):
+    for key in path:
+        if not isinstance(result, dict):
+            return None
+        result = result.get(key)
+    return result
+
+
+def compare(result, baseline, tolerance):
+    """Lines describing each check, and whether any of them regressed."""
+    lines, regressed = [], False
+    for path, higher_is_worse in CHECKS:
+        now, then = lookup(result, path), lookup(baseline, path)
+        if now is None or not then:
+            continue
+        change = (now - then) / then
+        bad = change > tolerance if higher_is_worse else change < -tolerance
+        regressed |= bad
+        lines.append(f"{'REGRESSED' if bad else 'ok':<9} {'.'.join(path):<36} "
+                     f"{then:10.2f} -> {now:10.2f} ({change:+.0%})")
+    return lines, regressed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--clients', type=int, default=500)
+    parser.add_argument('--move-rate', type=float, default=2.0, help='moves per second per client')
+    parser.add_argument('--duration', type=float, default=30, help='seconds of movement after ramp-up')
+    parser.add_argument('--ramp', type=float, default=10, help='seconds over which clients connect')
+    parser.add_argument('--processes', type=int, default=1, help='load generator processes')
+    parser.add_argument('--port', type=int, default=5055)
+    parser.add_argument('--server-log', default=os.path.join(HERE, 'server.log'))
+    parser.add_argument('--out', help='write the result JSON here')
+    parser.add_argument('--save-baseline', metavar='NAME')
+    parser.add_argument('--compare', metavar='NAME')
+    parser.add_argument('--tolerance', type=float, default=0.2, help='allowed relative change')
+    args = parser.parse_args()
+
+    result = benchmark(args)
+    summary = {k: v for k, v in result.items() if k != 'rss_mb'}
+    summary['rss_mb'] = {k: v for k, v in result['rss_mb'].items() if k != 'samples'}
+    print(json.dumps(summary, indent=2))
+    rates = result['messages_per_second']
+    if rates['server_sent'] and rates['received'] < 0.9 * rates['server_sent']:
+        print("warning: clients received far less than the server sent; "
+              "the load generator is saturated, try more --processes", file=sys.stderr)
+
+    if args.out:
+        with open(args.out, 'w') as f:
+            json.dump(result, f, indent=2)
+    if args.save_baseline:
+        os.makedirs(BASELINES, exist_ok=True)
+        with open(os.path.join(BASELINES, f'{args.save_baseline}.json'), 'w') as f:
+            json.dump(result, f, indent=2)
+    if args.compare:
+        with open(os.path.join(BASELINES, f'{args.compare}.json')) as f:
+            baseline = json.load(f)
+        if baseline['config'] != result['config']:
+            print(f"warning: baseline was run with {baseline['config']}")
+        lines, regressed = compare(result, baseline, args.tolerance)
+        print('\n'.join(lines))
+        if regressed:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
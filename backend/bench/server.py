@@ -0,0 +1,44 @@
+# backend/bench/server.py
+"""The real app on an in-memory Mongo (mongomock), for benchmarks.
+
+    python backend/bench/server.py --port 5055
+
+Everything above db.py is the production code; only the collections are
+swapped before anything imports them.
+"""
+import argparse
+import os
+import sys
+
+SRC = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src')
+sys.path.insert(0, SRC)
+
+
+def patch_db():
+    import mongomock
+    import db
+
+    client = mongomock.MongoClient()
+    db.mongo_client = client
+    db.db = client['fantastic_game']
+    db.users_collection = db.db['users']
+    db.player_collection = db.db['players']
+    db.grid_chunks_collection = db.db['grid_chunks']
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=5055)
+    args = parser.parse_args()
+
+    patch_db()
+    from app import create_app
+    from extensions import socketio
+
+    app = create_app()
+    socketio.run(app, host=args.host, port=args.port, log_output=False)
+
+
+if __name__ == '__main__':
+    main()
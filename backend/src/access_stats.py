@@ -0,0 +1,89 @@
+# backend/access_stats.py
+"""Latency percentiles per route from JSON access logs (LOG_FORMAT=json).
+
+    python src/access_stats.py /logs/access.log*
+    python src/access_stats.py --since 2024-05-01T12:00 --sort p99 /logs/access.log.1.gz
+
+Reads plain and gzipped files; prints count, error count and p50/p95/p99/max
+latency (milliseconds) for each method + route.
+"""
+import argparse
+import gzip
+import json
+import math
+import sys
+from collections import defaultdict
+from datetime import datetime
+
+
+def read_records(paths):
+    for path in paths:
+        opener = gzip.open if path.endswith('.gz') else open
+        with opener(path, 'rt', encoding='utf-8', errors='replace') as f:
+            for line in f:
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    # a partly written last line, or a text-mode log
+                    continue
+
+
+def percentile(ordered, p):
+    """Nearest-rank percentile of an already sorted list."""
+    if not ordered:
+        return 0
+    return ordered[max(math.ceil(p / 100 * len(ordered)) - 1, 0)]
+
+
+def summarize(records, since=None):
+    """{(method, route): {count, errors, p50, p95, p99, max}}, latencies in ms."""
+    latencies = defaultdict(list)
+    errors = defaultdict(int)
+    for r in records:
+        if since is not None and r.get('ts', 0) < since:
+            continue
+        key = (r.get('method'), r.get('route') or r.get('path'))
+        latencies[key].append(r.get('latency_us', 0) / 1000)
+        if r.get('status', 0) >= 500:
+            errors[key] += 1
+
+    summary = {}
+    for key, values in latencies.items():
+        values.sort()
+        summary[key] = {
+            'count': len(values),
+            'errors': errors[key],
+            'p50': percentile(values, 50),
+            'p95': percentile(values, 95),
+            'p99': percentile(values, 99),
+            'max': values[-1],
+        }
+    return summary
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('paths', nargs='+', help='access.log files, .gz allowed')
+    parser.add_argument('--since', help='only requests at or after this ISO time (local)')
+    parser.add_argument('--sort', default='count', choices=('count', 'p50', 'p95', 'p99', 'max'))
+    parser.add_argument('--json', action='store_true', help='print JSON instead of a table')
+    args = parser.parse_args(argv)
+
+    since = datetime.fromisoformat(args.since).timestamp() if args.since else None
+    summary = summarize(read_records(args.paths), since)
+    rows = sorted(summary.items(), key=lambda item: item[1][args.sort], reverse=True)
+
+    if args.json:
+        json.dump([dict(method=m, route=r, **s) for (m, r), s in rows], sys.stdout, indent=2)
+        print()
+        return
+
+    print(f"{'method':<7} {'route':<40} {'count':>8} {'5xx':>5} "
+          f"{'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'max ms':>9}")
+    for (method, route), s in rows:
+        print(f"{method or '-':<7} {route or '-':<40} {s['count']:>8} {s['errors']:>5} "
+              f"{s['p50']:>9.2f} {s['p95']:>9.2f} {s['p99']:>9.2f} {s['max']:>9.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,20 +1,33 @@
-from flask import Flask, jsonify, request, session, send_from_directory
+import time
+
+# startup time is measured from here, imports included (see health.py)
+IMPORTS_STARTED = time.perf_counter()
+
+from flask import Flask, g, jsonify, request, session, send_from_directory
 from flask_cors import CORS
 
 # from flask_socketio import SocketIO
 
 from db import db
+from schema import init_schema
 # from database import db
 
 import logging
 import os
+import signal
+import sys
+import threading
 import traceback
 
 from datetime import datetime
-from log_path import setup_loggers, log_safe_http
+import config
+from avatars import AVATAR_MAX_AGE, stored_etag
+from health import health_bp, startup, warm_up
+from log_path import LOG_FORMAT, setup_loggers, log_safe_http, log_access
 from test_bp import test
 from auth.routes import auth_bp
-from game.routes import game_bp
+from game.routes import game_bp, init_game, shutdown_game
+from metrics import metrics_bp, init_metrics
 # from game.achievements import achievements_bp  # Uncomment if using separate blueprint
 
 log = logging.getLogger('werkzeug')
@@ -22,40 +35,70 @@ log.setLevel(logging.ERROR)
 
 from extensions import socketio
 
+startup.record('imports', IMPORTS_STARTED)
+
+
 def create_app():
+    with startup.phase('app'):
+        app = _build_app()
+
+    # Mongo may not be up yet: indexes and the saved grids are loaded in
+    # the background once it answers, and /readyz says when that's done
+    socketio.start_background_task(
+        warm_up,
+        # indexes first, so the queries below (and every login) don't scan
+        ('schema', lambda: init_schema(db)),
+        # load the saved grid before the first player can paint over it
+        ('game', init_game),
+    )
+    return app
+
+
+def _build_app():
     app = Flask(
         __name__,
         static_url_path='',
         static_folder='public')
 
-    app.config['SECRET_KEY'] = 'your-secret-key'  # Change this in production
+    app.config['SECRET_KEY'] = config.SECRET_KEY
 
     # Make sure the folder exists on disk:
     os.makedirs(os.path.join(app.static_folder, 'avatars'), exist_ok=True)
 
     # Initialize extensions
-    CORS(app)
-    socketio.init_app(app, cors_allowed_origins="*", path='/socket.io')
+    CORS(app, origins=config.CORS_ORIGINS)
+    socketio.init_app(app, cors_allowed_origins=config.CORS_ORIGINS, path='/socket.io',
+                      message_queue=config.SOCKETIO_MESSAGE_QUEUE,
+                      async_mode=config.SOCKETIO_ASYNC_MODE)
+    init_metrics()
 
     @app.route('/avatars/<filename>')
     def serve_avatar(filename):
         # will serve from public/avatars/filename
-        return send_from_directory(
+        etag = stored_etag(filename)
+        if etag is None:
+            # uploaded before avatars were processed, served as they always were
+            return send_from_directory(
+                os.path.join(app.static_folder, 'avatars'),
+                filename
+            )
+        # content-hashed names never change: browsers and proxies can keep them
+        response = send_from_directory(
             os.path.join(app.static_folder, 'avatars'),
-            filename
+            filename,
+            etag=etag,
+            max_age=AVATAR_MAX_AGE
         )
+        response.cache_control.immutable = True
+        return response
 
     # Register blueprints
     app.register_blueprint(auth_bp, url_prefix='/api/auth')
     app.register_blueprint(game_bp, url_prefix='/api/game')
     # app.register_blueprint(achievements_bp, url_prefix='/api/game')  # Uncomment if using separate blueprint
     app.register_blueprint(test)
-
-    # right before `return app`
-    print("🗺️ Registered routes:")
-    for rule in app.url_map.iter_rules():
-        app.logger.info(f"🔍 Route registered: {rule} → {rule.endpoint}")
-        print(f" • {rule}  →  {rule.endpoint}")
+    app.register_blueprint(metrics_bp)
+    app.register_blueprint(health_bp)
 
     @app.route('/')
     def index():
@@ -66,6 +109,10 @@ def create_app():
 
     @app.before_request
     def before_log():
+        g.request_started = time.perf_counter()
+        if LOG_FORMAT == 'json':
+            # written as JSON by after_log instead, once the status is known
+            return
         ip = request.remote_addr
         method = request.method
         path = request.path
@@ -74,14 +121,44 @@ def create_app():
 
     @app.after_request
     def after_log(response):
+        log_access(request, response, g.get('request_started', time.perf_counter()))
         log_safe_http(request, response)
         return response
 
     return app
 
+
+# set once shutdown() has finished
+shutdown_done = threading.Event()
+
+
+def shutdown(timeout=config.GRACEFUL_TIMEOUT):
+    """End this worker's games and write everything pending (on SIGTERM / worker exit).
+
+    gunicorn calls it twice; the second call waits (at most `timeout`
+    seconds) for the first to finish, so the worker can't exit mid-flush.
+    """
+    if startup.stopping:
+        if not shutdown_done.wait(timeout):
+            logging.warning(f"shutdown still running after {timeout}s")
+        return
+    started = time.perf_counter()
+    startup.stop()
+    try:
+        shutdown_game()
+    finally:
+        shutdown_done.set()
+    logging.info(f"shut down in {time.perf_counter() - started:.2f}s")
+
+
 if __name__ == '__main__':
+    # development server; production runs gunicorn (see gunicorn.conf.py)
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
     try:
         app = create_app()
-        socketio.run(app, debug=True, host='0.0.0.0', port=5000)
+        socketio.run(app, debug=config.DEBUG, use_reloader=config.DEBUG,
+                     host=config.HOST, port=config.PORT)
     except Exception as e:
-        logging.error(f"Fatal server error: {traceback.format_exc()}")
\ No newline at end of file
+        logging.error(f"Fatal server error: {traceback.format_exc()}")
+    finally:
+        shutdown()
\ No newline at end of file
@@ -0,0 +1,64 @@
+# backend/auth/passwords.py
+import os
+import time
+
+from metrics import export
+from offload import WorkerPool, PoolSaturated, PoolTimeout
+
+# bcrypt cost factor for new hashes (2^rounds iterations; each +1 doubles the time)
+BCRYPT_ROUNDS = int(os.environ.get('BCRYPT_ROUNDS', 12))
+# hashes run at once / allowed to wait / seconds before giving up
+BCRYPT_POOL_SIZE = int(os.environ.get('BCRYPT_POOL_SIZE', 4))
+BCRYPT_POOL_QUEUE = int(os.environ.get('BCRYPT_POOL_QUEUE', 32))
+BCRYPT_TIMEOUT = float(os.environ.get('BCRYPT_TIMEOUT', 5.0))
+# what a 503 tells the client to wait before trying again (seconds)
+BCRYPT_RETRY_AFTER = int(os.environ.get('BCRYPT_RETRY_AFTER', 1))
+
+# bcrypt releases the GIL, so pool threads hash in parallel while the
+# event loop keeps serving sockets
+password_pool = WorkerPool('bcrypt', BCRYPT_POOL_SIZE, BCRYPT_POOL_QUEUE, BCRYPT_TIMEOUT)
+
+# counts and seconds: `work` is time spent hashing, `wait` time queued for a thread
+metrics = {
+    'hashes': 0,
+    'checks': 0,
+    'work_seconds': 0.0,
+    'wait_seconds': 0.0,
+    'max_seconds': 0.0,
+}
+export('password_hashing', metrics)
+
+PasswordBusy = (PoolSaturated, PoolTimeout)
+
+
+def _timed(fn, *args):
+    started = time.perf_counter()
+    return fn(*args), time.perf_counter() - started
+
+
+def _run(kind, fn, *args):
+    started = time.perf_counter()
+    result, work = password_pool.run(_timed, fn, *args)
+    elapsed = time.perf_counter() - started
+    metrics[kind] += 1
+    metrics['work_seconds'] += work
+    metrics['wait_seconds'] += max(elapsed - work, 0.0)
+    metrics['max_seconds'] = max(metrics['max_seconds'], elapsed)
+    return result
+
+
+def hash_password(password):
+    """bcrypt hash of `password` as a str, computed on the password pool.
+
+    Raises PoolSaturated or PoolTimeout when the pool can't take it.
+    """
+    # imported on first use, to keep it out of startup
+    import bcrypt
+    salt = bcrypt.gensalt(BCRYPT_ROUNDS)
+    return _run('hashes', bcrypt.hashpw, password.encode('utf-8'), salt).decode('utf-8')
+
+
+def check_password(password, hashed):
+    """Whether `password` matches the stored bcrypt hash; same errors as hash_password()."""
+    import bcrypt
+    return _run('checks', bcrypt.checkpw, password.encode('utf-8'), hashed.encode('utf-8'))
@@ -2,15 +2,32 @@
 import logging
 
 from flask import Blueprint, request, jsonify, session
-import bcrypt
 import os
 import datetime
+from pymongo.errors import DuplicateKeyError
 
 # from db import users_collection
 from db import users_collection
+from user_cache import get_user_profile, invalidate_profile
+from auth.passwords import BCRYPT_RETRY_AFTER, PasswordBusy, hash_password, check_password
+from avatars import (AVATAR_MAX_BYTES, AvatarBusy, InvalidAvatar, avatar_path, avatar_paths,
+                     store_avatar)
 
 auth_bp = Blueprint('auth', __name__)
 
+# fn(username, avatar_url) called after an avatar upload; game/routes.py
+# registers one, so auth doesn't import the game
+avatar_listeners = []
+
+
+def too_busy():
+    """503 for when every password hashing (or avatar) slot is taken."""
+    response = jsonify({"error": "Server is busy, please try again"})
+    response.status_code = 503
+    response.headers['Retry-After'] = str(BCRYPT_RETRY_AFTER)
+    return response
+
+
 @auth_bp.route('/signup', methods=['POST'])
 def signup():
     data = request.get_json()
@@ -44,17 +61,28 @@ def signup():
         logging.info('user attempted to sign up, but username already exists')
         return jsonify({"error": "Username already exists"}), 409
 
-    # Hash password
-    hashed_password = bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt())
+    # Hash password (on the password pool, not the event loop)
+    try:
+        hashed_password = hash_password(password)
+    except PasswordBusy as e:
+        logging.warning(f'signup for {username} rejected: {e}')
+        return too_busy()
 
     # Create user
     user = {
         "username": username,
-        "password": hashed_password.decode('utf-8'),
+        "password": hashed_password,
         "created_at": datetime.datetime.utcnow()
     }
 
-    users_collection.insert_one(user)
+    try:
+        users_collection.insert_one(user)
+    except DuplicateKeyError:
+        # lost a race with another signup for the same name (unique index)
+        logging.info('user attempted to sign up, but username already exists')
+        return jsonify({"error": "Username already exists"}), 409
+    # the name may be cached as "no such user"
+    invalidate_profile(username)
     logging.info(f'{username} successfully signed up')
     session['username'] = username
     return jsonify({"message": "User created successfully"}), 201
@@ -72,7 +100,13 @@ def login():
     if not user:
         logging.info('user attempted to login up, but username does not exist')
         return jsonify({"error": "Invalid username"}), 401
-    elif not bcrypt.checkpw(password.encode('utf-8'), user['password'].encode('utf-8')):
+
+    try:
+        matches = check_password(password, user['password'])
+    except PasswordBusy as e:
+        logging.warning(f'login for {username} rejected: {e}')
+        return too_busy()
+    if not matches:
         logging.info(f'{user.get("username")} attempted to login, but password does not match')
         return jsonify({"error": "Invalid password"}), 401
 
@@ -87,83 +121,67 @@ def login():
 
 # FOR AVATARS
 
-import io, base64, time
-from flask import current_app, url_for
-from werkzeug.utils import secure_filename
-from game.routes import players
-from extensions import socketio
+from flask import current_app
 
-ALLOWED = {'png','jpg','jpeg'}
+ALLOWED = {'png','jpg','jpeg','webp'}
 
 def allowed_file(fname):
     return '.' in fname and fname.rsplit('.',1)[1].lower() in ALLOWED
 
 @auth_bp.route('/profile', methods=['GET'])
 def get_profile():
-    """Return the current user's avatar as a data URL."""
+    """Return the current user's avatar URL (and every stored size of it)."""
     username = request.args.get('username')
     if not username:
         return jsonify(error="username required"), 400
 
-    user = users_collection.find_one(
-        {"username": username},
-        {"avatar": 1}
-    )
+    user = get_user_profile(username)
+    digest = user.get('avatar_id') if user else None
 
-    return jsonify(avatar=(user.get('avatar') if user else None)), 200
+    return jsonify(avatar=(user.get('avatar') if user else None),
+                   avatars=(avatar_paths(digest) if digest else None)), 200
 
 @auth_bp.route('/avatar', methods=['POST'])
 def upload_avatar():
-    """Accept multipart/form-data file 'avatar', crop & resize to square, store as base64."""
+    """Accept multipart/form-data file 'avatar', crop & resize to square, store as WebP/PNG."""
     # again we'll pull username from a query param or form field
     username = request.form.get("username")
     if not username:
         return jsonify(error="username required"), 400
 
+    if request.content_length and request.content_length > AVATAR_MAX_BYTES:
+        return jsonify(error='File too large'), 413
+
     # if "avatar" not in request.files:
     #     return jsonify(error="No file part"), 400
 
-    file = request.files["avatar"]
+    file = request.files.get("avatar")
     if not file or not allowed_file(file.filename):
         return jsonify(error='Bad file'), 400
 
-    # — Crop & resize on the server if you like —
-    # load with PIL.Image.open(file.stream), apply .crop() or .thumbnail()
-
-    # save to disk
-    # filename = secure_filename(f"{username.username}_{int(time.time())}.{file.filename.rsplit('.', 1)[1]}")
-    ext = file.filename.rsplit('.', 1)[1].lower()
-    filename = secure_filename(f"{username}_{int(time.time())}.{ext}")
-
+    # decode, center-crop and resize to every AVATAR_SIZES on the avatar
+    # pool; the files are named after their content, see avatars.py
     out_dir = os.path.join(current_app.static_folder, 'avatars')
     os.makedirs(out_dir, exist_ok=True)
-    path = os.path.join(out_dir, filename)
-    file.save(path)
+    try:
+        digest = store_avatar(file.read(), out_dir)
+    except InvalidAvatar as e:
+        logging.info(f'{username} uploaded an unreadable avatar: {e}')
+        return jsonify(error='Bad file'), 400
+    except AvatarBusy as e:
+        logging.warning(f'avatar upload for {username} rejected: {e}')
+        return too_busy()
 
-    # store (relative) URL in MongoDB:
-    # avatar_url = url_for('serve_avatar', filename=filename, _external=True)
-    avatar_url = f"/avatars/{filename}"
+    # store (relative) URL in MongoDB: the size the game draws
+    avatar_url = avatar_path(digest)
     users_collection.update_one(
         {'username': username},
-        {'$set': {'avatar': avatar_url}}
+        {'$set': {'avatar': avatar_url, 'avatar_id': digest}}
     )
+    invalidate_profile(username)
+
+    # the game shows it to everyone if the player is online
+    for listener in avatar_listeners:
+        listener(username, avatar_url)
 
-    # also update in-memory player map so new joins get the URL
-    # players[username.username]['avatar'] = avatar_url
-    if username in players:
-        players[username]['avatar'] = avatar_url
-
-    # broadcast to everyone that changed avatar
-    # re-emit a “player_moved” (re-using that handler) with the exact same pos but
-    # now carrying the new avatar URL.  Clients already listen for this and will
-    # update their local players[u].avatar and cache the image immediately.
-    player = players.get(username)
-    if player:
-        socketio.emit('player_moved', {
-            'username': username,
-            'position': player['position'],
-            'color': player['color'],
-            'avatar': avatar_url
-        }, room='main')
-
-    return jsonify(avatar=avatar_url), 200
+    return jsonify(avatar=avatar_url, avatars=avatar_paths(digest)), 200
@@ -0,0 +1,127 @@
+# backend/avatars.py
+import hashlib
+import io
+import os
+import re
+
+from metrics import export
+from offload import WorkerPool, PoolSaturated, PoolTimeout
+
+# square sizes (px) every avatar is stored in; the game draws AVATAR_GAME_SIZE
+AVATAR_SIZES = (32, 64, 128)
+AVATAR_GAME_SIZE = 64
+AVATAR_FORMATS = ('webp', 'png')
+# largest upload accepted (bytes) and largest decoded image (pixels)
+AVATAR_MAX_BYTES = int(os.environ.get('AVATAR_MAX_BYTES', 10 * 1024 * 1024))
+AVATAR_MAX_PIXELS = int(os.environ.get('AVATAR_MAX_PIXELS', 40_000_000))
+# stored files never change (the name is their content hash), so caches may keep them
+AVATAR_MAX_AGE = int(os.environ.get('AVATAR_MAX_AGE', 365 * 24 * 3600))
+# images processed at once / allowed to wait / seconds before giving up
+AVATAR_POOL_SIZE = int(os.environ.get('AVATAR_POOL_SIZE', 2))
+AVATAR_POOL_QUEUE = int(os.environ.get('AVATAR_POOL_QUEUE', 8))
+AVATAR_TIMEOUT = float(os.environ.get('AVATAR_TIMEOUT', 10.0))
+
+# Pillow releases the GIL while decoding, resizing and encoding
+avatar_pool = WorkerPool('avatar', AVATAR_POOL_SIZE, AVATAR_POOL_QUEUE, AVATAR_TIMEOUT)
+
+metrics = {'processed': 0, 'invalid': 0, 'bytes_in': 0, 'bytes_stored': 0}
+export('avatars', metrics)
+
+AvatarBusy = (PoolSaturated, PoolTimeout)
+
+# <content hash>-<size>.<format>, as written by store_avatar()
+_STORED_NAME = re.compile(r'^([0-9a-f]{16})-(\d+)\.(webp|png)$')
+
+
+class InvalidAvatar(ValueError):
+    """The upload isn't an image we can (or are willing to) decode."""
+
+
+def avatar_name(digest, size=AVATAR_GAME_SIZE, fmt='webp'):
+    return f"{digest}-{size}.{fmt}"
+
+
+def avatar_path(digest, size=AVATAR_GAME_SIZE, fmt='webp'):
+    return f"/avatars/{avatar_name(digest, size, fmt)}"
+
+
+def avatar_paths(digest):
+    """{format: {size: url}} for every stored variant of an avatar."""
+    return {fmt: {size: avatar_path(digest, size, fmt) for size in AVATAR_SIZES}
+            for fmt in AVATAR_FORMATS}
+
+
+def stored_etag(filename):
+    """Strong ETag for a file written by store_avatar(), else None."""
+    match = _STORED_NAME.match(filename)
+    return f"{match.group(1)}-{match.group(2)}-{match.group(3)}" if match else None
+
+
+def render_avatar(data):
+    """Decode an upload, center-crop it square and encode every variant.
+
+    Returns {(size, format): bytes}. Raises InvalidAvatar for anything
+    Pillow can't read or that is too large to decode.
+    """
+    # Pillow is only needed once someone uploads, so it stays out of startup
+    from PIL import Image, ImageOps
+
+    try:
+        image = Image.open(io.BytesIO(data))
+        if image.width * image.height > AVATAR_MAX_PIXELS:
+            raise InvalidAvatar(f"image is {image.width}x{image.height}")
+        # JPEGs can decode straight at a fraction of their size
+        largest = max(AVATAR_SIZES)
+        image.draft('RGB', (largest, largest))
+        image = ImageOps.exif_transpose(image)
+        has_alpha = 'A' in image.getbands() or 'transparency' in image.info
+        image = image.convert('RGBA' if has_alpha else 'RGB')
+    except InvalidAvatar:
+        raise
+    except (OSError, ValueError, Image.DecompressionBombError) as e:
+        raise InvalidAvatar(str(e)) from e
+
+    square = ImageOps.fit(image, (largest, largest), Image.Resampling.LANCZOS)
+    out = {}
+    for size in AVATAR_SIZES:
+        scaled = square if size == largest else square.resize((size, size), Image.Resampling.LANCZOS)
+        for fmt in AVATAR_FORMATS:
+            buf = io.BytesIO()
+            if fmt == 'webp':
+                scaled.save(buf, 'WEBP', quality=80, method=6)
+            else:
+                scaled.save(buf, 'PNG', optimize=True)
+            out[(size, fmt)] = buf.getvalue()
+    return out
+
+
+def _store(data, directory):
+    variants = render_avatar(data)
+    # the lossless largest variant identifies the picture
+    digest = hashlib.sha256(variants[(max(AVATAR_SIZES), 'png')]).hexdigest()[:16]
+    for (size, fmt), body in variants.items():
+        path = os.path.join(directory, avatar_name(digest, size, fmt))
+        if os.path.exists(path):
+            continue  # same picture uploaded before
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, 'wb') as f:
+            f.write(body)
+        os.replace(tmp, path)
+    return digest, sum(len(b) for b in variants.values())
+
+
+def store_avatar(data, directory):
+    """Process an upload on the avatar pool and write its variants to `directory`.
+
+    Returns the content hash naming the files (see avatar_path()). Raises
+    InvalidAvatar, or PoolSaturated / PoolTimeout when the pool is busy.
+    """
+    metrics['bytes_in'] += len(data)
+    try:
+        digest, written = avatar_pool.run(_store, data, directory)
+    except InvalidAvatar:
+        metrics['invalid'] += 1
+        raise
+    metrics['processed'] += 1
+    metrics['bytes_stored'] += written
+    return digest
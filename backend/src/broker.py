@@ -0,0 +1,48 @@
+# backend/broker.py
+"""Stand-in broker for running several game workers on one machine.
+
+Serves the shared game state (grids, players, colors, rooms) to workers started
+with GAME_STATE_BACKEND=broker. If pyzmq is installed it also forwards
+Socket.IO messages between workers, for
+SOCKETIO_MESSAGE_QUEUE=zmq+tcp://127.0.0.1:5555+5556.
+
+    python src/broker.py
+    GAME_STATE_BACKEND=broker SOCKETIO_MESSAGE_QUEUE=zmq+tcp://127.0.0.1:5555+5556 PORT=5001 python src/app.py
+    GAME_STATE_BACKEND=broker SOCKETIO_MESSAGE_QUEUE=zmq+tcp://127.0.0.1:5555+5556 PORT=5002 python src/app.py
+"""
+import logging
+import os
+import threading
+
+from game.grid import WORLD_COLS, WORLD_ROWS
+from game.state import BROKER_ADDRESS, serve_broker
+
+ZMQ_PULL_PORT = int(os.environ.get('BROKER_ZMQ_PULL_PORT', 5555))
+ZMQ_PUB_PORT = int(os.environ.get('BROKER_ZMQ_PUB_PORT', 5556))
+
+
+def forward_socketio_messages():
+    """Minimal zmq broker for socketio.ZmqManager: PULL from workers, PUB to all."""
+    import zmq
+
+    context = zmq.Context()
+    receiver = context.socket(zmq.PULL)
+    receiver.bind(f"tcp://*:{ZMQ_PULL_PORT}")
+    publisher = context.socket(zmq.PUB)
+    publisher.bind(f"tcp://*:{ZMQ_PUB_PORT}")
+    while True:
+        publisher.send(receiver.recv())
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(levelname)s] %(message)s")
+    try:
+        import zmq  # noqa: F401
+    except ImportError:
+        logging.info("pyzmq not installed, not forwarding Socket.IO messages")
+    else:
+        threading.Thread(target=forward_socketio_messages, daemon=True).start()
+        logging.info(f"forwarding Socket.IO messages on ports {ZMQ_PULL_PORT}+{ZMQ_PUB_PORT}")
+
+    logging.info(f"serving {WORLD_COLS}x{WORLD_ROWS} game state on {BROKER_ADDRESS}")
+    serve_broker(WORLD_COLS, WORLD_ROWS)
@@ -0,0 +1,33 @@
+# backend/config.py
+"""How the server runs, from the environment.
+
+Read by app.py (`python src/app.py`, for development) and by
+gunicorn.conf.py (production: `gunicorn -c src/gunicorn.conf.py wsgi:app`).
+Feature settings stay next to the code that uses them.
+"""
+import os
+
+# sign sessions with this; set it in production
+SECRET_KEY = os.environ.get('SECRET_KEY', 'your-secret-key')
+# Flask debugger and reloader, for `python src/app.py` only
+DEBUG = os.environ.get('FLASK_DEBUG', '0') == '1'
+
+HOST = os.environ.get('HOST', '0.0.0.0')
+PORT = int(os.environ.get('PORT', 5000))
+
+# origins allowed to open sockets / call the API: '*' or a comma-separated list
+CORS_ORIGINS = os.environ.get('CORS_ORIGINS', '*')
+CORS_ORIGINS = CORS_ORIGINS if CORS_ORIGINS == '*' else [o.strip() for o in CORS_ORIGINS.split(',')]
+# with several workers, a Flask-SocketIO message queue (redis://, zmq+tcp://...)
+# relays emits between them; see broker.py
+SOCKETIO_MESSAGE_QUEUE = os.environ.get('SOCKETIO_MESSAGE_QUEUE')
+# eventlet / gevent / threading; unset = whatever Flask-SocketIO finds (eventlet)
+SOCKETIO_ASYNC_MODE = os.environ.get('SOCKETIO_ASYNC_MODE') or None
+
+# gunicorn: one worker per process (Socket.IO sessions live in it), which
+# serves every connection as a green thread
+WORKER_CLASS = os.environ.get('GUNICORN_WORKER_CLASS', 'eventlet')
+WORKER_CONNECTIONS = int(os.environ.get('GUNICORN_WORKER_CONNECTIONS', 4000))
+KEEPALIVE = int(os.environ.get('GUNICORN_KEEPALIVE', 5))
+# seconds a stopping worker gets to end games and flush before it is killed
+GRACEFUL_TIMEOUT = int(os.environ.get('GRACEFUL_TIMEOUT', 20))
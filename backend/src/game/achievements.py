@@ -1,6 +1,7 @@
 # backend/game/achievements.py
 from flask import Blueprint, request, jsonify
 from db import users_collection
+from user_cache import get_user_profile, invalidate_profile
 
 achievements_bp = Blueprint('achievements', __name__)
 
@@ -11,7 +12,7 @@ def get_achievements():
     if not username:
         return jsonify({"error": "Username is required"}), 400
 
-    user = users_collection.find_one({"username": username})
+    user = get_user_profile(username)
     if not user:
         return jsonify({"error": "User not found"}), 404
 
@@ -42,6 +43,7 @@ def update_achievements():
 
     if result.matched_count == 0:
         return jsonify({"error": "User not found"}), 404
+    invalidate_profile(username)
 
     return jsonify({"message": "Achievements updated successfully"}), 200
 
@@ -0,0 +1,191 @@
+# backend/game/analytics.py
+"""Per-player territory, connected regions, contested borders and visit heatmaps.
+
+The grid's owner-id array is viewed as a rows x cols numpy array and every
+statistic is computed for all players at once, so the cost is a handful of
+whole-array passes instead of a Python loop per cell or per player.
+"""
+import logging
+import os
+import time
+
+import numpy as np
+
+from game.grid import EMPTY
+from offload import WorkerPool
+
+# seconds between recomputations (only when the grid changed)
+ANALYTICS_INTERVAL = float(os.environ.get('ANALYTICS_INTERVAL', 10))
+# recomputations running at once / allowed to wait / seconds before giving up
+ANALYTICS_POOL_SIZE = int(os.environ.get('ANALYTICS_POOL_SIZE', 1))
+ANALYTICS_POOL_QUEUE = int(os.environ.get('ANALYTICS_POOL_QUEUE', 4))
+ANALYTICS_TIMEOUT = float(os.environ.get('ANALYTICS_TIMEOUT', 30.0))
+
+# numpy releases the GIL for the array passes
+analytics_pool = WorkerPool('analytics', ANALYTICS_POOL_SIZE, ANALYTICS_POOL_QUEUE, ANALYTICS_TIMEOUT)
+
+SORT_KEYS = ('cells', 'largest_region', 'regions', 'border')
+
+
+def _same_owner_edges(owners):
+    """Flat index pairs (a, b) of horizontally / vertically adjacent cells owned by the same player."""
+    rows, cols = owners.shape
+    index = np.arange(rows * cols).reshape(rows, cols)
+    a = np.concatenate((index[:, :-1].ravel(), index[:-1, :].ravel()))
+    b = np.concatenate((index[:, 1:].ravel(), index[1:, :].ravel()))
+    flat = owners.ravel()
+    same = (flat[a] == flat[b]) & (flat[a] != EMPTY)
+    return a[same], b[same]
+
+
+def label_regions(owners):
+    """Label 4-connected regions of equally owned cells.
+
+    Returns a flat array giving every cell the smallest flat index in its
+    region. Hooks each edge's larger label onto the smaller one, then
+    shortcuts label chains by pointer jumping, until no edge joins two
+    labels; that takes about log(region size) rounds.
+    """
+    labels = np.arange(owners.size)
+    a, b = _same_owner_edges(owners)
+    while True:
+        la, lb = labels[a], labels[b]
+        apart = la != lb
+        if not apart.any():
+            return labels
+        # every label is a root here, so this only ever merges trees
+        np.minimum.at(labels, np.maximum(la[apart], lb[apart]), np.minimum(la[apart], lb[apart]))
+        while True:
+            jumped = labels[labels]
+            if np.array_equal(jumped, labels):
+                break
+            labels = jumped
+
+
+def territory(owners, ids):
+    """Cells owned, per owner id (index = id)."""
+    return np.bincount(owners.ravel(), minlength=ids)
+
+
+def regions(owners, labels, ids):
+    """(number of regions, cells in the largest region) per owner id."""
+    flat = owners.ravel()
+    painted = flat != EMPTY
+    sizes = np.bincount(labels[painted], minlength=flat.size)
+    roots = np.flatnonzero(sizes)
+    count = np.bincount(flat[roots], minlength=ids)
+    largest = np.zeros(ids, dtype=np.int64)
+    np.maximum.at(largest, flat[roots], sizes[roots])
+    return count, largest
+
+
+def border_lengths(owners, ids):
+    """Cell edges each owner shares with another player's cells, per owner id."""
+    length = np.zeros(ids, dtype=np.int64)
+    for a, b in ((owners[:, :-1], owners[:, 1:]), (owners[:-1, :], owners[1:, :])):
+        contested = (a != b) & (a != EMPTY) & (b != EMPTY)
+        length += np.bincount(a[contested], minlength=ids)
+        length += np.bincount(b[contested], minlength=ids)
+    return length
+
+
+def bin_heatmap(visits, size):
+    """Sum visits over size x size blocks (edge blocks may be smaller)."""
+    rows, cols = visits.shape
+    padded = np.zeros((-(-rows // size) * size, -(-cols // size) * size), dtype=np.int64)
+    padded[:rows, :cols] = visits
+    return padded.reshape(padded.shape[0] // size, size, padded.shape[1] // size, size).sum(axis=(1, 3))
+
+
+def player_stats(owners, names):
+    """{username: {cells, regions, largest_region, border}} for everyone owning cells.
+
+    `owners` is the rows x cols owner-id array and names[id] the username
+    of owner id `id`.
+    """
+    ids = len(names)
+    cells = territory(owners, ids)
+    count, largest = regions(owners, label_regions(owners), ids)
+    border = border_lengths(owners, ids)
+    return {
+        names[i]: {
+            'cells': int(cells[i]),
+            'regions': int(count[i]),
+            'largest_region': int(largest[i]),
+            'border': int(border[i]),
+        }
+        for i in np.flatnonzero(cells) if i != EMPTY
+    }
+
+
+class GridAnalytics:
+    """Cached analytics for one room shard, recomputed in the background.
+
+    Every ANALYTICS_INTERVAL seconds, if the grid's version moved, the
+    owner array is copied on the event loop (one memcpy) and the stats
+    are computed on the analytics pool. Requests only read the cached
+    result. `visits` is the room's per-cell visit counter (array('I')),
+    kept up to date by Room.paint().
+    """
+
+    def __init__(self, socketio, grid, visits, cols, rows, interval=ANALYTICS_INTERVAL,
+                 pool=analytics_pool):
+        self.socketio = socketio
+        self.grid = grid
+        self.visits = visits
+        self.cols = cols
+        self.rows = rows
+        self.interval = interval
+        self.pool = pool
+        self._version = None
+        self._result = None
+        # bin size -> binned heatmap, for the visits as of the last refresh
+        self._heatmaps = {}
+        self._visits = None
+        self._task = None
+        self.metrics = {'refreshes': 0, 'errors': 0, 'last_refresh_seconds': 0.0}
+
+    def start(self):
+        if self._task is None:
+            self._task = self.socketio.start_background_task(self._run)
+
+    def _run(self):
+        while True:
+            try:
+                self.refresh()
+            except Exception:
+                self.metrics['errors'] += 1
+                logging.exception("grid analytics refresh failed")
+            self.socketio.sleep(self.interval)
+
+    def refresh(self):
+        """Recompute if the grid changed since the last time."""
+        version = self.grid.version()
+        self._visits = np.frombuffer(self.visits, dtype=np.uint32).reshape(self.rows, self.cols).copy()
+        self._heatmaps = {}
+        if version == self._version:
+            return
+        started = time.time()
+        raw, owner_list = self.grid.snapshot()
+        owners = np.frombuffer(raw, dtype=np.uint16).reshape(self.rows, self.cols)
+        names = [None] * (int(owners.max()) + 1)
+        for owner_id, username, _ in owner_list:
+            names[owner_id] = username
+        players = self.pool.run(player_stats, owners, names)
+        self._result = {'version': version, 'computed_at': started, 'players': players}
+        self._version = version
+        self.metrics['refreshes'] += 1
+        self.metrics['last_refresh_seconds'] = time.time() - started
+
+    def result(self):
+        """{version, computed_at, players: {username: stats}}, or None before the first refresh."""
+        return self._result
+
+    def heatmap(self, size):
+        """Visits summed over size x size blocks, as of the last refresh (None before it)."""
+        if self._visits is None:
+            return None
+        heatmap = self._heatmaps.get(size)
+        if heatmap is None:
+            heatmap = self._heatmaps[size] = bin_heatmap(self._visits, size)
+        return heatmap
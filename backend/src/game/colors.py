@@ -0,0 +1,56 @@
+# backend/game/colors.py
+
+
+class ColorRegistry:
+    """username -> '#rrggbb' for the players who still need a color.
+
+    A color is referenced by its player being online (acquire/release)
+    and by every cell they own; the grids' per-owner cell counts, summed
+    by `cells_of(username)`, are that reference count, and a grid reports
+    the last cell changing hands through vacated(). Once neither holds,
+    the color is dropped from memory. The routes persist colors in Mongo,
+    so a returning player gets theirs back.
+    """
+
+    def __init__(self, cells_of):
+        self.cells_of = cells_of
+        self._colors = {}
+        self._online = set()
+
+    def get(self, username):
+        return self._colors.get(username)
+
+    def many(self, usernames):
+        """{username: color} for the given usernames (None when unknown)."""
+        return {u: self._colors.get(u) for u in usernames}
+
+    def acquire(self, username, color):
+        """Pin an online player's color, keeping one they already have.
+
+        Returns the color in effect, which differs from `color` if another
+        worker got there first.
+        """
+        self._online.add(username)
+        return self._colors.setdefault(username, color)
+
+    def release(self, username):
+        """A player went offline; forget their color unless they own cells."""
+        self._online.discard(username)
+        self._drop_if_unused(username)
+
+    def load(self, colors):
+        """Add stored colors for cell owners, e.g. after the grid was restored."""
+        for username, color in colors.items():
+            self._colors.setdefault(username, color)
+
+    def vacated(self, username):
+        """Called by the grid when username's last cell was taken."""
+        self._drop_if_unused(username)
+
+    def _drop_if_unused(self, username):
+        if username not in self._online and self.cells_of(username) == 0:
+            self._colors.pop(username, None)
+
+    def size(self):
+        """Colors held in memory."""
+        return len(self._colors)
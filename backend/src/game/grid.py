@@ -0,0 +1,237 @@
+# backend/game/grid.py
+import heapq
+import os
+from array import array
+from collections import deque
+from itertools import islice
+
+# owner id 0 means "nobody painted this cell yet"
+EMPTY = 0
+
+# array('H') holds unsigned 16-bit owner ids
+MAX_OWNERS = 0xFFFF
+
+WORLD_COLS = 100
+WORLD_ROWS = 100
+
+# recent cell changes kept for clients catching up after a reconnect
+GRID_HISTORY = int(os.environ.get('GRID_HISTORY', 20000))
+
+
+class GridStore:
+    """Paint ownership for a fixed-size map.
+
+    Every cell holds a small integer owner id instead of a username, and
+    usernames are interned to ids the first time they paint. A 2000x2000
+    map costs 8MB here instead of a dict entry + key string per cell.
+    An id goes back to a free list once its owner holds no cells, so only
+    MAX_OWNERS players at a time are limited, not over the server's lifetime.
+    """
+
+    def __init__(self, cols, rows, chunk_size=32, history=GRID_HISTORY, on_vacated=None):
+        self.cols = cols
+        self.rows = rows
+        self.chunk_size = chunk_size
+        # one uint16 per cell, row-major: index = y * cols + x
+        self._owners = array('H', bytes(2 * cols * rows))
+        # username -> owner id, and owner id -> username (id 0 is EMPTY)
+        self._ids = {}
+        self._names = [None]
+        # ids of owners who lost all their cells, handed out again first
+        self._free = []
+        # live cell count per owner id, kept in step with every paint
+        self._counts = [cols * rows]
+        # bumped on every ownership change, lets snapshots be cached
+        self._version = 0
+        # versions only mean something within one GridStore's lifetime
+        self._epoch = os.urandom(4).hex()
+        # (index, owner id) of the last `history` changes, one per version
+        self._history = deque(maxlen=history)
+        # chunks changed since the last take_dirty(), for write-behind persistence
+        self._dirty = set()
+        # on_vacated(username) runs when someone loses their last cell
+        self.on_vacated = on_vacated
+
+    def version(self):
+        """Counter bumped on every ownership change."""
+        return self._version
+
+    def epoch(self):
+        """Random id of this grid; a client's version from another epoch is useless."""
+        return self._epoch
+
+    def in_bounds(self, x, y):
+        return 0 <= x < self.cols and 0 <= y < self.rows
+
+    def intern(self, username):
+        """Return the owner id for a username, assigning one if needed."""
+        owner_id = self._ids.get(username)
+        if owner_id is not None:
+            return owner_id
+        if self._free:
+            owner_id = self._free.pop()
+            self._names[owner_id] = username
+        else:
+            owner_id = len(self._names)
+            if owner_id > MAX_OWNERS:
+                raise ValueError("grid owner table is full")
+            self._names.append(username)
+            self._counts.append(0)
+        self._ids[username] = owner_id
+        return owner_id
+
+    def _release(self, owner_id):
+        """Forget an owner without cells so their id can be reused.
+
+        Safe for the history: a cell's latest change always names its
+        current owner, so changes_since() never reads a released id.
+        """
+        del self._ids[self._names[owner_id]]
+        self._names[owner_id] = None
+        self._free.append(owner_id)
+
+    def owner_id(self, username):
+        """Owner id for a username, or EMPTY if they never painted."""
+        return self._ids.get(username, EMPTY)
+
+    def name(self, owner_id):
+        return self._names[owner_id]
+
+    def owner(self, x, y):
+        """Username owning cell (x, y), or None."""
+        return self._names[self._owners[y * self.cols + x]]
+
+    def paint(self, x, y, username):
+        """Give cell (x, y) to username and return the previous owner (or None)."""
+        if not self.in_bounds(x, y):
+            raise IndexError(f"cell {x},{y} is outside the {self.cols}x{self.rows} grid")
+        idx = y * self.cols + x
+        prev = self._owners[idx]
+        owner_id = self.intern(username)
+        if prev != owner_id:
+            self._owners[idx] = owner_id
+            self._counts[prev] -= 1
+            self._counts[owner_id] += 1
+            self._version += 1
+            self._history.append((idx, owner_id))
+            self._dirty.add((x // self.chunk_size, y // self.chunk_size))
+            if prev != EMPTY and self._counts[prev] == 0:
+                name = self._names[prev]
+                self._release(prev)
+                if self.on_vacated is not None:
+                    self.on_vacated(name)
+                return name
+        return self._names[prev]
+
+    def changes_since(self, version, chunks=None):
+        """Cells changed after `version`: (current version, [(x, y, username)]).
+
+        Only a cell's latest change is listed; `chunks` limits the list to
+        those (cx, cy) chunks. Returns None when `version` is older than the
+        kept history, so the caller has to send the cells in full.
+        """
+        behind = self._version - version
+        if behind < 0 or behind > len(self._history):
+            return None
+        latest = {}
+        for idx, owner_id in islice(reversed(self._history), behind):
+            latest.setdefault(idx, owner_id)
+        cols, size = self.cols, self.chunk_size
+        changes = []
+        for idx, owner_id in latest.items():
+            x, y = idx % cols, idx // cols
+            if chunks is None or (x // size, y // size) in chunks:
+                changes.append((x, y, self._names[owner_id]))
+        return self._version, changes
+
+    def count(self, username):
+        """Number of cells owned by username, O(1)."""
+        owner_id = self._ids.get(username)
+        if owner_id is None:
+            return 0
+        return self._counts[owner_id]
+
+    def scores(self):
+        """Live scores for everyone owning at least one cell: {username: cells}."""
+        return {name: n for _, name, n in self.owners()}
+
+    def top(self, limit):
+        """The `limit` highest live scores as (username, cells), best first."""
+        best = heapq.nlargest(limit, range(1, len(self._counts)), key=self._counts.__getitem__)
+        return [(self._names[i], self._counts[i]) for i in best if self._counts[i] > 0]
+
+    def owners(self):
+        """(owner_id, username, cells) for everyone owning at least one cell."""
+        return [
+            (owner_id, self._names[owner_id], n)
+            for owner_id, n in enumerate(self._counts)
+            if owner_id != EMPTY and n > 0
+        ]
+
+    def raw(self):
+        """The owner-id array itself (row-major); callers must not modify it."""
+        return self._owners
+
+    def snapshot(self):
+        """(copy of the owner-id array, owners()) taken together.
+
+        Through the broker raw() and owners() are two round trips, and a
+        new owner may paint in between; one call names every id in the copy.
+        """
+        return self._owners[:], self.owners()
+
+    def region(self, x0, y0, x1, y1):
+        """Owner ids of the rectangle [x0, x1) x [y0, y1), row by row."""
+        owners = self._owners
+        part = owners[:0]
+        for y in range(y0, y1):
+            start = y * self.cols
+            part += owners[start + x0:start + x1]
+        return part
+
+    def load_region(self, x0, y0, x1, y1, cells, palette):
+        """Overwrite the rectangle [x0, x1) x [y0, y1) from stored data.
+
+        `cells` holds one index per cell, row by row: 0 for empty, otherwise
+        1 + a position in `palette` (a list of usernames).
+        """
+        ids = [EMPTY] + [self.intern(name) for name in palette]
+        owners, counts = self._owners, self._counts
+        touched = set(ids)
+        i = 0
+        for y in range(y0, y1):
+            for idx in range(y * self.cols + x0, y * self.cols + x1):
+                new = ids[cells[i]]
+                prev = owners[idx]
+                if prev != new:
+                    owners[idx] = new
+                    counts[prev] -= 1
+                    counts[new] += 1
+                    touched.add(prev)
+                i += 1
+        touched.discard(EMPTY)
+        for owner_id in touched:
+            if counts[owner_id] == 0:
+                self._release(owner_id)
+        self._version += 1
+        # these changes aren't in the history, so no client can catch up across them
+        self._history.clear()
+
+    def take_dirty(self):
+        """Chunks (cx, cy) painted since the last call, and forget them."""
+        dirty, self._dirty = self._dirty, set()
+        return dirty
+
+    def cells(self):
+        """(x, y, username) for every painted cell."""
+        cols = self.cols
+        names = self._names
+        return [
+            (idx % cols, idx // cols, names[owner_id])
+            for idx, owner_id in enumerate(self._owners)
+            if owner_id != EMPTY
+        ]
+
+    def __len__(self):
+        """Number of painted cells."""
+        return len(self._owners) - self._counts[EMPTY]
@@ -0,0 +1,186 @@
+# backend/game/interest.py
+import math
+import os
+
+# side length of one area-of-interest chunk, in cells
+CHUNK_SIZE = int(os.environ.get('CHUNK_SIZE', 32))
+
+# what we assume a client can see until it tells us (matches GameCanvas)
+DEFAULT_VIEW_COLS = 25
+DEFAULT_VIEW_ROWS = 25
+
+
+def parse_viewport(data):
+    """{cols, rows, x, y} of a `viewport` message, or None if it isn't one.
+
+    All four are numbers; cols/rows default to what GameCanvas draws and
+    x/y may be left out together (the view then follows the player).
+    """
+    if not isinstance(data, dict) or (data.get('x') is None) != (data.get('y') is None):
+        return None
+    view = {
+        'cols': data.get('cols', DEFAULT_VIEW_COLS),
+        'rows': data.get('rows', DEFAULT_VIEW_ROWS),
+        'x': data.get('x'),
+        'y': data.get('y'),
+    }
+    for key, value in view.items():
+        if value is None and key in ('x', 'y'):
+            continue
+        if type(value) not in (int, float) or not math.isfinite(value):
+            return None
+        view[key] = int(value)
+    return view
+
+
+def chunk_of(x, y, size=CHUNK_SIZE):
+    return x // size, y // size
+
+
+def chunk_room(room, chunk):
+    """Socket.IO room name for one chunk of a game room, e.g. 'main:1:3'."""
+    return f"{room}:{chunk[0]}:{chunk[1]}"
+
+
+def whole_room(room):
+    """Socket.IO room of the tabs that get every change in a game room, e.g. 'main:all'.
+
+    Tabs holding the whole grid (joined without `aoi`) are in it instead
+    of chunk rooms.
+    """
+    return f"{room}:all"
+
+
+class ChunkIndex:
+    """Uniform bucket grid over player positions: chunk -> usernames."""
+
+    def __init__(self, size=CHUNK_SIZE):
+        self.size = size
+        self._buckets = {}
+        self._where = {}
+
+    def update(self, username, x, y):
+        """Record a player's position; returns (old_chunk, new_chunk)."""
+        new = chunk_of(x, y, self.size)
+        old = self._where.get(username)
+        if old != new:
+            if old is not None:
+                self._discard(old, username)
+            self._buckets.setdefault(new, set()).add(username)
+            self._where[username] = new
+        return old, new
+
+    def remove(self, username):
+        old = self._where.pop(username, None)
+        if old is not None:
+            self._discard(old, username)
+        return old
+
+    def chunk(self, username):
+        return self._where.get(username)
+
+    def players(self):
+        """Usernames of everyone in the index."""
+        return set(self._where)
+
+    def players_in(self, chunks):
+        """Usernames of everyone currently inside any of the given chunks."""
+        found = set()
+        for c in chunks:
+            found |= self._buckets.get(c, set())
+        return found
+
+    def _discard(self, chunk, username):
+        bucket = self._buckets.get(chunk)
+        if bucket is not None:
+            bucket.discard(username)
+            if not bucket:
+                del self._buckets[chunk]
+
+
+class Viewports:
+    """Which chunks each socket is subscribed to.
+
+    A viewport is a cols x rows rectangle. By default it follows the
+    player's own position and uses the same camera clamping as the
+    client. A client can also pin it at a fixed x, y, e.g. to spectate.
+    """
+
+    def __init__(self, world_cols, world_rows, size=CHUNK_SIZE):
+        self.world_cols = world_cols
+        self.world_rows = world_rows
+        self.size = size
+        # sid -> {'cols', 'rows', 'x', 'y', 'send_chunks', 'chunks'};
+        # x/y None = follow the player
+        self._views = {}
+        # username -> sids on this worker
+        self._by_user = {}
+
+    def set(self, sid, username, cols=DEFAULT_VIEW_COLS, rows=DEFAULT_VIEW_ROWS,
+            x=None, y=None, chunks=False):
+        """Declare a socket's viewport; `chunks` = it wants grid data per chunk."""
+        view = self._views.setdefault(sid, {'chunks': frozenset()})
+        view.update(username=username,
+                    cols=max(1, min(cols, self.world_cols)),
+                    rows=max(1, min(rows, self.world_rows)),
+                    x=x, y=y, send_chunks=chunks)
+        self._by_user.setdefault(username, set()).add(sid)
+
+    def sids(self, username):
+        """This worker's sockets showing username's view."""
+        return self._by_user.get(username, ())
+
+    def usernames(self):
+        """Players with a socket on this worker."""
+        return list(self._by_user)
+
+    def wants_chunks(self, sid):
+        view = self._views.get(sid)
+        return bool(view and view['send_chunks'])
+
+    def chunks(self, sid):
+        view = self._views.get(sid)
+        return view['chunks'] if view else frozenset()
+
+    def remove(self, sid):
+        """Forget a socket; returns the chunks it was subscribed to."""
+        view = self._views.pop(sid, None)
+        if view is None:
+            return frozenset()
+        sids = self._by_user.get(view['username'])
+        if sids is not None:
+            sids.discard(sid)
+            if not sids:
+                del self._by_user[view['username']]
+        return view['chunks']
+
+    def refresh(self, sid, position):
+        """Recompute a socket's chunks for the player's position.
+
+        Returns (added, removed) chunk sets; both are empty when the
+        camera stayed inside the same chunks, which is the common case.
+        """
+        view = self._views.get(sid)
+        if view is None:
+            return frozenset(), frozenset()
+
+        cols, rows = view['cols'], view['rows']
+        if view['x'] is None:
+            # same clamping as the client camera in GameCanvas.jsx
+            left = max(0, min(position['x'] - cols // 2, self.world_cols - cols))
+            top = max(0, min(position['y'] - rows // 2, self.world_rows - rows))
+        else:
+            left = max(0, min(view['x'], self.world_cols - cols))
+            top = max(0, min(view['y'], self.world_rows - rows))
+
+        size = self.size
+        chunks = frozenset(
+            (cx, cy)
+            for cx in range(left // size, (left + cols - 1) // size + 1)
+            for cy in range(top // size, (top + rows - 1) // size + 1)
+        )
+        old = view['chunks']
+        if chunks == old:
+            return frozenset(), frozenset()
+        view['chunks'] = chunks
+        return chunks - old, old - chunks
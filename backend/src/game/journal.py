@@ -0,0 +1,414 @@
+# backend/game/journal.py
+"""Append-only paint journal of a grid, for replays and timelapses.
+
+Three files per shard in GRID_JOURNAL_DIR:
+
+  <shard>.journal    JOURNAL_HEADER, then one RECORD per paint:
+                     timestamp (float64 seconds), x, y, owner id (uint16 each)
+                     and a reserved uint16; 16 bytes, so record i sits at a
+                     fixed offset and timestamps can be binary searched.
+  <shard>.keyframes  KEYFRAME_HEADER, then fixed-size frames: timestamp,
+                     record index (the records before it are applied) and
+                     the owner id of every cell as little-endian uint16.
+  <shard>.names      owner id n is the JSON string on line n.
+
+Owner ids are the journal's own (stable across restarts), not GridStore's.
+"""
+import bisect
+import fcntl
+import json
+import logging
+import mmap
+import os
+import struct
+import sys
+import threading
+import time
+from array import array
+
+from game.grid import EMPTY, MAX_OWNERS, GridStore
+from offload import WorkerPool, PoolSaturated, PoolTimeout
+
+# where journals go; empty = no journal
+GRID_JOURNAL_DIR = os.environ.get('GRID_JOURNAL_DIR', '')
+# a keyframe every this many records bounds how many records a seek replays
+JOURNAL_KEYFRAME_RECORDS = int(os.environ.get('JOURNAL_KEYFRAME_RECORDS', 50000))
+# the journal file grows (and is remapped) this many records at a time
+JOURNAL_GROW_RECORDS = int(os.environ.get('JOURNAL_GROW_RECORDS', 1 << 20))
+# seconds between forcing written records out to disk
+JOURNAL_SYNC_INTERVAL = float(os.environ.get('JOURNAL_SYNC_INTERVAL', 5))
+# keyframe writes waiting for the writer thread / seconds before giving up
+KEYFRAME_POOL_QUEUE = int(os.environ.get('KEYFRAME_POOL_QUEUE', 16))
+KEYFRAME_TIMEOUT = float(os.environ.get('KEYFRAME_TIMEOUT', 30.0))
+# replays rebuilt at once / allowed to wait / seconds before giving up
+REPLAY_POOL_SIZE = int(os.environ.get('REPLAY_POOL_SIZE', 1))
+REPLAY_POOL_QUEUE = int(os.environ.get('REPLAY_POOL_QUEUE', 4))
+REPLAY_TIMEOUT = float(os.environ.get('REPLAY_TIMEOUT', 30.0))
+
+# one thread, so every journal's keyframes land in the order they were taken
+keyframe_pool = WorkerPool('keyframe', 1, KEYFRAME_POOL_QUEUE, KEYFRAME_TIMEOUT)
+# a rebuild replays up to JOURNAL_KEYFRAME_RECORDS records in Python
+replay_pool = WorkerPool('replay', REPLAY_POOL_SIZE, REPLAY_POOL_QUEUE, REPLAY_TIMEOUT)
+
+ReplayBusy = (PoolSaturated, PoolTimeout)
+
+JOURNAL_MAGIC = b'GRIDJRNL'
+KEYFRAME_MAGIC = b'GRIDKEYF'
+FORMAT_VERSION = 1
+# magic, format version, cols, rows, record size, record count; padded to 64 bytes
+JOURNAL_HEADER = struct.Struct('<8sHHHHQ')
+HEADER_SIZE = 64
+COUNT_OFFSET = 16
+RECORD = struct.Struct('<dHHHH')
+# magic, format version, cols, rows; then per frame: timestamp, record index
+KEYFRAME_HEADER = struct.Struct('<8sHHH')
+FRAME_HEADER = struct.Struct('<dQ')
+
+
+def journal_paths(directory, shard):
+    base = os.path.join(directory, shard)
+    return f"{base}.journal", f"{base}.keyframes", f"{base}.names"
+
+
+def _le(owners):
+    if sys.byteorder == 'big':
+        owners = owners[:]
+        owners.byteswap()
+    return owners.tobytes()
+
+
+def _from_le(data):
+    owners = array('H')
+    owners.frombytes(data)
+    if sys.byteorder == 'big':
+        owners.byteswap()
+    return owners
+
+
+class GridJournal:
+    """Writes one shard's paints to its journal files.
+
+    record() packs a frame straight into the memory-mapped journal, so a
+    paint costs a struct.pack_into; the OS writes pages back, and a
+    background task started by start() forces them out every
+    JOURNAL_SYNC_INTERVAL seconds. A keyframe is taken every
+    JOURNAL_KEYFRAME_RECORDS records and by keyframe_from() on open; once
+    started, that task also writes them out on the keyframe pool.
+    """
+
+    def __init__(self, directory, shard, cols, rows, keyframe_records=JOURNAL_KEYFRAME_RECORDS,
+                 grow_records=JOURNAL_GROW_RECORDS, interval=JOURNAL_SYNC_INTERVAL,
+                 pool=keyframe_pool):
+        self.shard = shard
+        self.cols = cols
+        self.rows = rows
+        self.keyframe_records = keyframe_records
+        self.grow_records = grow_records
+        self.interval = interval
+        self.pool = pool
+        self._task = None
+        # keyframes taken but not written yet, as (frame header, owners copy)
+        self._frames = []
+        # the writer thread and close() both write the keyframe file
+        self._write_lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+        journal_path, keyframes_path, names_path = journal_paths(directory, shard)
+
+        self._file = open(journal_path, 'a+b')
+        try:
+            # two workers appending to one journal would interleave garbage
+            fcntl.flock(self._file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            self._file.close()
+            raise
+        self._file.seek(0, os.SEEK_END)
+        if self._file.tell() < HEADER_SIZE:
+            self._file.truncate(0)
+            self._file.write(JOURNAL_HEADER.pack(JOURNAL_MAGIC, FORMAT_VERSION, cols, rows,
+                                                 RECORD.size, 0).ljust(HEADER_SIZE, b'\0'))
+            self._file.flush()
+        self._map()
+        magic, _, jcols, jrows, _, self._count = JOURNAL_HEADER.unpack_from(self._mm)
+        if magic != JOURNAL_MAGIC or (jcols, jrows) != (cols, rows):
+            self.close()
+            raise ValueError(f"{journal_path} is not a {cols}x{rows} grid journal")
+
+        self._keyframes = open(keyframes_path, 'ab')
+        if self._keyframes.tell() == 0:
+            self._keyframes.write(KEYFRAME_HEADER.pack(KEYFRAME_MAGIC, FORMAT_VERSION, cols, rows))
+            self._keyframes.flush()
+
+        # journal owner ids: index = id, [0] = EMPTY
+        self._names = [None]
+        if os.path.exists(names_path):
+            with open(names_path, encoding='utf-8') as f:
+                self._names += [json.loads(line) for line in f if line.strip()]
+        self._ids = {name: i for i, name in enumerate(self._names) if i}
+        self._names_file = open(names_path, 'a', encoding='utf-8')
+
+        # the owners as of the last record, for the next keyframe
+        self._owners = array('H', bytes(2 * cols * rows))
+        self._since_keyframe = 0
+        # timestamps never go backwards, even if the clock does, so readers can bisect
+        self._last_at = RECORD.unpack_from(self._mm, HEADER_SIZE + (self._count - 1) * RECORD.size)[0] \
+            if self._count else 0.0
+        # dropped: paints not journaled because the owner table is full
+        self.metrics = {'records': self._count, 'keyframes': 0, 'syncs': 0, 'errors': 0, 'dropped': 0}
+
+    def _map(self):
+        size = self._file.seek(0, os.SEEK_END)
+        self._mm = mmap.mmap(self._file.fileno(), size)
+        self._capacity = (size - HEADER_SIZE) // RECORD.size
+
+    def _grow(self):
+        self._mm.flush()
+        self._mm.close()
+        self._file.truncate(HEADER_SIZE + (self._capacity + self.grow_records) * RECORD.size)
+        self._map()
+
+    def _intern(self, username):
+        """Journal owner id of username, or None once the owner table is full.
+
+        Ids are stable across restarts, so the table only ever grows; after
+        MAX_OWNERS names, new players' paints go unjournaled.
+        """
+        owner_id = self._ids.get(username)
+        if owner_id is None:
+            owner_id = len(self._names)
+            if owner_id > MAX_OWNERS:
+                return None
+            self._names_file.write(json.dumps(username) + '\n')
+            self._names_file.flush()
+            self._names.append(username)
+            self._ids[username] = owner_id
+        return owner_id
+
+    def record(self, x, y, username, at=None):
+        """Append one paint (at = time.time() by default)."""
+        owner_id = self._intern(username)
+        if owner_id is None:
+            if not self.metrics['dropped']:
+                logging.error(f"the {self.shard} journal's owner table is full; "
+                              f"paints by new players are not journaled")
+            self.metrics['dropped'] += 1
+            return
+        if self._count >= self._capacity:
+            self._grow()
+        at = self._last_at = max(time.time() if at is None else at, self._last_at)
+        RECORD.pack_into(self._mm, HEADER_SIZE + self._count * RECORD.size, at, x, y, owner_id, 0)
+        self._count += 1
+        # readers only trust records the count covers
+        struct.pack_into('<Q', self._mm, COUNT_OFFSET, self._count)
+        self._owners[y * self.cols + x] = owner_id
+        self.metrics['records'] += 1
+        self._since_keyframe += 1
+        if self._since_keyframe >= self.keyframe_records:
+            self.keyframe()
+
+    def keyframe(self, at=None):
+        """Take the current owners as a keyframe after the last record.
+
+        Only the owners are copied here; once start() has run, the
+        background task writes the frame out, so a paint that lands on
+        a keyframe doesn't wait for the disk.
+        """
+        at = max(time.time() if at is None else at, self._last_at)
+        self._frames.append((FRAME_HEADER.pack(at, self._count), array('H', self._owners)))
+        self._since_keyframe = 0
+        if self._task is None:
+            self._write_frames()
+
+    def _write_frames(self):
+        frames, self._frames = self._frames, []
+        self._write(frames)
+
+    def _write(self, frames):
+        with self._write_lock:
+            if self._keyframes.closed:
+                return
+            for header, owners in frames:
+                self._keyframes.write(header)
+                self._keyframes.write(_le(owners))
+            self._keyframes.flush()
+            self.metrics['keyframes'] += len(frames)
+
+    def keyframe_from(self, grid):
+        """Take the owners from a GridStore (e.g. just restored) and keyframe them."""
+        raw, owners = grid.snapshot()
+        ids = {EMPTY: EMPTY}
+        for owner_id, username, _ in owners:
+            journal_id = self._intern(username)
+            ids[owner_id] = EMPTY if journal_id is None else journal_id
+        self._owners = array('H', (ids[i] for i in raw))
+        self.keyframe()
+
+    def start(self, socketio):
+        if self._task is None:
+            self._task = socketio.start_background_task(self._run, socketio)
+
+    def _run(self, socketio):
+        while True:
+            socketio.sleep(self.interval)
+            try:
+                self.sync()
+            except Exception:
+                self.metrics['errors'] += 1
+                logging.exception(f"syncing the {self.shard} journal failed")
+            if self._frames:
+                frames, self._frames = self._frames, []
+                try:
+                    self.pool.run(self._write, frames)
+                except PoolSaturated:
+                    # not started: try again next time, still in order
+                    self._frames[:0] = frames
+                except PoolTimeout:
+                    # still being written; don't write it twice
+                    logging.warning(f"writing {self.shard} keyframes is slow")
+                except Exception:
+                    self.metrics['errors'] += 1
+                    logging.exception(f"writing the {self.shard} keyframes failed")
+
+    def sync(self):
+        """Write dirty journal pages back to disk."""
+        self._mm.flush()
+        self.metrics['syncs'] += 1
+
+    def close(self):
+        if getattr(self, '_keyframes', None) is not None and not self._keyframes.closed:
+            self._write_frames()
+        if getattr(self, '_mm', None) is not None and not self._mm.closed:
+            self._mm.flush()
+            self._mm.close()
+        # drop the unused tail so the file is exactly header + records
+        self._file.truncate(HEADER_SIZE + getattr(self, '_count', 0) * RECORD.size)
+        self._file.close()
+        if getattr(self, '_keyframes', None) is not None:
+            with self._write_lock:
+                self._keyframes.close()
+        if getattr(self, '_names_file', None) is not None:
+            self._names_file.close()
+
+
+def open_journal(shard, cols, rows, directory=GRID_JOURNAL_DIR):
+    """A GridJournal for shard, or None if journaling is off or another process has it."""
+    if not directory:
+        return None
+    try:
+        return GridJournal(directory, shard, cols, rows)
+    except (OSError, ValueError) as e:
+        logging.warning(f"no paint journal for {shard}: {e}")
+        return None
+
+
+class JournalReader:
+    """Read-only view of a shard's journal files, e.g. to rebuild the grid at a time."""
+
+    def __init__(self, directory, shard):
+        journal_path, keyframes_path, names_path = journal_paths(directory, shard)
+        with open(journal_path, 'rb') as f:
+            self._journal = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, _, self.cols, self.rows, _, count = JOURNAL_HEADER.unpack_from(self._journal)
+        if magic != JOURNAL_MAGIC:
+            raise ValueError(f"{journal_path} is not a grid journal")
+        # a writer may have mapped more than it wrote
+        self.count = min(count, (len(self._journal) - HEADER_SIZE) // RECORD.size)
+
+        self._frame_size = FRAME_HEADER.size + 2 * self.cols * self.rows
+        with open(keyframes_path, 'rb') as f:
+            data = f.read(KEYFRAME_HEADER.size)
+            self._keyframes = (mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+                               if os.fstat(f.fileno()).st_size > KEYFRAME_HEADER.size else b'')
+        if data[:8] != KEYFRAME_MAGIC:
+            raise ValueError(f"{keyframes_path} is not a keyframe file")
+        self.keyframe_count = max(len(self._keyframes) - KEYFRAME_HEADER.size, 0) // self._frame_size
+
+        with open(names_path, encoding='utf-8') as f:
+            self.names = [None] + [json.loads(line) for line in f if line.strip()]
+
+    def record(self, i):
+        """(timestamp, x, y, owner id) of record i."""
+        at, x, y, owner_id, _ = RECORD.unpack_from(self._journal, HEADER_SIZE + i * RECORD.size)
+        return at, x, y, owner_id
+
+    def span(self):
+        """(first, last) record timestamps, or None for an empty journal."""
+        if not self.count:
+            return None
+        return self.record(0)[0], self.record(self.count - 1)[0]
+
+    def index_at(self, at):
+        """Number of records at or before timestamp `at` (records are in time order)."""
+        return bisect.bisect_right(_Timestamps(self), at)
+
+    def _keyframe(self, k):
+        offset = KEYFRAME_HEADER.size + k * self._frame_size
+        at, index = FRAME_HEADER.unpack_from(self._keyframes, offset)
+        return at, index, offset + FRAME_HEADER.size
+
+    def _last_keyframe(self, index):
+        """Latest keyframe taken at or before record `index`, as (record index, owners)."""
+        lo, hi = 0, self.keyframe_count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._keyframe(mid)[1] <= index:
+                lo = mid + 1
+            else:
+                hi = mid
+        if lo == 0:
+            return 0, array('H', bytes(2 * self.cols * self.rows))
+        _, start, offset = self._keyframe(lo - 1)
+        return start, _from_le(self._keyframes[offset:offset + 2 * self.cols * self.rows])
+
+    def owners_at(self, at):
+        """Owner ids (journal ids, row-major) of every cell at timestamp `at`."""
+        index = self.index_at(at)
+        start, owners = self._last_keyframe(index)
+        self._apply(owners, start, index)
+        return owners
+
+    def _apply(self, owners, start, end):
+        cols = self.cols
+        for i in range(start, end):
+            _, x, y, owner_id = self.record(i)
+            owners[y * cols + x] = owner_id
+
+    def frames(self, times):
+        """Owner arrays at each of the increasing timestamps `times`, replayed incrementally."""
+        owners, position = None, 0
+        for at in times:
+            index = self.index_at(at)
+            start, keyframe = self._last_keyframe(index)
+            if owners is None or start > position:
+                # jumping past a keyframe beats replaying everything up to it
+                owners, position = keyframe, start
+            self._apply(owners, position, index)
+            position = index
+            yield at, owners
+
+    def rebuild(self, at):
+        """A GridStore holding the grid as it was at timestamp `at`."""
+        grid = GridStore(self.cols, self.rows)
+        grid.load_region(0, 0, self.cols, self.rows, self.owners_at(at), self.names[1:])
+        return grid
+
+
+def replay(directory, shard, at):
+    """(JournalReader, rebuilt GridStore) of shard at timestamp `at`.
+
+    Blocking: handlers run it on replay_pool.
+    """
+    reader = JournalReader(directory, shard)
+    return reader, reader.rebuild(at)
+
+
+class _Timestamps:
+    """Sequence of a reader's record timestamps, for bisect."""
+
+    def __init__(self, reader):
+        self.reader = reader
+
+    def __len__(self):
+        return self.reader.count
+
+    def __getitem__(self, i):
+        return self.reader.record(i)[0]
@@ -0,0 +1,116 @@
+# backend/game/leaderboard.py
+import os
+from bisect import bisect_left, insort
+
+# how many players the in-memory leaderboard keeps, and the most one request may ask for
+LEADERBOARD_SIZE = int(os.environ.get('LEADERBOARD_SIZE', 100))
+LEADERBOARD_MAX_LIMIT = 100
+
+ENTRY_FIELDS = {"username": 1, "max_score": 1, "games_played": 1, "average_score": 1, "_id": 0}
+# players who finished a game; documents holding only a color aren't on the board
+LEADERBOARD_FILTER = {"max_score": {"$exists": True}}
+
+
+class Leaderboard:
+    """Top-K players by best score, kept sorted in memory.
+
+    Warmed once from the players collection, then kept current by
+    record_game() (a finished session) and live_score() (a player's score
+    in the game going on right now, which may already be their best).
+    `version` changes whenever the visible ranking does; etag() builds the
+    HTTP validator from it.
+    """
+
+    def __init__(self, size=LEADERBOARD_SIZE):
+        self.size = size
+        # username -> {username, max_score, games_played, average_score}
+        self._entries = {}
+        # (-max_score, username), best first
+        self._order = []
+        self.version = 0
+        # each worker has its own board, so its versions mean nothing elsewhere
+        self._epoch = os.urandom(4).hex()
+
+    def warm(self, docs):
+        """Load entries (e.g. the top of player_collection) into an empty board."""
+        for doc in docs:
+            self._put(dict(doc, max_score=doc.get("max_score", 0)))
+
+    def _floor(self):
+        """Score needed to get onto a full board."""
+        if len(self._order) < self.size:
+            return -1
+        return -self._order[-1][0]
+
+    def _put(self, entry):
+        username = entry["username"]
+        old = self._entries.get(username)
+        if old is not None:
+            del self._order[bisect_left(self._order, (-old["max_score"], username))]
+        elif entry["max_score"] <= self._floor():
+            return False
+
+        self._entries[username] = entry
+        insort(self._order, (-entry["max_score"], username))
+        if len(self._order) > self.size:
+            _, dropped = self._order.pop()
+            del self._entries[dropped]
+        self.version += 1
+        return True
+
+    def live_score(self, username, score):
+        """A player currently holds `score` cells; count it as a best score if it is one.
+
+        Returns True when this put a player on the board who wasn't on it,
+        whose stored stats should then be passed to fill().
+        """
+        entry = self._entries.get(username)
+        if entry is not None:
+            if score > entry["max_score"]:
+                self._put(dict(entry, max_score=score))
+            return False
+        if score > self._floor():
+            return self._put({"username": username, "max_score": score,
+                              "games_played": 0, "average_score": 0})
+        return False
+
+    def fill(self, username, doc):
+        """Merge a player's stored stats into an entry created by live_score()."""
+        entry = self._entries.get(username)
+        if entry is None or not doc:
+            return
+        # record_game() may already have counted sessions the lookup didn't see
+        games = entry["games_played"] + doc.get("games_played", 0)
+        total = (entry["average_score"] * entry["games_played"]
+                 + doc.get("average_score", 0) * doc.get("games_played", 0))
+        self._put(dict(entry,
+                       max_score=max(entry["max_score"], doc.get("max_score", 0)),
+                       games_played=games,
+                       average_score=total / games if games else 0))
+
+    def record_game(self, username, score):
+        """A session ended with `score`; fold it into the player's entry.
+
+        Returns True, like live_score(), when this put the player on the
+        board; fill() then adds their stored stats to this session.
+        """
+        entry = self._entries.get(username)
+        new = entry is None
+        if new:
+            if score <= self._floor():
+                return False
+            entry = {"username": username, "max_score": score,
+                     "games_played": 0, "average_score": 0}
+        games = entry.get("games_played", 0)
+        total = entry.get("average_score", 0) * games + score
+        added = self._put(dict(entry,
+                               max_score=max(entry["max_score"], score),
+                               games_played=games + 1,
+                               average_score=total / (games + 1)))
+        return new and added
+
+    def top(self, limit):
+        return [self._entries[u] for _, u in self._order[:limit]]
+
+    def etag(self, limit):
+        return f"{self._epoch}-{self.version}-{limit}"
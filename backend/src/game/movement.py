@@ -0,0 +1,79 @@
+# backend/game/movement.py
+import os
+import time
+
+# sustained moves per second allowed per player, and how many may come at once
+MOVE_RATE = float(os.environ.get('MOVE_RATE', 12))
+MOVE_BURST = float(os.environ.get('MOVE_BURST', 5))
+
+# what clients may send as `dir`
+DIRECTIONS = {
+    'up': (0, -1),
+    'down': (0, 1),
+    'left': (-1, 0),
+    'right': (1, 0),
+}
+
+
+def parse_step(data):
+    """The (dx, dy) a `move` message asks for, or None if it isn't one step.
+
+    Clients send {dir: 'up'|'down'|'left'|'right'} or {dx, dy}; the server
+    applies it to the player's canonical position.
+    """
+    if not isinstance(data, dict):
+        return None
+    direction = data.get('dir')
+    if direction is not None:
+        # a list or dict can't be looked up
+        return DIRECTIONS.get(direction) if isinstance(direction, str) else None
+    dx, dy = data.get('dx'), data.get('dy')
+    if type(dx) is int and type(dy) is int and abs(dx) + abs(dy) == 1:
+        return dx, dy
+    return None
+
+
+class TokenBucket:
+    """`rate` tokens per second, holding at most `burst`."""
+
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+
+    def take(self, now):
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens < 1:
+            return False
+        self.tokens -= 1
+        return True
+
+
+class MoveLimiter:
+    """One TokenBucket per player; moves beyond the rate are dropped.
+
+    Keyed by username, so several tabs share one budget. Ticks already
+    coalesce a player's moves into their latest position, so this bounds
+    what a player can cost: MOVE_RATE paints and index updates per second.
+    """
+
+    def __init__(self, rate=MOVE_RATE, burst=MOVE_BURST):
+        self.rate = rate
+        self.burst = burst
+        self._buckets = {}
+        self.metrics = {'allowed': 0, 'dropped': 0}
+
+    def allow(self, username):
+        bucket = self._buckets.get(username)
+        if bucket is None:
+            bucket = self._buckets[username] = TokenBucket(self.rate, self.burst)
+        if bucket.take(time.monotonic()):
+            self.metrics['allowed'] += 1
+            return True
+        self.metrics['dropped'] += 1
+        return False
+
+    def remove(self, username):
+        self._buckets.pop(username, None)
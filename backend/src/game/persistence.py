@@ -0,0 +1,212 @@
+# backend/game/persistence.py
+import logging
+import os
+import sys
+import time
+from array import array
+
+from bson.binary import Binary
+from pymongo import ReplaceOne, UpdateOne
+
+from game.grid import EMPTY
+from game.interest import CHUNK_SIZE
+
+# seconds between flushes, and max operations per bulk_write
+PERSIST_INTERVAL = float(os.environ.get('PERSIST_INTERVAL', 5))
+PERSIST_BATCH_SIZE = int(os.environ.get('PERSIST_BATCH_SIZE', 500))
+
+
+def stats_update(username, games, total, best, worst):
+    """One upsert folding `games` finished sessions into a player's stats.
+
+    Uses an update pipeline so the new totals are computed by Mongo; no
+    read is needed first and concurrent workers can't lose each other's
+    games.
+    """
+    return UpdateOne({"username": username}, [
+        {"$set": {
+            "username": username,
+            "games_played": {"$add": [{"$ifNull": ["$games_played", 0]}, games]},
+            "total_score": {"$add": [{"$ifNull": ["$total_score", 0]}, total]},
+            "max_score": {"$max": [{"$ifNull": ["$max_score", 0]}, best]},
+            "min_score": {"$min": [{"$ifNull": ["$min_score", worst]}, worst]},
+        }},
+        {"$set": {"average_score": {"$divide": ["$total_score", "$games_played"]}}},
+    ], upsert=True)
+
+
+def stored_chunks(chunks_collection, world):
+    """Every saved chunk document of a world, for WriteBehind.restore().
+
+    A blocking query: handlers run it on the db pool.
+    """
+    return list(chunks_collection.find({'world': world}))
+
+
+class WriteBehind:
+    """Periodically writes dirty grid chunks and finished-game stats to Mongo.
+
+    Handlers only touch memory: the grid marks the chunks it changes, and
+    record_game() adds a session's score to a per-player tally. A background
+    task flushes both every PERSIST_INTERVAL seconds with unordered
+    bulk_writes of at most PERSIST_BATCH_SIZE operations.
+    """
+
+    def __init__(self, socketio, grid, cols, rows, chunks_collection, stats_collection,
+                 world='main', chunk_size=CHUNK_SIZE, pool=None,
+                 interval=PERSIST_INTERVAL, batch_size=PERSIST_BATCH_SIZE):
+        self.socketio = socketio
+        self.grid = grid
+        self.cols = cols
+        self.rows = rows
+        self.chunks_collection = chunks_collection
+        self.stats_collection = stats_collection
+        self.world = world
+        self.chunk_size = chunk_size
+        # WorkerPool for the bulk writes, so a flush doesn't block the event loop
+        self.pool = pool
+        self.interval = interval
+        self.batch_size = batch_size
+        # username -> [games, total, best, worst] not yet written
+        self._pending_stats = {}
+        # chunks whose last write failed
+        self._retry_chunks = set()
+        # when the oldest unwritten change happened (None = nothing pending)
+        self._pending_since = None
+        self._last_flush = time.time()
+        self._task = None
+        self.metrics = {
+            'flushes': 0,
+            'chunks_written': 0,
+            'stats_written': 0,
+            'errors': 0,
+            'last_flush_seconds': 0.0,
+            'flush_lag_seconds': 0.0,
+        }
+
+    def record_game(self, username, score):
+        """Queue one finished session's score for the player's stats."""
+        self._merge(username, [1, score, score, score])
+
+    def _merge(self, username, tally):
+        pending = self._pending_stats.get(username)
+        if pending is None:
+            self._pending_stats[username] = list(tally)
+        else:
+            pending[0] += tally[0]
+            pending[1] += tally[1]
+            pending[2] = max(pending[2], tally[2])
+            pending[3] = min(pending[3], tally[3])
+        if self._pending_since is None:
+            self._pending_since = time.time()
+
+    def pending_stats(self, username):
+        """Not-yet-written [games, total, best, worst] for a player, or None."""
+        return self._pending_stats.get(username)
+
+    def start(self):
+        if self._task is None:
+            self._task = self.socketio.start_background_task(self._run)
+
+    def _run(self):
+        while True:
+            self.socketio.sleep(self.interval)
+            try:
+                self.flush()
+            except Exception:
+                self.metrics['errors'] += 1
+                logging.exception("write-behind flush failed")
+
+    def flush(self):
+        """Write everything pending; returns the number of operations sent."""
+        started = time.time()
+        dirty = self.grid.take_dirty() | self._retry_chunks
+        self._retry_chunks = set()
+        stats, self._pending_stats = self._pending_stats, {}
+
+        # grid changes are only known to be at most one interval old
+        oldest = self._pending_since
+        if dirty:
+            oldest = min(oldest or started, self._last_flush)
+        self._pending_since = None
+
+        try:
+            chunk_ops = [self._chunk_op(c) for c in dirty]
+            stat_ops = [stats_update(u, *tally) for u, tally in stats.items()]
+            self._write(self.chunks_collection, chunk_ops)
+            self._write(self.stats_collection, stat_ops)
+        except Exception:
+            # keep the data for the next round instead of dropping it; chunk
+            # writes are idempotent and a failed unordered batch may have
+            # applied some stats, so those may count twice at worst
+            self._retry_chunks |= dirty
+            for u, tally in stats.items():
+                self._merge(u, tally)
+            raise
+
+        finished = time.time()
+        self._last_flush = finished
+        self.metrics['flushes'] += 1
+        self.metrics['chunks_written'] += len(chunk_ops)
+        self.metrics['stats_written'] += len(stat_ops)
+        self.metrics['last_flush_seconds'] = finished - started
+        self.metrics['flush_lag_seconds'] = finished - oldest if oldest else 0.0
+        if self.metrics['flush_lag_seconds'] > 2 * self.interval:
+            logging.warning(f"write-behind lag {self.metrics['flush_lag_seconds']:.1f}s")
+        return len(chunk_ops) + len(stat_ops)
+
+    def _write(self, collection, ops):
+        for i in range(0, len(ops), self.batch_size):
+            batch = ops[i:i + self.batch_size]
+            if self.pool is None:
+                collection.bulk_write(batch, ordered=False)
+            else:
+                # a big batch may legitimately take longer than a handler's query
+                self.pool.run(collection.bulk_write, batch, ordered=False,
+                              timeout=max(self.pool.timeout, self.interval))
+
+    def _chunk_op(self, chunk):
+        """Replace one stored chunk: local palette of usernames + little-endian uint16 cells."""
+        size = self.chunk_size
+        x0, y0 = chunk[0] * size, chunk[1] * size
+        x1, y1 = min(x0 + size, self.cols), min(y0 + size, self.rows)
+        part = self.grid.region(x0, y0, x1, y1)
+        ids = sorted(set(part) - {EMPTY})
+        local = {owner_id: i + 1 for i, owner_id in enumerate(ids)}
+        local[EMPTY] = 0
+        cells = array('H', (local[owner_id] for owner_id in part))
+        if sys.byteorder == 'big':
+            cells.byteswap()
+        doc = {
+            '_id': f"{self.world}:{chunk[0]}:{chunk[1]}",
+            'world': self.world,
+            'x': x0,
+            'y': y0,
+            'cols': x1 - x0,
+            'rows': y1 - y0,
+            'palette': [self.grid.name(owner_id) for owner_id in ids],
+            'cells': Binary(cells.tobytes()),
+        }
+        return ReplaceOne({'_id': doc['_id']}, doc, upsert=True)
+
+    def restore(self, docs):
+        """Load stored_chunks() into an empty GridStore; returns chunks loaded."""
+        if self.grid.version() != 0:
+            # another worker (or an earlier call) already filled the shared grid
+            return 0
+        loaded = 0
+        for doc in docs:
+            x0, y0 = doc['x'], doc['y']
+            x1, y1 = min(x0 + doc['cols'], self.cols), min(y0 + doc['rows'], self.rows)
+            if x1 - x0 != doc['cols'] or y1 - y0 != doc['rows']:
+                # stored with a bigger map; skip rather than misplace cells
+                continue
+            cells = array('H')
+            cells.frombytes(doc['cells'])
+            if sys.byteorder == 'big':
+                cells.byteswap()
+            self.grid.load_region(x0, y0, x1, y1, cells, doc['palette'])
+            loaded += 1
+        # what we just loaded is already stored
+        self.grid.take_dirty()
+        return loaded
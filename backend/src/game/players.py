@@ -0,0 +1,91 @@
+# backend/game/players.py
+
+
+class PlayerRegistry:
+    """Online players and the sockets (tabs) each of them has open.
+
+    Every change goes through a method so the registry can also live in the
+    state broker process (see game/state.py) and be used through a proxy.
+    Records returned by get() are copies; use update() to change them.
+    """
+
+    def __init__(self):
+        # username: { username, position:{x,y}, room, color, avatar }
+        self._players = {}
+        # username: set(sid1, sid2, ...)
+        self._sids = {}
+        # sid: username
+        self._owner = {}
+
+    def has(self, username):
+        return username in self._players
+
+    def get(self, username):
+        """A copy of the player's record, or None if they're not online."""
+        record = self._players.get(username)
+        return dict(record) if record is not None else None
+
+    def many(self, usernames):
+        return [dict(self._players[u]) for u in usernames if u in self._players]
+
+    def add(self, username, record):
+        """Add a player unless they're already online; returns the stored record."""
+        if username not in self._players:
+            self._players[username] = dict(record)
+            self._sids[username] = set()
+        return dict(self._players[username])
+
+    def update(self, username, **fields):
+        """Set fields on an online player's record; returns the new record."""
+        record = self._players.get(username)
+        if record is None:
+            return None
+        record.update(fields)
+        return dict(record)
+
+    def step(self, username, dx, dy, cols, rows):
+        """Move a player one step, kept inside cols x rows; the new record, or
+        None if they're not online or the step would leave the map."""
+        record = self._players.get(username)
+        if record is None:
+            return None
+        x, y = record['position']['x'] + dx, record['position']['y'] + dy
+        if not (0 <= x < cols and 0 <= y < rows):
+            return None
+        record['position'] = {'x': x, 'y': y}
+        return dict(record)
+
+    def remove(self, username):
+        for sid in self._sids.pop(username, ()):
+            self._owner.pop(sid, None)
+        return self._players.pop(username, None)
+
+    def remove_if_idle(self, username):
+        """remove() a player with no open sockets; None if they still have one."""
+        if self._sids.get(username):
+            return None
+        return self.remove(username)
+
+    def usernames(self):
+        return list(self._players)
+
+    def connect(self, username, sid):
+        """Attach a socket to an online player; returns their number of open tabs."""
+        self._sids[username].add(sid)
+        self._owner[sid] = username
+        return len(self._sids[username])
+
+    def disconnect(self, sid):
+        """Detach a socket; returns (username, tabs left) or (None, 0) if unknown."""
+        username = self._owner.pop(sid, None)
+        if username is None:
+            return None, 0
+        sids = self._sids.get(username, set())
+        sids.discard(sid)
+        return username, len(sids)
+
+    def user_of(self, sid):
+        return self._owner.get(sid)
+
+    def sids(self, username):
+        return list(self._sids.get(username, ()))
@@ -0,0 +1,156 @@
+# backend/game/rooms.py
+import logging
+import os
+from array import array
+
+from game.analytics import GridAnalytics
+from game.interest import whole_room
+from game.persistence import WriteBehind
+from game.snapshot import SnapshotCache
+from game.tick import TickScheduler
+
+# the rooms players may ask for; any other name joins the first one
+ROOMS = [r.strip() for r in os.environ.get('GAME_ROOMS', 'main').split(',') if r.strip()]
+# players per shard, and shards per room before joins are turned away
+ROOM_CAPACITY = int(os.environ.get('ROOM_CAPACITY', 200))
+ROOM_MAX_SHARDS = int(os.environ.get('ROOM_MAX_SHARDS', 16))
+# this worker's name and the rooms it hosts ('*' = any); unnamed workers host everything
+WORKER_NAME = os.environ.get('GAME_WORKER', '')
+WORKER_ROOMS = [r.strip() for r in os.environ.get('GAME_WORKER_ROOMS', '*').split(',') if r.strip()]
+
+
+def shard_name(room, n):
+    """Shard n (from 1) of a room: main, main-2, main-3, ..."""
+    return room if n == 1 else f"{room}-{n}"
+
+
+class RoomRegistry:
+    """Which shard every online player is in, and which worker hosts each shard.
+
+    Each room starts as one shard; when every shard is at capacity the
+    next joiner opens a new one, up to max_shards. Named workers register
+    the rooms they host, and each shard is given to the eligible worker
+    hosting the fewest. Method-only, so it also works through the broker.
+    """
+
+    def __init__(self, rooms=ROOMS, capacity=ROOM_CAPACITY, max_shards=ROOM_MAX_SHARDS):
+        self.rooms = list(rooms)
+        self.capacity = capacity
+        self.max_shards = max_shards
+        # room -> its shard names, in the order they were opened; shard -> room
+        self._shards = {room: [room] for room in self.rooms}
+        self._room = {room: room for room in self.rooms}
+        # shard -> usernames in it; username -> shard
+        self._members = {}
+        self._shard_of = {}
+        # worker -> rooms it hosts (['*'] = all); shard -> worker
+        self._workers = {}
+        self._host = {}
+
+    def add_worker(self, worker, rooms):
+        self._workers[worker] = list(rooms)
+
+    def place(self, room, username, worker=''):
+        """Pick username's shard of `room` (their current one if they have one).
+
+        Returns (shard, host), host being the worker that must serve it.
+        The player is only counted in when that is `worker`, or when no
+        workers registered. (None, None) when every shard is full.
+        """
+        shard = self._shard_of.get(username)
+        if shard is None:
+            if room not in self._shards:
+                room = self.rooms[0]
+            shards = self._shards[room]
+            shard = next((s for s in shards if len(self._members.get(s, ())) < self.capacity), None)
+            if shard is None:
+                if len(shards) >= self.max_shards:
+                    return None, None
+                shard = shard_name(room, len(shards) + 1)
+                shards.append(shard)
+                self._room[shard] = room
+        host = self._host_for(shard)
+        if not host or host == worker:
+            self._members.setdefault(shard, set()).add(username)
+            self._shard_of[username] = shard
+        return shard, host
+
+    def _host_for(self, shard):
+        host = self._host.get(shard)
+        if host in self._workers or not self._workers:
+            return host
+        room = self._room[shard]
+        eligible = [w for w, rooms in self._workers.items() if '*' in rooms or room in rooms]
+        if not eligible:
+            return None
+        hosted = {w: 0 for w in eligible}
+        for w in self._host.values():
+            if w in hosted:
+                hosted[w] += 1
+        host = self._host[shard] = min(eligible, key=hosted.__getitem__)
+        return host
+
+    def leave(self, username):
+        shard = self._shard_of.pop(username, None)
+        if shard is not None:
+            self._members[shard].discard(username)
+
+    def shard_of(self, username):
+        return self._shard_of.get(username)
+
+    def shards(self):
+        """[{room, shard, players, capacity, worker}] for every open shard."""
+        return [
+            {'room': room, 'shard': shard, 'players': len(self._members.get(shard, ())),
+             'capacity': self.capacity, 'worker': self._host.get(shard)}
+            for room, shards in self._shards.items() for shard in shards
+        ]
+
+
+class Room:
+    """One shard's game on this worker: grid, who stands where, ticks and persistence.
+
+    The grid and player index come from the state backend (see
+    game/state.py); the snapshot cache, tick loop and write-behind are
+    this worker's, so a shard hosted by one worker costs the others nothing.
+    So are the paint journal, if any, and the visit counts: both record
+    the paints made through paint() on this worker.
+    """
+
+    def __init__(self, name, grid, player_index, socketio, cols, rows,
+                 chunks_collection, stats_collection, pool=None, journal=None):
+        self.name = name
+        self.grid = grid
+        self.cols = cols
+        self.rows = rows
+        self.player_index = player_index
+        # compressed copy of the grid for joining clients, reused until it changes
+        self.snapshot = SnapshotCache(grid, cols, rows)
+        # batches player_moved / cell_painted into one `tick` per chunk room
+        self.ticker = TickScheduler(socketio, score_of=grid.count, version_of=grid.version,
+                                    whole=whole_room(name))
+        # grid chunks and finished-game stats reach Mongo in the background
+        self.persistence = WriteBehind(socketio, grid, cols, rows, chunks_collection,
+                                       stats_collection, world=name, pool=pool)
+        # append-only record of every paint, for replays (see game/journal.py)
+        self.journal = journal
+        # times each cell was stepped on (every step paints), for the heatmap
+        self.visits = array('I', bytes(4 * cols * rows))
+        # territory / region / border stats, recomputed in the background
+        self.analytics = GridAnalytics(socketio, grid, self.visits, cols, rows)
+
+    def paint(self, x, y, username):
+        """Paint a cell, count the visit and journal it.
+
+        Returns the previous owner's username (or None), like GridStore.paint.
+        """
+        prev = self.grid.paint(x, y, username)
+        self.visits[y * self.cols + x] += 1
+        if self.journal is not None:
+            try:
+                self.journal.record(x, y, username)
+            except Exception:
+                # a gap in the replay, but the paint itself stands
+                self.journal.metrics['errors'] += 1
+                logging.exception(f"journaling a paint in {self.name} failed")
+        return prev
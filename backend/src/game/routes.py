@@ -1,266 +1,583 @@
 # backend/game/routes.py
 from flask import Blueprint, request, jsonify
 from flask_socketio import emit, join_room, leave_room
+from pymongo import UpdateOne
 
 # from app import socketio
 from extensions import socketio
 
-from db import users_collection, player_collection
-
+from auth.routes import avatar_listeners
+from db import (users_collection, player_collection, grid_chunks_collection,
+                db_pool, db_call, db_submit)
+from health import startup
+from metrics import export, room_event, timed
+from user_cache import get_user_profile, invalidate_profile
+from game.analytics import SORT_KEYS
+from game.colors import ColorRegistry
+from game.grid import WORLD_COLS as GRID_COLS, WORLD_ROWS as GRID_ROWS
+from game.interest import CHUNK_SIZE, Viewports, chunk_room, parse_viewport, whole_room
+from game.journal import GRID_JOURNAL_DIR, ReplayBusy, open_journal, replay, replay_pool
+from game.leaderboard import ENTRY_FIELDS, LEADERBOARD_FILTER, LEADERBOARD_MAX_LIMIT, Leaderboard
+from game.movement import MoveLimiter, parse_step
+from game.persistence import stored_chunks
+from game.rooms import WORKER_NAME, WORKER_ROOMS, Room
+from game.snapshot import SnapshotCache, chunk_payload
+from game.state import create_state
+
+import base64
+import logging
+import os
 import random
+import time
 
 game_bp = Blueprint('game', __name__)
 
-# Store active players and their positions
-# username: { username, position:{x,y}, room, color }
-players = {}
-
-# which sockets belong to which username
-# username: set(sid1, sid2, ...)
-user_sids = {}
-
-# reverse lookup
-# sid: username
-sid_to_user = {}
-
-# keep a record of painted cells: map "x,y" → username
-grid_owner: dict[str, str] = {}
+WORLD_COLS, WORLD_ROWS = GRID_COLS, GRID_ROWS
+
+# seconds a player stays on the map after their last tab disconnects,
+# so a dropped connection can come back to the same game
+RECONNECT_GRACE = float(os.environ.get('RECONNECT_GRACE', 10))
+
+# everything the handlers share between workers, see game/state.py
+state = create_state(WORLD_COLS, WORLD_ROWS)
+
+# Store active players, their positions and open sockets (tabs)
+# username: { username, position:{x,y}, room, color, avatar }
+players = state.players
+
+# which shard of which room each player is in (capacity, new shards,
+# hosting workers), shared by every worker; see game/rooms.py
+room_registry = state.rooms
+
+# shard name -> Room (its grid, player index, ticks and write-behind)
+# for the shards this worker has served; see get_room()
+rooms = {}
+
+# area of interest: which chunks each sid sees (who stands where is per room)
+viewports = Viewports(WORLD_COLS, WORLD_ROWS)
+
+# Keep one color per username, for online players and cell owners only
+# (see game/colors.py); stored in Mongo on the player's stats document
+user_colors = state.colors
+
+# moves per second each player may make; the rest are dropped
+move_limiter = MoveLimiter()
+
+# top players by best score, kept in memory and updated as games go on
+leaderboard = Leaderboard()
+
+# sid -> (chunks it was subscribed to, until when) for recently closed
+# sockets on this worker, so a reconnecting tab can resume from them
+detached = {}
+# username -> token of the pending finish_leave() that may remove them
+leaving = {}
+
+# exposed on /api/metrics
+export('moves', move_limiter.metrics)
+export('game', lambda: {
+    'players_online': len(players.usernames()),
+    'rooms': len(rooms),
+    'colors': user_colors.size(),
+    'leaderboard_version': leaderboard.version,
+})
+
+
+def init_game():
+    """Register this worker's rooms and restore the saved grids (once, at startup)."""
+    if WORKER_NAME:
+        room_registry.add_worker(WORKER_NAME, WORKER_ROOMS)
+    leaderboard.warm(db_call(
+        lambda: list(player_collection.find(LEADERBOARD_FILTER, ENTRY_FIELDS)
+                     .sort("max_score", -1).limit(leaderboard.size)),
+        default=[]))
+    # every room's first shard, so the map is there before the first player
+    for shard in room_registry.shards():
+        if shard['shard'] == shard['room'] and ('*' in WORKER_ROOMS or shard['room'] in WORKER_ROOMS):
+            get_room(shard['shard'])
+
+
+def get_room(name):
+    """This worker's Room for a shard, restoring its saved grid the first time."""
+    room = rooms.get(name)
+    if room is not None:
+        return room
+    # query the saved grid on the db pool, not the event loop; a failure
+    # raises, so a shard never starts out empty by mistake
+    docs = db_pool.run(stored_chunks, grid_chunks_collection, name)
+    room = rooms.get(name)
+    if room is not None:
+        # another handler made it while we waited
+        return room
+
+    grid, player_index = state.shard(name)
+    room = rooms[name] = Room(name, grid, player_index, socketio, WORLD_COLS, WORLD_ROWS,
+                              grid_chunks_collection, player_collection, pool=db_pool,
+                              journal=open_journal(name, WORLD_COLS, WORLD_ROWS))
+    # with the broker another worker may have loaded (and painted) it already
+    loaded = room.persistence.restore(docs)
+    if loaded:
+        logging.info(f"restored {loaded} grid chunks of {name}")
+        load_owner_colors(grid)
+    room.persistence.start()
+    export('write_behind', room.persistence.metrics, room=name)
+    room.analytics.start()
+    export('analytics', room.analytics.metrics, room=name)
+    if room.journal is not None:
+        # replays start from the grid as it is now
+        room.journal.keyframe_from(grid)
+        room.journal.start(socketio)
+        export('journal', room.journal.metrics, room=name)
+    return room
+
+
+def load_owner_colors(grid):
+    """Colors of everyone owning restored cells; new ones for owners without."""
+    names = [name for _, name, _ in grid.owners()]
+    docs = db_call(lambda: list(player_collection.find(
+        {"username": {"$in": names}, "color": {"$exists": True}},
+        {"_id": 0, "username": 1, "color": 1})))
+    if docs is None:
+        # Mongo didn't answer: colors for now, without touching the stored ones
+        user_colors.load({name: random_color() for name in names})
+        return
+    stored = {doc['username']: doc['color'] for doc in docs}
+    missing = {name: random_color() for name in names if name not in stored}
+    if missing:
+        # $setOnInsert: never replace a color stored meanwhile
+        db_submit(player_collection.bulk_write,
+                  [UpdateOne({"username": u}, {"$setOnInsert": {"color": c}}, upsert=True)
+                   for u, c in missing.items()], ordered=False)
+    user_colors.load({**stored, **missing})
 
-WORLD_COLS = 100
-WORLD_ROWS = 100
 
-# Keep one color per username (defunct?)
-user_colors = {}
+def random_color():
+    return "#{:06x}".format(random.randint(0, 0xFFFFFF))
 
 
 def generate_color(username):
-    """Give each username a distinct hex color (first‐seen wins)."""
-
-    if username in user_colors:
-        return user_colors[username]
-    color = "#{:06x}".format(random.randint(0, 0xFFFFFF))
-    user_colors[username] = color
-    return color
+    """Pin the color of a joining player (first‐seen wins, then it's kept in Mongo)."""
+
+    color = user_colors.get(username)
+    if color is None:
+        doc = db_call(player_collection.find_one, {"username": username},
+                      {"_id": 0, "color": 1}, default=False)
+        if doc is False:
+            # Mongo didn't answer: a color for this session only
+            return user_colors.acquire(username, random_color())
+        color = doc.get('color') if doc else None
+    if color is None:
+        color = random_color()
+        db_submit(player_collection.update_one, {"username": username},
+                  {"$setOnInsert": {"color": color}}, upsert=True)
+    return user_colors.acquire(username, color)
 
 
 # Register socket events
 @socketio.on('connect')
 def handle_connect():
+    if not startup.ready:
+        # grids not loaded yet, or shutting down; the client retries (see GameCanvas.jsx)
+        raise ConnectionRefusedError('server is not ready')
     print(f"Client connected: {request.sid}")
 
 
 @socketio.on('disconnect')
-def handle_disconnect():
+@timed('disconnect')
+def handle_disconnect(reason=None):
     sid = request.sid
-    user = sid_to_user.get(sid)
+    now = time.monotonic()
+    detached[sid] = (viewports.remove(sid), now + RECONNECT_GRACE)
+    # dicts keep insertion order, so the oldest entries come first
+    while detached:
+        oldest = next(iter(detached))
+        if detached[oldest][1] > now:
+            break
+        del detached[oldest]
+
+    # remove this connection
+    user, tabs_left = players.disconnect(sid)
     if not user:
         # print(f"Unknown sid disconnected: {sid}")
         return
-
-    # remove this connection
-    user_sids[user].discard(sid)
-    sid_to_user.pop(sid, None)
-    # print(f"{user} disconnected SID {sid}. Remaining tabs: {len(user_sids[user])}")
-
-    # if no more tabs for this user, fully remove them
-    if not user_sids[user]:
-        room = players[user]['room']
-        # Save game stats before player fully disconnects
-        update_player_stats(user)
-        players.pop(user, None)
-        user_sids.pop(user, None)
-        emit('player_left', {'username': user}, room=room)
-        # print(f"{user} left room {room} (all tabs closed)")
-
-
-def update_player_stats(username):
+    # print(f"{user} disconnected SID {sid}. Remaining tabs: {tabs_left}")
+
+    # if no more tabs for this user, remove them unless they come back soon
+    if not tabs_left:
+        token = leaving[user] = object()
+        socketio.start_background_task(finish_leave, user, token)
+
+
+def finish_leave(username, token):
+    """After RECONNECT_GRACE, remove a player whose tabs all stayed closed."""
+    socketio.sleep(RECONNECT_GRACE)
+    if leaving.get(username) is not token:
+        return  # left again since; the newer task decides
+    del leaving[username]
+    player = players.remove_if_idle(username)
+    if player is None:
+        return  # reconnected
+    end_game(username, player)
+
+
+def end_game(username, player):
+    """Take a player who has really left (already removed from `players`) off the map."""
+    room = player['room']
+    room_event(room)
+    # Save game stats now that the player has really left
+    game = get_room(room)
+    update_player_stats(username, game)
+    game.player_index.remove(username)
+    room_registry.leave(username)
+    move_limiter.remove(username)
+    user_colors.release(username)
+    socketio.emit('player_left', {'username': username}, room=room)
+    # print(f"{username} left room {room} (all tabs closed)")
+
+
+def shutdown_game():
+    """This worker is stopping: end the games played on it and flush every room.
+
+    Players with tabs open on another worker keep playing there; everyone
+    else (including those in their reconnect grace period) gets their
+    session's stats recorded, and then written with the grid.
+    """
+    for username in set(viewports.usernames()) | set(leaving):
+        for sid in list(viewports.sids(username)):
+            viewports.remove(sid)
+            players.disconnect(sid)
+        leaving.pop(username, None)
+        player = players.remove_if_idle(username)
+        if player is not None:
+            end_game(username, player)
+    for name, room in rooms.items():
+        try:
+            written = room.persistence.flush()
+            logging.info(f"flushed {written} writes for {name}")
+        except Exception:
+            logging.exception(f"final flush of {name} failed")
+        if room.journal is not None:
+            room.journal.close()
+            room.journal = None
+
+
+def update_player_stats(username, game):
     """Update player statistics when a game session ends"""
-    # Count cells owned by this player as their score
-    current_score = sum(1 for owner in grid_owner.values() if owner == username)
-    
-    # Get existing stats or create default ones
-    player_stats = player_collection.find_one({"username": username}) or {
-        "username": username,
-        "games_played": 0,
-        "max_score": 0,
-        "min_score": float('inf'),
-        "total_score": 0,
-        "average_score": 0
+    # Count cells owned by this player in their room as their score; written
+    # to Mongo by the write-behind flusher, not here on the disconnect path
+    score = game.grid.count(username)
+    game.persistence.record_game(username, score)
+    if leaderboard.record_game(username, score):
+        fill_leaderboard_entry(username)
+
+
+def score_gained(username, game):
+    """A player just took a cell; their live score may be a new best."""
+    if leaderboard.live_score(username, game.grid.count(username)):
+        fill_leaderboard_entry(username)
+
+
+def fill_leaderboard_entry(username):
+    """Fetch the stored stats of a player who just made the leaderboard."""
+    db_submit(player_collection.find_one, {"username": username}, ENTRY_FIELDS,
+              callback=lambda doc: leaderboard.fill(username, doc))
+
+
+def pending_stats(username):
+    """Games of username not yet written to Mongo, summed over this worker's rooms."""
+    merged = None
+    for game in rooms.values():
+        pending = game.persistence.pending_stats(username)
+        if pending is None:
+            continue
+        if merged is None:
+            merged = list(pending)
+        else:
+            merged[0] += pending[0]
+            merged[1] += pending[1]
+            merged[2] = max(merged[2], pending[2])
+            merged[3] = min(merged[3], pending[3])
+    return merged
+
+
+def player_view(p):
+    """The public part of a player record, as sent to clients."""
+    return {
+        'username': p['username'],
+        'position': p['position'],
+        'color': p['color'],
+        'avatar': p.get('avatar')
     }
-    
-    # Update stats
-    games_played = player_stats.get("games_played", 0) + 1
-    total_score = player_stats.get("total_score", 0) + current_score
-    max_score = max(player_stats.get("max_score", 0), current_score)
-    
-    # Handle min_score, ensuring it's not float('inf') in the database
-    old_min = player_stats.get("min_score", float('inf'))
-    if old_min == float('inf'):
-        min_score = current_score
-    else:
-        min_score = min(old_min, current_score)
-    
-    # Calculate average
-    average_score = total_score / games_played if games_played > 0 else 0
-    
-    # Update in database
-    player_collection.update_one(
-        {"username": username},
-        {"$set": {
-            "username": username,
-            "games_played": games_played,
-            "max_score": max_score,
-            "min_score": min_score,
-            "total_score": total_score,
-            "average_score": average_score
-        }},
-        upsert=True
-    )
+
+
+def refresh_view(sid, player, send_players=True, known=frozenset()):
+    """Move a socket's chunk subscriptions along with its viewport.
+
+    Newly visible chunks are sent as `chunk_state` (minus the `known` ones
+    the client already holds) and the players standing in them as a `tick`.
+    Tabs that hold the whole grid instead get every tick of the room.
+    """
+    username = player['username']
+    room = player['room']
+    if not viewports.wants_chunks(sid):
+        join_room(whole_room(room), sid=sid)
+        return
+    game = get_room(room)
+    added, removed = viewports.refresh(sid, player['position'])
+    for c in removed:
+        leave_room(chunk_room(room, c), sid=sid)
+    for c in added:
+        join_room(chunk_room(room, c), sid=sid)
+    if not added:
+        return
+
+    missing = added - known
+    if missing:
+        emit('chunk_state', {
+            'chunks': [chunk_payload(game.grid, c, CHUNK_SIZE, user_colors, WORLD_COLS, WORLD_ROWS)
+                       for c in sorted(missing)]
+        }, to=sid)
+
+    if send_players:
+        visible = [p for p in players.many(game.player_index.players_in(added))
+                   if p['username'] != username]
+        if visible:
+            emit('tick', {'moves': [player_view(p) for p in visible], 'paints': []}, to=sid)
 
 
 @socketio.on('join_game')
+@timed('join_game')
 def handle_join(data):
     print(f"👉 handle_join called, sid={request.sid}, data={data}")
     # print("   players before:", players)
 
     username = data.get('username')
-    room = data.get('room', 'main')
     sid = request.sid
 
+    # a player still in their RECONNECT_GRACE keeps their record, room and position
+    leaving.pop(username, None)
+    returning = players.has(username)
+
+    # which shard of the room to play in: a full shard opens the next one,
+    # and one hosted by another worker sends the client there
+    room, host = room_registry.place(data.get('room', 'main'), username, WORKER_NAME)
+    if room is None:
+        emit('room_full', {'room': data.get('room', 'main')}, room=sid)
+        return
+    if host and host != WORKER_NAME:
+        emit('room_redirect', {'room': room, 'worker': host}, room=sid)
+        return
+    try:
+        game = get_room(room)
+    except Exception:
+        # place() counted them in; give the seat back if the shard won't load
+        if not returning:
+            room_registry.leave(username)
+        raise
+
     # if first time login: create the player and pick random start cell
-    if username not in players:
+    # (add() keeps the existing record if another tab got there first)
+    if not returning:
         start_x = random.randint(0, WORLD_COLS - 1)
         start_y = random.randint(0, WORLD_ROWS - 1)
-        players[username] = {
+        players.add(username, {
             'username': username,
             'position': {'x': start_x, 'y': start_y},
             'room': room,
             'color': generate_color(username)
-        }
-        user_sids[username] = set()
+        })
 
     # register this sid
-    user_sids[username].add(sid)
-    sid_to_user[sid] = username
-    join_room(room)
-    # print(f"{username} joined SID={sid}; tabs now={len(user_sids[username])}")
+    tabs = players.connect(username, sid)
+    join_room(players.get(username)['room'])
+    # print(f"{username} joined SID={sid}; tabs now={tabs}")
 
     # print("   players after:", players)
 
     # FOR AVATARS: get avatar for user
-    # inside your handle_join(), right after players[username] = { … }
-    user_doc = users_collection.find_one(
-        {"username": username},
-        {"avatar": 1})
+    # inside your handle_join(), right after players.add(username, { … })
+    # (cached; a miss queries off the event loop, and a slow Mongo just
+    # means no avatar this time)
+    user_doc = get_user_profile(username)
     if user_doc and user_doc.get("avatar"):
         # uri = f"data:{user_doc['avatar_content_type']};base64,{user_doc['avatar']}"
         uri = user_doc.get("avatar")
     else:
         uri = None
-    players[username]["avatar"] = uri
+    player = players.update(username, avatar=uri)
+    room = player['room']
+    room_event(room)
 
     #######################
 
     # Paint their starting cell immediately
-    start = players[username]['position']
-    key = f"{start['x']},{start['y']}"
-    grid_owner[key] = username
-    emit('cell_painted', {
+    start = player['position']
+    _, start_chunk = game.player_index.update(username, start['x'], start['y'])
+    prev = game.paint(start['x'], start['y'], username)
+    game.ticker.queue_paint(chunk_room(room, start_chunk), {
         'x': start['x'],
         'y': start['y'],
         'username': username,
-        'color': players[username]['color']
-    }, room=room)
-
-    # to get paint on initial join
-    full = [
-        {
-            'x': int(k.split(',')[0]),
-            'y': int(k.split(',')[1]),
-            'username': u,
-            'color': user_colors[u]
-        }
-        for k, u in grid_owner.items()
-    ]
-    emit('grid_state', {
-        'cells': full,
-        'user_colors': user_colors
-    }, room=room)
+        'color': player['color']
+    })
+    game.ticker.score_changed(room, username, prev)
+    if prev != username:
+        score_gained(username, game)
+    game.ticker.start()
+
+    # subscribe this tab to the chunks around it; clients that pass `aoi`
+    # get the grid chunk by chunk from refresh_view() instead of in full
+    aoi = bool(data.get('aoi'))
+    # a malformed `view` gets the default size
+    view = parse_viewport(data.get('view') or {}) or parse_viewport({})
+    viewports.set(sid, username, cols=view['cols'], rows=view['rows'], chunks=aoi)
+
+    # a reconnecting tab sends `resume`: {epoch, version} of the grid it
+    # holds and the sid it had. While the grid's history reaches back that
+    # far it only gets the cells changed since (and AOI tabs keep the
+    # chunks their old socket was subscribed to)
+    epoch = game.grid.epoch()
+    resume = data.get('resume')
+    delta = None
+    known = frozenset()
+    if isinstance(resume, dict) and resume.get('epoch') == epoch and type(resume.get('version')) is int:
+        if aoi:
+            known = detached.pop(resume.get('sid'), (frozenset(), 0))[0]
+        delta = game.grid.changes_since(resume['version'], known if aoi else None)
+        if delta is None:
+            known = frozenset()
+    # the version the grid data below brings this tab up to; ticks carry newer ones
+    emit('grid_version', {'epoch': epoch,
+                          'version': delta[0] if delta else game.grid.version()}, room=sid)
+
+    # to get paint on initial join (only this tab needs it)
+    if aoi or delta is not None:
+        pass  # sent per chunk / as grid_delta below
+    elif data.get('binary'):
+        emit('grid_snapshot', game.snapshot.payload(user_colors), room=sid)
+    else:
+        # JSON fallback for clients that can't decode the binary snapshot;
+        # colors only for the owners on the grid
+        cells = game.grid.cells()
+        colors = user_colors.many({u for _, _, u in cells})
+        full = [
+            {
+                'x': x,
+                'y': y,
+                'username': u,
+                'color': colors[u]
+            }
+            for x, y, u in cells
+        ]
+        emit('grid_state', {
+            'cells': full,
+            'user_colors': colors
+        }, room=sid)
+
+    refresh_view(sid, player, send_players=False, known=known)
+    if delta and delta[1]:
+        colors = user_colors.many({u for _, _, u in delta[1]})
+        emit('grid_delta', {
+            'epoch': epoch,
+            'version': delta[0],
+            'cells': [{'x': x, 'y': y, 'username': u, 'color': colors[u]}
+                      for x, y, u in delta[1]],
+        }, room=sid)
 
     # CHANGED FOR AVATAR INFORMATION:
 
     # send this tab its own data
-    # emit('player_data', players[username], room=sid)
-    emit('player_data', {
-        'username': username,
-        'position': players[username]['position'],
-        'color': players[username]['color'],
-        'avatar': players[username]['avatar']
-    }, room=sid)
-
-    # send everyone in room the full state
-    # all_players = list(players.values())
-    # emit('game_state', {'players': all_players}, room=sid)
-    existing = []
-    for p in players.values():
-        if p['username'] != username and p['room'] == room:
-            existing.append({
-                'username': p['username'],
-                'position': p['position'],
-                'color': p['color'],
-                'avatar': p.get('avatar')
-            })
+    emit('player_data', player_view(player), room=sid)
+
+    # live scores for the leaderboard; `scores` deltas follow every second
+    emit('scores', {'scores': game.grid.scores(), 'full': True}, room=sid)
+
+    # send this tab the players it can currently see (everyone, without `aoi`)
+    visible = game.player_index.players_in(viewports.chunks(sid)) if aoi else game.player_index.players()
+    existing = [
+        player_view(p)
+        for p in players.many(visible)
+        if p['username'] != username
+    ]
     emit('game_state', {'players': existing})
 
-    # if this was the first tab (len==1), notify others of a new arrival
-    if len(user_sids[username]) == 1:
-        # emit('player_joined', players[username], room=room, include_self=False)
+    # if this was the first tab (tabs==1), notify nearby players of a new
+    # arrival; one back within the grace period never left their screens
+    if tabs == 1 and not returning:
         # print(f"Broadcasted player_joined for {username}")
-        emit('player_joined', {
-            'username': username,
-            'position': players[username]['position'],
-            'color': players[username]['color'],
-            'avatar': players[username]['avatar']
-        }, room=room, include_self=False)
+        emit('player_joined', player_view(player),
+             to=[chunk_room(room, start_chunk), whole_room(room)], include_self=False)
+
+
+@socketio.on('viewport')
+@timed('viewport')
+def handle_viewport(data):
+    """Client tells us how much of the map it draws (and optionally where)."""
+    sid = request.sid
+    username = players.user_of(sid)
+    player = players.get(username) if username else None
+    if not player:
+        return
+
+    view = parse_viewport(data)
+    if view is None:
+        return
+    viewports.set(sid, username, chunks=viewports.wants_chunks(sid), **view)
+    refresh_view(sid, player)
 
 
 @socketio.on('move')
+@timed('move')
 def handle_move(data):
     # print(f"👉 handle_move called, sid={request.sid}, data={data}")
 
     sid = request.sid
-    username = sid_to_user.get(sid)
-    if not username or username not in players:
+    username = players.user_of(sid)
+    if not username:
         return
 
-    # 1) update the shared/canonical position of the player
-    new_pos = data['position']
-    players[username]['position'] = new_pos
-    room = players[username]['room']
+    # 1) the client only says which way; the server moves the canonical
+    #    position one cell, at most move_limiter's rate
+    step = parse_step(data)
+    if step is None or not move_limiter.allow(username):
+        return
+    player = players.step(username, *step, WORLD_COLS, WORLD_ROWS)
+    if player is None:
+        return
+    new_pos = player['position']
+    room = player['room']
+    room_event(room)
+    game = get_room(room)
+    old_chunk, new_chunk = game.player_index.update(username, new_pos['x'], new_pos['y'])
     # print(f"{username} moved to {new_pos}")
 
     # 2) paint that cell
-    cell_key = f"{new_pos['x']},{new_pos['y']}"
-    grid_owner[cell_key] = username
+    prev = game.paint(new_pos['x'], new_pos['y'], username)
 
-    # 3) broadcast both the move AND the paint
-    emit('player_moved', {
-        'username': username,
-        'position': new_pos,
-        'color': players[username]['color'],
-        'avatar': players[username].get('avatar')
-    }, room=room)
+    # 3) queue both the move AND the paint for the next tick broadcast,
+    #    to whoever can see the chunk (and the one we just left)
+    moved = player_view(player)
+    game.ticker.queue_move(chunk_room(room, new_chunk), moved)
+    if old_chunk != new_chunk:
+        game.ticker.queue_move(chunk_room(room, old_chunk), moved)
 
-    emit('cell_painted', {
+    game.ticker.queue_paint(chunk_room(room, new_chunk), {
         'x': new_pos['x'],
         'y': new_pos['y'],
         'username': username,
-        'color': players[username]['color']
-    }, room=room)
+        'color': player['color']
+    })
+    if prev != username:
+        game.ticker.score_changed(room, username, prev)
+        score_gained(username, game)
+
+    # 4) viewports on this worker that follow this player may now cover other chunks
+    for tab in list(viewports.sids(username)):
+        refresh_view(tab, player)
 
 
 # New endpoint to handle achievements from client
 @socketio.on('update_achievements')
+@timed('update_achievements')
 def handle_achievement_update(data):
     """Handle achievement updates from the client"""
     username = data.get('username')
@@ -269,11 +586,13 @@ def handle_achievement_update(data):
     if not username or not achievements:
         return
 
-    # Update the achievements in the database
-    users_collection.update_one(
-        {"username": username},
-        {"$set": {"achievements": achievements}}
-    )
+    # Update the achievements in the database (in the background); drop
+    # the cached profile now and again once the write has landed
+    invalidate_profile(username)
+    db_submit(users_collection.update_one,
+              {"username": username},
+              {"$set": {"achievements": achievements}},
+              callback=lambda _: invalidate_profile(username))
 
     print(f"Updated achievements for {username}: {achievements}")
 
@@ -289,12 +608,13 @@ def get_achievements():
     if not username:
         return jsonify({"error": "Username is required"}), 400
 
-    user = users_collection.find_one({"username": username})
+    user = get_user_profile(username)
     if not user:
         return jsonify({"error": "User not found"}), 404
 
     # If the user doesn't have achievements yet, return defaults
-    achievements = user.get('achievements', {
+    # (copied, the profile dict is shared through the cache)
+    achievements = dict(user.get('achievements') or {
         "fiftyPoints": False,
         "hundredPoints": False,
         "twoHundredPoints": False,
@@ -313,10 +633,31 @@ def get_achievements():
             {"username": username},
             {"$set": {"achievements": achievements}}
         )
+        invalidate_profile(username)
 
     return jsonify({"achievements": achievements}), 200
 
 
+def avatar_changed(username, avatar_url):
+    """An avatar upload (see auth/routes.py): show it if the player is online."""
+    # also update in-memory player map so new joins get the URL
+    player = players.update(username, avatar=avatar_url)
+
+    # re-emit a “player_moved” (re-using that handler) with the exact same pos but
+    # now carrying the new avatar URL.  Clients already listen for this and will
+    # update their local players[u].avatar and cache the image immediately.
+    if player:
+        socketio.emit('player_moved', {
+            'username': username,
+            'position': player['position'],
+            'color': player['color'],
+            'avatar': avatar_url
+        }, room=player['room'])
+
+
+avatar_listeners.append(avatar_changed)
+
+
 @game_bp.route('/player-stats', methods=['GET'])
 def get_player_stats():
     """Get the statistics for a player."""
@@ -324,16 +665,29 @@ def get_player_stats():
     if not username:
         return jsonify({"error": "Username is required"}), 400
 
-    # For currently active players, calculate their current score
+    # For currently active players, calculate their current score (in their room)
     current_score = 0
-    if username in players:
-        current_score = sum(1 for owner in grid_owner.values() if owner == username)
-
-    # Get stored player stats from database
-    player_stats = player_collection.find_one({"username": username})
+    player = players.get(username)
+    if player and player['room'] in rooms:
+        current_score = rooms[player['room']].grid.count(username)
+
+    # Get stored player stats from database (the color lives there too, but isn't a stat)
+    player_stats = player_collection.find_one({"username": username}, {"_id": 0, "color": 0})
+
+    # fold in games that ended but haven't been flushed to Mongo yet
+    pending = pending_stats(username)
+    if pending:
+        games, total, best, worst = pending
+        player_stats = player_stats or {"username": username}
+        player_stats["games_played"] = player_stats.get("games_played", 0) + games
+        player_stats["total_score"] = player_stats.get("total_score", 0) + total
+        player_stats["max_score"] = max(player_stats.get("max_score", 0), best)
+        player_stats["min_score"] = min(player_stats.get("min_score", worst), worst)
+        player_stats["average_score"] = player_stats["total_score"] / player_stats["games_played"]
     
-    if not player_stats:
-        # Return default stats if player has no history
+    if not player_stats or "games_played" not in player_stats:
+        # Return default stats if player has no history (the document may
+        # only hold their color so far)
         return jsonify({
             "username": username,
             "games_played": 0,
@@ -346,26 +700,176 @@ def get_player_stats():
     
     # Add the current score to the response 
     player_stats["current_score"] = current_score
-    
-    # Remove MongoDB _id from the response
-    if "_id" in player_stats:
-        del player_stats["_id"]
-        
+
     return jsonify(player_stats), 200
 
 
+@game_bp.route('/scoreboard', methods=['GET'])
+def get_scoreboard():
+    """Get the live scores (cells currently owned) of the top players in a room shard."""
+    try:
+        limit = int(request.args.get('limit', 10))
+    except ValueError:
+        return jsonify({"error": "limit must be a number"}), 400
+    limit = max(1, min(limit, 100))
+
+    name = request.args.get('room', room_registry.shards()[0]['shard'])
+    if name not in rooms:
+        if name not in {s['shard'] for s in room_registry.shards()}:
+            return jsonify({"error": "Unknown room"}), 404
+        # hosted by another worker; its grid is still readable through the state backend
+        grid = state.shard(name)[0]
+    else:
+        grid = rooms[name].grid
+
+    scores = [
+        {"username": u, "score": n, "online": players.has(u)}
+        for u, n in grid.top(limit)
+    ]
+    return jsonify({"scoreboard": scores}), 200
+
+
+@game_bp.route('/replay', methods=['GET'])
+def get_replay():
+    """The grid of a room shard as it was at `at` (unix seconds), from its paint journal.
+
+    Same body as grid_snapshot, less version and epoch, with `cells`
+    base64-encoded, plus `span`: the first and last journaled paint.
+    Needs GRID_JOURNAL_DIR.
+    """
+    if not GRID_JOURNAL_DIR:
+        return jsonify({"error": "Replays are disabled"}), 404
+    name = request.args.get('room', room_registry.shards()[0]['shard'])
+    try:
+        at = float(request.args.get('at', time.time()))
+    except ValueError:
+        return jsonify({"error": "at must be a unix timestamp"}), 400
+    # replaying the records since the last keyframe is pure Python: keep it off the event loop
+    try:
+        journal, grid = replay_pool.run(replay, GRID_JOURNAL_DIR, name, at)
+    except FileNotFoundError:
+        return jsonify({"error": "No journal for that room"}), 404
+    except ReplayBusy as e:
+        logging.warning(f"replay of {name} rejected: {e}")
+        return jsonify({"error": "Replays are busy, try again later"}), 503
+
+    # past owners may have gone offline (and out of memory) since
+    names = [u for _, u, _ in grid.owners()]
+    colors = {u: c for u, c in user_colors.many(names).items() if c}
+    missing = [u for u in names if u not in colors]
+    if missing:
+        colors.update(
+            (doc['username'], doc['color'])
+            for doc in db_call(lambda: list(player_collection.find(
+                {"username": {"$in": missing}, "color": {"$exists": True}},
+                {"_id": 0, "username": 1, "color": 1})), default=[]))
+
+    palette = ColorRegistry(grid.count)
+    palette.load(colors)
+    payload = SnapshotCache(grid, journal.cols, journal.rows).payload(palette)
+    # a rebuilt grid's version means nothing to live clients
+    del payload['version'], payload['epoch']
+    payload['cells'] = base64.b64encode(payload['cells']).decode('ascii')
+    payload['at'] = at
+    payload['span'] = journal.span()
+    return jsonify(payload), 200
+
+
+@game_bp.route('/analytics', methods=['GET'])
+def get_analytics():
+    """Territory, regions and contested border per player in a room shard.
+
+    `sort` is one of cells, largest_region, regions, border; `username`
+    returns just that player. Results are up to ANALYTICS_INTERVAL old.
+    """
+    try:
+        limit = int(request.args.get('limit', 10))
+    except ValueError:
+        return jsonify({"error": "limit must be a number"}), 400
+    limit = max(1, min(limit, 100))
+    sort = request.args.get('sort', 'cells')
+    if sort not in SORT_KEYS:
+        return jsonify({"error": f"sort must be one of {', '.join(SORT_KEYS)}"}), 400
+
+    game, error = hosted_room(request.args.get('room'))
+    if error:
+        return error
+    result = game.analytics.result()
+    if result is None:
+        return jsonify({"error": "Analytics are not ready yet"}), 503
+
+    stats = result['players']
+    username = request.args.get('username')
+    if username:
+        players = [dict(stats[username], username=username)] if username in stats else []
+    else:
+        ranked = sorted(stats.items(), key=lambda item: item[1][sort], reverse=True)[:limit]
+        players = [dict(s, username=u) for u, s in ranked]
+    return jsonify({
+        "version": result['version'],
+        "computed_at": result['computed_at'],
+        "players": players,
+    }), 200
+
+
+@game_bp.route('/heatmap', methods=['GET'])
+def get_heatmap():
+    """How often each block of `bin` x `bin` cells was stepped on in a room shard."""
+    try:
+        size = int(request.args.get('bin', 4))
+    except ValueError:
+        return jsonify({"error": "bin must be a number"}), 400
+    size = max(1, min(size, max(WORLD_COLS, WORLD_ROWS)))
+
+    game, error = hosted_room(request.args.get('room'))
+    if error:
+        return error
+    heatmap = game.analytics.heatmap(size)
+    if heatmap is None:
+        return jsonify({"error": "Analytics are not ready yet"}), 503
+    return jsonify({
+        "bin": size,
+        "cols": heatmap.shape[1],
+        "rows": heatmap.shape[0],
+        "max": int(heatmap.max()),
+        "visits": heatmap.tolist(),
+    }), 200
+
+
+def hosted_room(name):
+    """(Room, None) for a shard this worker hosts, else (None, error response)."""
+    name = name or room_registry.shards()[0]['shard']
+    if name in rooms:
+        return rooms[name], None
+    if name in {s['shard'] for s in room_registry.shards()}:
+        return None, (jsonify({"error": "Room is hosted by another worker"}), 404)
+    return None, (jsonify({"error": "Unknown room"}), 404)
+
+
+@game_bp.route('/rooms', methods=['GET'])
+def get_rooms():
+    """Every open room shard with its player count, capacity and hosting worker."""
+    return jsonify({"rooms": room_registry.shards()}), 200
+
+
 # Add a endpoint to get leaderboard
 @game_bp.route('/leaderboard', methods=['GET'])
 def get_leaderboard():
-    """Get the top players by max score."""
-    limit = int(request.args.get('limit', 10))
-    
-    # Query the database for players sorted by max_score
-    top_players = list(player_collection.find(
-        {},
-        {"username": 1, "max_score": 1, "games_played": 1, "average_score": 1, "_id": 0}
-    ).sort("max_score", -1).limit(limit))
-    
-    return jsonify({"leaderboard": top_players}), 200
+    """Get the top players by max score, from the in-memory leaderboard."""
+    try:
+        limit = int(request.args.get('limit', 10))
+    except ValueError:
+        return jsonify({"error": "limit must be a number"}), 400
+    limit = max(1, min(limit, LEADERBOARD_MAX_LIMIT, leaderboard.size))
+
+    # the ranking only changes with `version`, so clients can revalidate cheaply
+    tag = leaderboard.etag(limit)
+    if request.if_none_match.contains(tag):
+        return "", 304
+
+    response = jsonify({"leaderboard": leaderboard.top(limit)})
+    response.set_etag(tag)
+    response.headers["Cache-Control"] = "no-cache"
+    return response
 
 # added achievements functionality here.
\ No newline at end of file
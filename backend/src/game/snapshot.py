@@ -0,0 +1,85 @@
+# backend/game/snapshot.py
+import sys
+import zlib
+
+from game.grid import EMPTY
+
+# grid_snapshot payloads carry the raw owner-id array, little-endian uint16
+# per cell in row-major order, deflated (zlib container). Browsers can
+# inflate it with DecompressionStream('deflate').
+ENCODING = 'deflate-u16le'
+
+
+class SnapshotCache:
+    """Compressed copy of a GridStore, rebuilt only when the grid changed."""
+
+    def __init__(self, grid, cols, rows, level=6):
+        self.grid = grid
+        self.cols = cols
+        self.rows = rows
+        self.level = level
+        self._version = None
+        self._data = None
+
+    def data(self):
+        """Deflated owner-id buffer for the grid's current version."""
+        version = self.grid.version()
+        if self._data is None or self._version != version:
+            owners = self.grid.raw()
+            if sys.byteorder == 'big':
+                owners = owners[:]
+                owners.byteswap()
+            self._data = zlib.compress(owners.tobytes(), self.level)
+            self._version = version
+        return self._data
+
+    def payload(self, colors):
+        """Build the grid_snapshot event body.
+
+        `palette` maps every owner id present on the grid to its username
+        and color, so the client never needs the full user_colors dict.
+        """
+        cells = self.data()
+        owners = self.grid.owners()
+        palette = colors.many([name for _, name, _ in owners])
+        return {
+            'cols': self.cols,
+            'rows': self.rows,
+            'version': self._version,
+            'epoch': self.grid.epoch(),
+            'encoding': ENCODING,
+            'palette': [
+                {'id': owner_id, 'username': name, 'color': palette[name]}
+                for owner_id, name, _ in owners
+            ],
+            'cells': cells,
+        }
+
+
+def chunk_payload(grid, chunk, size, colors, world_cols, world_rows):
+    """One area-of-interest chunk in the same encoding as grid_snapshot.
+
+    `x`, `y`, `cols`, `rows` give the chunk's rectangle (edge chunks may be
+    smaller than `size`); `cells` holds its owner ids row by row.
+    """
+    x0, y0 = chunk[0] * size, chunk[1] * size
+    x1, y1 = min(x0 + size, world_cols), min(y0 + size, world_rows)
+    part = grid.region(x0, y0, x1, y1)
+    ids = set(part)
+    ids.discard(EMPTY)
+    if sys.byteorder == 'big':
+        part.byteswap()
+    names = {i: grid.name(i) for i in ids}
+    palette = colors.many(list(names.values()))
+    return {
+        'x': x0,
+        'y': y0,
+        'cols': x1 - x0,
+        'rows': y1 - y0,
+        'encoding': ENCODING,
+        'palette': [
+            {'id': i, 'username': names[i], 'color': palette[names[i]]}
+            for i in sorted(ids)
+        ],
+        'cells': zlib.compress(part.tobytes()),
+    }
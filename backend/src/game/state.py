@@ -0,0 +1,207 @@
+# backend/game/state.py
+import os
+import threading
+import time
+from multiprocessing.connection import Client
+from multiprocessing.managers import BaseManager, convert_to_error, dispatch
+
+from game.colors import ColorRegistry
+from game.grid import GridStore
+from game.interest import CHUNK_SIZE, ChunkIndex
+from game.players import PlayerRegistry
+from game.rooms import RoomRegistry
+
+# 'memory' keeps everything in this process (one worker);
+# 'broker' uses the state broker started by `python src/broker.py`
+STATE_BACKEND = os.environ.get('GAME_STATE_BACKEND', 'memory')
+BROKER_ADDRESS = os.environ.get('GAME_STATE_ADDRESS', '127.0.0.1:50000')
+BROKER_AUTHKEY = os.environ.get('GAME_STATE_AUTHKEY', 'fantastic-five').encode()
+
+
+class MemoryState:
+    """Shared game state held in this process; the default single-worker setup."""
+
+    def __init__(self, cols, rows):
+        self.cols = cols
+        self.rows = rows
+        self.players = PlayerRegistry()
+        # username -> '#rrggbb' for online players and cell owners
+        self.colors = ColorRegistry(self.cells_owned)
+        # which shard of which room everyone plays in, see game/rooms.py
+        self.rooms = RoomRegistry()
+        # shard -> (GridStore, ChunkIndex), made on first use
+        self._shards = {}
+
+    def shard(self, name):
+        """(grid, player_index) of a shard."""
+        shard = self._shards.get(name)
+        if shard is None:
+            grid = GridStore(self.cols, self.rows, chunk_size=CHUNK_SIZE,
+                             on_vacated=self.colors.vacated)
+            shard = self._shards[name] = (grid, ChunkIndex())
+        return shard
+
+    def cells_owned(self, username):
+        """Cells username owns across every shard."""
+        return sum(grid.count(username) for grid, _ in self._shards.values())
+
+
+class StateManager(BaseManager):
+    """multiprocessing manager that serves one MemoryState to many workers."""
+
+
+def public_methods(cls):
+    return [name for name in dir(cls) if not name.startswith('_') and callable(getattr(cls, name))]
+
+
+class Synchronized:
+    """Runs every method of `obj` under one lock shared by all broker objects.
+
+    The manager server handles each worker connection in its own thread,
+    and a grid paint plus its score update must not interleave with another.
+    """
+
+    def __init__(self, obj, lock):
+        self._obj = obj
+        self._lock = lock
+
+    def __getattr__(self, name):
+        attr = getattr(self._obj, name)
+        if not callable(attr):
+            return attr
+
+        def locked(*args, **kwargs):
+            with self._lock:
+                return attr(*args, **kwargs)
+        return locked
+
+
+def serve_broker(cols, rows, address=BROKER_ADDRESS, authkey=BROKER_AUTHKEY):
+    """Run the state broker in this process until interrupted."""
+    state = MemoryState(cols, rows)
+    lock = threading.RLock()
+    players = Synchronized(state.players, lock)
+    colors = Synchronized(state.colors, lock)
+    rooms = Synchronized(state.rooms, lock)
+    shard = Synchronized(state, lock).shard
+
+    StateManager.register('grid', callable=lambda name: Synchronized(shard(name)[0], lock),
+                          exposed=public_methods(GridStore))
+    StateManager.register('player_index', callable=lambda name: Synchronized(shard(name)[1], lock),
+                          exposed=public_methods(ChunkIndex))
+    StateManager.register('players', callable=lambda: players, exposed=public_methods(PlayerRegistry))
+    StateManager.register('colors', callable=lambda: colors, exposed=public_methods(ColorRegistry))
+    StateManager.register('rooms', callable=lambda: rooms, exposed=public_methods(RoomRegistry))
+
+    host, port = address.rsplit(':', 1)
+    manager = StateManager(address=(host, int(port)), authkey=authkey)
+    manager.get_server().serve_forever()
+
+
+class BrokerConnection:
+    """The worker's one connection to the broker, shared by all its green threads.
+
+    Manager proxies keep a connection per thread, and under eventlet every
+    Socket.IO event runs in a green thread of its own: each call would
+    connect and authenticate again (~40ms). Here calls take turns on a
+    single connection instead, and the broker serves it from one thread.
+    """
+
+    def __init__(self, address, authkey):
+        self.address = address
+        self.authkey = authkey
+        # monkey patched into a green lock under eventlet
+        self._lock = threading.Lock()
+        self._conn = None
+
+    def _connect(self):
+        conn = Client(self.address, authkey=self.authkey)
+        dispatch(conn, None, 'accept_connection', (f"worker-{os.getpid()}",))
+        return conn
+
+    def open(self, retries=10):
+        """Connect, waiting for a broker that is still starting."""
+        for attempt in range(retries):
+            try:
+                with self._lock:
+                    if self._conn is None:
+                        self._conn = self._connect()
+                return
+            except ConnectionRefusedError:
+                if attempt == retries - 1:
+                    raise
+                time.sleep(0.5 * (attempt + 1))
+
+    def create(self, typeid, *args):
+        """Make a broker object; returns (its id, its method names)."""
+        # like BaseManager, on a connection of its own: the shared one only takes method calls
+        conn = Client(self.address, authkey=self.authkey)
+        try:
+            return dispatch(conn, None, 'create', (typeid,) + args)
+        finally:
+            conn.close()
+
+    def call(self, ident, method, args, kwargs):
+        with self._lock:
+            if self._conn is None:
+                self._conn = self._connect()
+            try:
+                self._conn.send((ident, method, args, kwargs))
+                kind, result = self._conn.recv()
+            except BaseException:
+                # a half-finished call leaves the connection out of step
+                self._conn.close()
+                self._conn = None
+                raise
+        if kind == '#RETURN':
+            return result
+        raise convert_to_error(kind, result)
+
+
+class BrokerObject:
+    """Stand-in for an object in the broker; its methods run over a BrokerConnection."""
+
+    _exposed = ()
+
+    def __init__(self, connection, typeid, *args):
+        self._connection = connection
+        self._id, self._exposed = connection.create(typeid, *args)
+
+    def __getattr__(self, name):
+        if name not in self._exposed:
+            raise AttributeError(name)
+
+        def call(*args, **kwargs):
+            return self._connection.call(self._id, name, args, kwargs)
+        setattr(self, name, call)
+        return call
+
+
+class BrokerState:
+    """Game state living in the broker process, shared by every worker.
+
+    Exposes the same objects as MemoryState; each method call is a round
+    trip to the broker, so the handlers keep calls per event to a handful.
+    """
+
+    def __init__(self, cols, rows, address=BROKER_ADDRESS, authkey=BROKER_AUTHKEY, retries=10):
+        host, port = address.rsplit(':', 1)
+        self._connection = BrokerConnection((host, int(port)), authkey)
+        self._connection.open(retries)
+        self.players = BrokerObject(self._connection, 'players')
+        self.colors = BrokerObject(self._connection, 'colors')
+        self.rooms = BrokerObject(self._connection, 'rooms')
+
+    def shard(self, name):
+        """(grid, player_index) stand-ins for a shard."""
+        return (BrokerObject(self._connection, 'grid', name),
+                BrokerObject(self._connection, 'player_index', name))
+
+
+def create_state(cols, rows):
+    """Build the state backend selected by GAME_STATE_BACKEND."""
+    if STATE_BACKEND == 'broker':
+        return BrokerState(cols, rows)
+    if STATE_BACKEND != 'memory':
+        raise ValueError(f"unknown GAME_STATE_BACKEND {STATE_BACKEND!r}")
+    return MemoryState(cols, rows)
@@ -0,0 +1,102 @@
+# backend/game/tick.py
+import logging
+import os
+import time
+
+# broadcasts per second; moves and paints in between are batched
+TICK_RATE = float(os.environ.get('TICK_RATE', 20))
+
+# how often changed live scores are pushed, in seconds
+SCORES_INTERVAL = float(os.environ.get('SCORES_INTERVAL', 1.0))
+
+
+class TickScheduler:
+    """Collects moves and paints per Socket.IO room and sends them as one `tick`.
+
+    Handlers queue updates instead of emitting them. Once per tick every
+    target room with pending updates gets a single
+    `tick {moves: [...], paints: [...]}` message. A later position for the
+    same player, or a later paint of the same cell, replaces the earlier one.
+    Targets are usually area-of-interest chunk rooms (see game/interest.py).
+
+    Score changes are tracked per game room and pushed as `scores` deltas
+    every SCORES_INTERVAL seconds, looked up through `score_of(username)`.
+
+    With `version_of`, each tick also carries the grid version that its
+    paints (and every earlier one) bring the client up to. With `whole`,
+    that room gets one more tick per interval holding the updates of every
+    target together.
+    """
+
+    def __init__(self, socketio, score_of=None, version_of=None, rate=TICK_RATE,
+                 scores_interval=SCORES_INTERVAL, whole=None):
+        self.socketio = socketio
+        self.score_of = score_of
+        self.version_of = version_of
+        self.whole = whole
+        self.interval = 1.0 / rate
+        self.scores_interval = scores_interval
+        # target room -> {username: player_moved payload}
+        self._moves = {}
+        # target room -> {(x, y): cell_painted payload}
+        self._paints = {}
+        # game room -> usernames whose live score changed
+        self._scores = {}
+        self._scores_due = 0.0
+        self._task = None
+
+    def queue_move(self, target, payload):
+        self._moves.setdefault(target, {})[payload['username']] = payload
+
+    def queue_paint(self, target, payload):
+        self._paints.setdefault(target, {})[(payload['x'], payload['y'])] = payload
+
+    def score_changed(self, room, *usernames):
+        self._scores.setdefault(room, set()).update(u for u in usernames if u)
+
+    def start(self):
+        """Start the tick loop once; safe to call from every join."""
+        if self._task is None:
+            self._task = self.socketio.start_background_task(self._run)
+
+    def _run(self):
+        next_tick = time.monotonic()
+        while True:
+            next_tick += self.interval
+            self.socketio.sleep(max(0.0, next_tick - time.monotonic()))
+            # if we fell behind (long handler, GC pause) don't try to catch up
+            next_tick = max(next_tick, time.monotonic() - self.interval)
+            try:
+                self.flush()
+            except Exception:
+                # one bad tick must not stop every later broadcast
+                logging.exception("tick flush failed")
+
+    def flush(self):
+        """Send everything queued since the last tick."""
+        # read before taking the queues: paints after this are in the next tick
+        version = self.version_of() if self.version_of is not None else None
+        moves, self._moves = self._moves, {}
+        paints, self._paints = self._paints, {}
+        if self.whole is not None and (moves or paints):
+            # a move queued for its old and new chunk counts once here
+            moves[self.whole] = {u: p for queued in moves.values() for u, p in queued.items()}
+            paints[self.whole] = {c: p for queued in paints.values() for c, p in queued.items()}
+        for target in moves.keys() | paints.keys():
+            tick = {
+                'moves': list(moves.get(target, {}).values()),
+                'paints': list(paints.get(target, {}).values()),
+            }
+            if version is not None:
+                tick['version'] = version
+            self.socketio.emit('tick', tick, to=target)
+
+        now = time.monotonic()
+        if self.score_of is None or not self._scores or now < self._scores_due:
+            return
+        self._scores_due = now + self.scores_interval
+        changed, self._scores = self._scores, {}
+        for room, usernames in changed.items():
+            self.socketio.emit('scores', {
+                'scores': {u: self.score_of(u) for u in usernames}
+            }, to=room)
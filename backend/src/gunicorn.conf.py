@@ -0,0 +1,53 @@
+# backend/gunicorn.conf.py
+"""gunicorn settings; all of them come from config.py.
+
+    gunicorn -c src/gunicorn.conf.py wsgi:app
+
+One worker: Socket.IO sessions live in the process that opened them, so
+to use more cores run more of these on other ports with the broker (see
+README) instead of raising `workers`.
+"""
+import os
+import signal
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+# not `config`: gunicorn would take that for its own setting
+import config as app_config
+
+chdir = os.path.dirname(os.path.abspath(__file__))
+bind = f"{app_config.HOST}:{app_config.PORT}"
+workers = 1
+worker_class = app_config.WORKER_CLASS
+worker_connections = app_config.WORKER_CONNECTIONS
+keepalive = app_config.KEEPALIVE
+graceful_timeout = app_config.GRACEFUL_TIMEOUT
+# access logs come from the app (LOG_FORMAT), errors to stderr
+accesslog = None
+errorlog = '-'
+
+
+def post_worker_init(worker):
+    """Start the app's shutdown as soon as the worker is told to stop (SIGTERM).
+
+    Open game sockets keep a stopping worker busy until graceful_timeout,
+    when the master kills it, so worker_exit would come too late.
+    """
+    from app import shutdown
+    from extensions import socketio
+
+    handle_exit = worker.handle_exit
+
+    def on_exit(sig, frame):
+        handle_exit(sig, frame)
+        socketio.start_background_task(shutdown)
+
+    worker.handle_exit = on_exit
+    signal.signal(signal.SIGTERM, on_exit)
+
+
+def worker_exit(server, worker):
+    """Any other way out (e.g. the worker crashed): still flush what we can."""
+    from app import shutdown
+    shutdown()
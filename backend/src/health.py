@@ -0,0 +1,130 @@
+# backend/health.py
+"""Liveness and readiness probes, and the startup sequence they report on.
+
+/healthz answers as soon as the server listens; /readyz once Mongo
+answered and the game is loaded, for load balancers and rolling deploys
+to wait on.
+"""
+import logging
+import os
+import time
+from contextlib import contextmanager
+
+from flask import Blueprint, jsonify
+
+from db import MONGO_RETRY_MAX_DELAY, db, db_pool, mongo_client, wait_for_mongo
+from extensions import socketio
+from metrics import export
+
+# seconds /readyz waits for Mongo to answer a ping
+READY_PING_TIMEOUT = float(os.environ.get('READY_PING_TIMEOUT', 1.0))
+
+health_bp = Blueprint('health', __name__)
+
+
+class Startup:
+    """How long each startup phase took on this worker, and whether it finished."""
+
+    def __init__(self):
+        self.began = time.perf_counter()
+        # phase -> seconds, in the order they ran
+        self.phases = {}
+        self.ready = False
+        self.stopping = False
+        self.error = None
+
+    @contextmanager
+    def phase(self, name):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases[name] = time.perf_counter() - started
+
+    def record(self, name, since):
+        """A phase that began at perf_counter() `since` and just ended."""
+        self.began = min(self.began, since)
+        self.phases[name] = time.perf_counter() - since
+
+    def elapsed(self):
+        return time.perf_counter() - self.began
+
+    def finish(self):
+        self.ready = True
+        self.phases['total'] = self.elapsed()
+        logging.info("startup: " + ", ".join(f"{name} {s:.2f}s" for name, s in self.phases.items()))
+
+    def stop(self):
+        """The worker is shutting down: no longer ready for new clients."""
+        self.ready = False
+        self.stopping = True
+
+    def fail(self, error):
+        """A startup attempt failed; warm_up() tries again."""
+        self.error = error
+        logging.error(f"startup not done after {self.elapsed():.1f}s, retrying: {error}")
+
+
+# app.py backdates it to before its own imports, see record()
+startup = Startup()
+export('startup', lambda: dict(startup.phases, ready=int(startup.ready)))
+
+
+def warm_up(*steps, delay=MONGO_RETRY_MAX_DELAY):
+    """Wait for Mongo, then run the startup steps (name, fn) in order.
+
+    Runs as a background task, so the server already answers /healthz
+    meanwhile. Until Mongo answers and every step has run it keeps trying,
+    `delay` seconds after each failed round, resuming at the step that
+    failed; /readyz shows the last error meanwhile.
+    """
+    began = time.perf_counter()
+    pending = list(steps)
+    while not startup.stopping:
+        try:
+            if not wait_for_mongo(sleep=socketio.sleep):
+                raise ConnectionError("MongoDB is unreachable")
+            if 'mongo' not in startup.phases:
+                startup.record('mongo', began)
+            while pending:
+                name, fn = pending[0]
+                with startup.phase(name):
+                    fn()
+                pending.pop(0)
+        except ConnectionError as e:
+            startup.fail(str(e))
+        except Exception as e:
+            logging.exception("startup step failed")
+            startup.fail(str(e))
+        else:
+            startup.error = None
+            startup.finish()
+            return
+        socketio.sleep(delay)
+
+
+def mongo_answers():
+    try:
+        db_pool.run(mongo_client.admin.command, 'ping', timeout=READY_PING_TIMEOUT)
+        return True
+    except Exception:
+        return False
+
+
+@health_bp.route('/healthz')
+def healthz():
+    """The process serves requests; whether it finished starting is /readyz's business."""
+    return jsonify({"status": "ok", "uptime": startup.elapsed()}), 200
+
+
+@health_bp.route('/readyz')
+def readyz():
+    """Startup finished and Mongo answers right now."""
+    if startup.stopping:
+        return jsonify({"status": "stopping"}), 503
+    if not startup.ready:
+        return jsonify({"status": "starting", "error": startup.error,
+                        "phases": startup.phases}), 503
+    if not mongo_answers():
+        return jsonify({"status": "degraded", "error": f"no answer from MongoDB ({db.name})"}), 503
+    return jsonify({"status": "ready", "phases": startup.phases}), 200
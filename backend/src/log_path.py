@@ -1,129 +1,255 @@
+import atexit
+import gzip
+import json
 import logging
 import os
+import queue
+import random
+import shutil
+import time
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler, TimedRotatingFileHandler
 from flask import Blueprint, request, Request, Response, session
+from metrics import export
 import re
 
 full_http_logger = None
+full_http_listener = None
+access_logger = None
+
+# 'json' writes one JSON object per request to access.log instead of the
+# plain line in server.log
+LOG_FORMAT = os.environ.get('LOG_FORMAT', 'text')
+# rotate by size, or by time if LOG_ROTATE_WHEN is set ('midnight', 'H', ...)
+LOG_MAX_BYTES = int(os.environ.get('LOG_MAX_BYTES', 10 * 1024 * 1024))
+LOG_ROTATE_WHEN = os.environ.get('LOG_ROTATE_WHEN', '')
+LOG_BACKUP_COUNT = int(os.environ.get('LOG_BACKUP_COUNT', 5))
+# gzip files as they are rotated out
+LOG_GZIP = os.environ.get('LOG_GZIP', '0') == '1'
+
+# share of requests whose bodies get logged (0..1); errors (>= 400) always are
+HTTP_BODY_LOG_SAMPLE = float(os.environ.get('HTTP_BODY_LOG_SAMPLE', 1.0))
+# records waiting for the writer thread; beyond this new ones are dropped
+HTTP_BODY_LOG_QUEUE = int(os.environ.get('HTTP_BODY_LOG_QUEUE', 10000))
+# characters of each body that are logged
+BODY_LIMIT = 2048
+# bytes of each body that are captured and redacted before cutting to
+# BODY_LIMIT, so a secret crossing the limit is still found whole
+BODY_CAPTURE = 16 * BODY_LIMIT
+
+# control bytes other than tab / newline / carriage return mark a body as binary
+_CONTROL_BYTES = bytes(b for b in range(32) if b not in (9, 10, 13))
+
+# every sensitive JSON field in one pass: "field" : "value"; escaped quotes
+# don't end the value, and one cut off by BODY_CAPTURE runs to the end
+_SENSITIVE_FIELD = re.compile(
+    r'("(?:password|oldPassword|auth_token|access_token|token|secret)"\s*:\s*)"(?:[^"\\]|\\.)*(?:"|\\?\Z)',
+    re.IGNORECASE)
+_AUTH_COOKIE = re.compile(r'(auth_token=)[^;]+', re.IGNORECASE)
+
+
+class DroppingQueueHandler(QueueHandler):
+    """QueueHandler that hands records over unformatted and never blocks.
+
+    Formatting (and so the body redaction in HttpExchange.__str__) happens
+    on the listener thread. When the queue is full the record is dropped
+    and counted, rather than slowing down the request.
+    """
+
+    def __init__(self, q):
+        super().__init__(q)
+        self.dropped = 0
+
+    def prepare(self, record):
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class JsonFormatter(logging.Formatter):
+    """Formats a record whose message is a dict as one line of JSON."""
+
+    def format(self, record):
+        return json.dumps(dict(record.msg, ts=round(record.created, 6)), separators=(',', ':'))
+
+
+def _gzip_rotator(source, dest):
+    with open(source, 'rb') as f, gzip.open(dest, 'wb') as out:
+        shutil.copyfileobj(f, out)
+    os.remove(source)
+
+
+def rotating_handler(path):
+    """File handler for `path` that rotates per the LOG_* settings."""
+    if LOG_ROTATE_WHEN:
+        handler = TimedRotatingFileHandler(path, when=LOG_ROTATE_WHEN, backupCount=LOG_BACKUP_COUNT)
+    else:
+        handler = RotatingFileHandler(path, maxBytes=LOG_MAX_BYTES, backupCount=LOG_BACKUP_COUNT)
+    if LOG_GZIP:
+        handler.namer = lambda name: name + '.gz'
+        handler.rotator = _gzip_rotator
+    return handler
+
+
+def queued(logger, handler, size):
+    """Send `logger`'s records to `handler` through a background thread."""
+    records = queue.Queue(size)
+    enqueue = DroppingQueueHandler(records)
+    logger.addHandler(enqueue)
+    export('log_queue', lambda: {'queued': records.qsize(), 'dropped': enqueue.dropped}, logger=logger.name)
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+    listener = QueueListener(records, handler)
+    listener.start()
+    # write out whatever is still queued when the process exits
+    atexit.register(listener.stop)
+    return listener
+
 
 def setup_loggers(log_dir="/logs"):
-    global full_http_logger
+    global full_http_logger, full_http_listener, access_logger
     # Make sure the log directory exists
     os.makedirs(log_dir, exist_ok=True)
 
     # Set up main server logger (root logger)
     logging.basicConfig(
-        filename=os.path.join(log_dir, "server.log"),
+        handlers=[rotating_handler(os.path.join(log_dir, "server.log"))],
         level=logging.INFO,
         format="%(asctime)s [%(levelname)s] %(message)s"
     )
 
     # Set up a separate logger for full HTTP request/response bodies
     full_http_logger = logging.getLogger("full_http")
-    full_http_handler = logging.FileHandler(os.path.join(log_dir, "full_http.log"))
+    full_http_handler = rotating_handler(os.path.join(log_dir, "full_http.log"))
     full_http_handler.setLevel(logging.INFO)
-    full_http_logger.propagate = False
 
     # Add a simple formatter to the full HTTP logger
     full_http_formatter = logging.Formatter("%(asctime)s %(message)s")
     full_http_handler.setFormatter(full_http_formatter)
 
-    # Attach the handler to the full_http logger
-    full_http_logger.addHandler(full_http_handler)
+    # Requests only enqueue; a background thread formats and writes to the file
+    if full_http_listener is None:
+        full_http_listener = queued(full_http_logger, full_http_handler, HTTP_BODY_LOG_QUEUE)
+
+    # One JSON object per request, see log_access()
+    if LOG_FORMAT == 'json' and access_logger is None:
+        access_logger = logging.getLogger("access")
+        access_handler = rotating_handler(os.path.join(log_dir, "access.log"))
+        access_handler.setFormatter(JsonFormatter())
+        queued(access_logger, access_handler, HTTP_BODY_LOG_QUEUE)
 
     return full_http_logger
 
+
+def log_access(req: Request, response: Response, started):
+    """Queue the JSON access record for one request; `started` is its perf_counter()."""
+    if access_logger is None:
+        return
+    rule = req.url_rule
+    access_logger.info({
+        'method': req.method,
+        'path': req.path,
+        # the route pattern, so /avatars/<filename> groups as one endpoint
+        'route': rule.rule if rule is not None else None,
+        'status': response.status_code,
+        'user': session.get("username", "anonymous"),
+        'ip': req.remote_addr,
+        'bytes_in': req.content_length or 0,
+        # unknown (None) for streamed responses
+        'bytes_out': response.content_length,
+        'latency_us': int((time.perf_counter() - started) * 1_000_000),
+    })
+
+
+class HttpExchange:
+    """One request/response pair, turned into log text only when written."""
+
+    def __init__(self, method, path, ip, username, code, headers, request_body, response_body):
+        self.method = method
+        self.path = path
+        self.ip = ip
+        self.username = username
+        self.code = code
+        self.headers = headers
+        # bytes, or a placeholder str when the body wasn't captured
+        self.request_body = request_body
+        self.response_body = response_body
+
+    def __str__(self):
+        safe_headers = sanitize_headers(self.headers)
+        header_str = "\n".join([f"{k}: {v}" for k, v in safe_headers.items()])
+        return (
+            f"{self.method} {self.path} from {self.ip} (user={self.username}) → {self.code}\n"
+            f"Request Headers:\n{header_str}\n\n"
+            f"Request Body:\n{body_text(self.request_body, 'request')}\n\n"
+            f"Response Body:\n{body_text(self.response_body, 'response')}\n"
+        )
+
+
 def log_safe_http(req: Request, response: Response):
     if full_http_logger is None:
         return
 
-    ip = req.remote_addr
     code = response.status_code
-    method = req.method
-    path = req.path
-    username = session.get("username", "anonymous")
-
-    # Redact headers that may contain tokens
-    safe_headers = sanitize_headers(req.headers)
-    header_str = "\n".join([f"{k}: {v}" for k, v in safe_headers.items()])
-    # Raw request bytes
+    if code < 400 and random.random() >= HTTP_BODY_LOG_SAMPLE:
+        return
 
+    # Only copy what's needed here; decoding and redaction happen on the writer thread
     try:
-        raw_bytes = req.get_data()
-        if b"password" in raw_bytes:
-            request_body = redact_password_from_raw(raw_bytes)
-        elif any(b < 32 and b not in (9, 10, 13) for b in raw_bytes[:2048]):
-            request_body = "[non-text request body omitted]"
-        else:
-            request_body = f"{raw_bytes[:2048].decode(errors='replace')}"
+        request_body = req.get_data()[:BODY_CAPTURE]
     except Exception:
         request_body = "[error reading request body]"
 
-    # Raw response bytes
-    try:
-        raw_response = response.get_data()
-        if any(b < 32 and b not in (9, 10, 13) for b in raw_response[:2048]):
-            response_body = "[non-text response body omitted]"
-        else:
-            response_body = f"{raw_response[:2048].decode(errors='replace')}"
-    except Exception:
-        response_body = "[error reading response body]"
-
-    # Final log message
-    message = (
-        f"{method} {path} from {ip} (user={username}) → {code}\n"
-        f"Request Headers:\n{header_str}\n\n"
-        f"Request Body:\n{request_body}\n\n"
-        f"Response Body:\n{response_body}\n"
-    )
+    # a streamed (or file) response would be read in full by get_data()
+    if response.is_streamed or response.direct_passthrough:
+        response_body = "[streamed response body not logged]"
+    else:
+        try:
+            response_body = response.get_data()[:BODY_CAPTURE]
+        except Exception:
+            response_body = "[error reading response body]"
+
+    full_http_logger.info(HttpExchange(
+        req.method, req.path, req.remote_addr, session.get("username", "anonymous"), code,
+        list(req.headers.items()), request_body, response_body))
 
-    full_http_logger.info(message)
+
+def body_text(raw_bytes, kind):
+    """Loggable text for a captured body: placeholder, redacted text or a binary note."""
+    if isinstance(raw_bytes, str):
+        return raw_bytes
+    # deleting the control bytes shortens the body only if it contains any
+    head = raw_bytes[:BODY_LIMIT]
+    if len(head.translate(None, _CONTROL_BYTES)) != len(head):
+        return f"[non-text {kind} body omitted]"
+    return redact_password_from_raw(raw_bytes)
 
 
 def redact_password_from_raw(raw_bytes: bytes) -> str:
     """
     Redacts sensitive fields like 'password', 'auth_token', 'token', 'secret' from raw JSON body bytes.
-    Returns the redacted string up to 2048 bytes.
+    Returns the redacted string up to BODY_LIMIT characters; redacting comes
+    first, so cutting can't leave part of a secret unmatched.
     """
     try:
         decoded = raw_bytes.decode(errors="replace")
-
-        # Fields to redact
-        sensitive_fields = [
-            "password",
-            "oldPassword",
-            "auth_token",
-            "access_token",
-            "token",
-            "secret"
-        ]
-
-        # Redact each sensitive field (case-insensitive)
-        for field in sensitive_fields:
-            # JSON-style key: "field" : "value"
-            decoded = re.sub(
-                rf'("{field}"\s*:\s*)"(.*?)"',
-                r'\1"[REDACTED]"',
-                decoded,
-                flags=re.IGNORECASE
-            )
-
-        # Truncate to first 2048 characters and return as a byte-style string
-        return f"b'{decoded[:2048]}'"
-
+        return _SENSITIVE_FIELD.sub(r'\1"[REDACTED]"', decoded)[:BODY_LIMIT]
     except Exception:
-        return "b'[error decoding and redacting request body]'"
+        return "[error decoding and redacting request body]"
 
 def sanitize_headers(headers):
     safe = {}
-    for k, v in headers.items():
+    for k, v in headers:
         # Redact auth header entirely
         if 'auth' in k.lower():
             safe[k] = '[REDACTED]'
         # Redact auth_token inside cookies
         elif k.lower() == 'cookie':
             # Carefully redact auth_token=... (but only the token, leave session intact)
-            redacted_cookie = re.sub(r'(auth_token=)[^;]+', r'\1[REDACTED]', v, flags=re.IGNORECASE)
-            safe[k] = redacted_cookie
+            safe[k] = _AUTH_COOKIE.sub(r'\1[REDACTED]', v)
         else:
             safe[k] = v
-    return safe
\ No newline at end of file
+    return safe
@@ -0,0 +1,182 @@
+# backend/metrics.py
+import functools
+import os
+import time
+from bisect import bisect_left
+
+from flask import Blueprint, Response
+
+from extensions import socketio
+
+# seconds between event-loop lag probes
+LOOP_LAG_INTERVAL = float(os.environ.get('LOOP_LAG_INTERVAL', 1.0))
+
+# upper bounds (seconds) shared by every latency histogram
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+
+metrics_bp = Blueprint('metrics', __name__)
+
+
+class Histogram:
+    """Cumulative-bucket histogram in the shape Prometheus expects."""
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        # one slot per bucket plus +Inf; cumulated only when rendered
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+
+    def lines(self, name, labels):
+        out = []
+        total = 0
+        for bound, n in zip(self.buckets + ('+Inf',), self.counts):
+            total += n
+            out.append(f'{name}_bucket{_labels(dict(labels, le=bound))} {total}')
+        out.append(f'{name}_sum{_labels(labels)} {self.sum}')
+        out.append(f'{name}_count{_labels(labels)} {total}')
+        return out
+
+
+# event -> Histogram / counts, filled in by timed()
+event_latency = {}
+event_errors = {}
+# room -> events handled for it
+room_events = {}
+# outgoing Socket.IO event -> [messages sent (one per recipient), bytes]
+sent = {}
+loop_lag = Histogram()
+loop_lag_last = [0.0]
+
+# name -> (callable returning {key: number}, labels); see export()
+_exports = {}
+
+
+def _labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{k}="{v}"' for k, v in labels.items()) + '}'
+
+
+def timed(event):
+    """Decorator recording latency and errors of a Socket.IO handler as `event`."""
+    def wrap(fn):
+        histogram = event_latency.setdefault(event, Histogram())
+        event_errors.setdefault(event, 0)
+
+        @functools.wraps(fn)
+        def handler(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            except Exception:
+                event_errors[event] += 1
+                raise
+            finally:
+                histogram.observe(time.perf_counter() - started)
+        return handler
+    return wrap
+
+
+def room_event(room):
+    """Count one handled event for `room` (events per second per room)."""
+    room_events[room] = room_events.get(room, 0) + 1
+
+
+def export(name, source, **labels):
+    """Publish a metrics dict (or a callable returning one) as `name_<key>` gauges."""
+    _exports[(name, tuple(labels.items()))] = (source, labels)
+
+
+def _event_name(data):
+    # an encoded EVENT packet looks like 2["name",...] or 51-["name",...]
+    start = data.find('["')
+    if start == -1:
+        return None
+    return data[start + 2:data.find('"', start + 2)]
+
+
+def _count_sent(send):
+    """Wrap Server._send_eio_packet: one call per recipient per frame."""
+    last = [None]
+
+    @functools.wraps(send)
+    def counted(eio_sid, pkt):
+        data = pkt.data
+        if isinstance(data, str):
+            last[0] = _event_name(data) or 'other'
+            entry = sent.get(last[0])
+            if entry is None:
+                entry = sent[last[0]] = [0, 0]
+            entry[0] += 1
+            entry[1] += len(data)
+        elif last[0] is not None:
+            # binary attachment of the event before it
+            sent[last[0]][1] += len(data)
+        return send(eio_sid, pkt)
+    return counted
+
+
+def _probe_loop_lag():
+    while True:
+        started = time.perf_counter()
+        socketio.sleep(LOOP_LAG_INTERVAL)
+        lag = max(time.perf_counter() - started - LOOP_LAG_INTERVAL, 0.0)
+        loop_lag.observe(lag)
+        loop_lag_last[0] = lag
+
+
+_started = [False]
+
+
+def init_metrics():
+    """Start counting sent messages and probing the event loop (after socketio.init_app)."""
+    if _started[0]:
+        return
+    _started[0] = True
+    server = socketio.server
+    # every emit, whatever the client manager, ends up here once per recipient;
+    # a private method, so requirements.txt pins python-socketio (see tests/test_metrics.py)
+    server._send_eio_packet = _count_sent(server._send_eio_packet)
+    socketio.start_background_task(_probe_loop_lag)
+
+
+def render():
+    """All metrics in the Prometheus text format."""
+    lines = ['# TYPE game_event_duration_seconds histogram']
+    for event, histogram in event_latency.items():
+        lines += histogram.lines('game_event_duration_seconds', {'event': event})
+    lines.append('# TYPE game_event_errors_total counter')
+    lines += [f'game_event_errors_total{_labels({"event": e})} {n}' for e, n in event_errors.items()]
+    lines.append('# TYPE game_room_events_total counter')
+    lines += [f'game_room_events_total{_labels({"room": r})} {n}' for r, n in room_events.items()]
+
+    lines.append('# TYPE socketio_messages_sent_total counter')
+    lines += [f'socketio_messages_sent_total{_labels({"event": e})} {n}' for e, (n, _) in sent.items()]
+    lines.append('# TYPE socketio_bytes_sent_total counter')
+    lines += [f'socketio_bytes_sent_total{_labels({"event": e})} {b}' for e, (_, b) in sent.items()]
+
+    lines.append('# TYPE event_loop_lag_seconds histogram')
+    lines += loop_lag.lines('event_loop_lag_seconds', {})
+    lines.append('# TYPE event_loop_lag_last_seconds gauge')
+    lines.append(f'event_loop_lag_last_seconds {loop_lag_last[0]}')
+
+    # the text format wants each metric's lines together, whichever dict they came from
+    exported = {}
+    for (name, _), (source, labels) in _exports.items():
+        values = source() if callable(source) else source
+        for key, value in values.items():
+            if isinstance(value, (int, float)):
+                exported.setdefault(f'{name}_{key}', []).append(f'{name}_{key}{_labels(labels)} {value}')
+    for metric, samples in exported.items():
+        lines.append(f'# TYPE {metric} untyped')
+        lines += samples
+    return '\n'.join(lines) + '\n'
+
+
+@metrics_bp.route('/api/metrics')
+def get_metrics():
+    return Response(render(), mimetype='text/plain; version=0.0.4')
@@ -0,0 +1,145 @@
+# backend/offload.py
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+
+from extensions import socketio
+from metrics import export
+
+
+class PoolSaturated(Exception):
+    """Raised instead of queueing when a WorkerPool's queue is full."""
+
+
+class PoolTimeout(Exception):
+    """Raised when a call doesn't finish within the pool's timeout."""
+
+
+# OS threads requested by all pools so far (eventlet's tpool is shared)
+_total_threads = 0
+
+
+class WorkerPool:
+    """Bounded pool for blocking calls (pymongo, bcrypt) made from handlers.
+
+    Under eventlet the call runs on a real OS thread via eventlet.tpool, so
+    only the calling greenthread waits and the hub keeps serving every
+    other socket. At most `size` calls run at once, and up to `queue_size`
+    more may wait. Beyond that run() raises PoolSaturated right away, so a
+    slow backend means fast errors rather than an ever-growing backlog.
+    """
+
+    def __init__(self, name, size, queue_size, timeout):
+        global _total_threads
+        self.name = name
+        self.size = size
+        self.queue_size = queue_size
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._executor = None
+        self._slots = None
+        self.metrics = {'calls': 0, 'rejected': 0, 'timeouts': 0, 'errors': 0}
+        export('worker_pool', lambda: dict(self.metrics, pending=self._pending, size=size), pool=name)
+
+        _total_threads += size
+        try:
+            from eventlet import tpool
+            tpool.set_num_threads(max(_total_threads, 20))
+        except ImportError:
+            pass
+
+    def _eventlet(self):
+        return socketio.async_mode == 'eventlet'
+
+    def pending(self):
+        """Calls running or waiting right now."""
+        return self._pending
+
+    def run(self, fn, *args, timeout=None, **kwargs):
+        """Call fn(*args, **kwargs) on the pool and wait for its result.
+
+        On timeout only the wait gives up: a call already on its OS thread
+        keeps its slot (and counts as pending) until it returns, so a hung
+        backend can't pile up more threads than `size`.
+        """
+        timeout = self.timeout if timeout is None else timeout
+        with self._lock:
+            if self._pending >= self.size + self.queue_size:
+                self.metrics['rejected'] += 1
+                raise PoolSaturated(f"{self.name} pool is saturated")
+            self._pending += 1
+            self.metrics['calls'] += 1
+        try:
+            if self._eventlet():
+                return self._run_eventlet(fn, args, kwargs, timeout)
+            return self._run_threaded(fn, args, kwargs, timeout)
+        except PoolTimeout:
+            self.metrics['timeouts'] += 1
+            raise
+        except Exception:
+            self.metrics['errors'] += 1
+            raise
+
+    def _finished(self):
+        with self._lock:
+            self._pending -= 1
+
+    def _run_eventlet(self, fn, args, kwargs, timeout):
+        import eventlet
+        from eventlet import tpool
+        from eventlet.semaphore import Semaphore
+
+        if self._slots is None:
+            self._slots = Semaphore(self.size)
+
+        def job():
+            try:
+                return tpool.execute(fn, *args, **kwargs)
+            finally:
+                self._slots.release()
+                self._finished()
+
+        worker = None
+        try:
+            # the OS thread can't be interrupted; on timeout only the caller gives up
+            with eventlet.Timeout(timeout, PoolTimeout(f"{self.name} call timed out after {timeout}s")):
+                self._slots.acquire()
+                # nothing yields between taking the slot and handing it to job()
+                worker = eventlet.spawn(job)
+                return worker.wait()
+        finally:
+            if worker is None:
+                self._finished()
+
+    def _run_threaded(self, fn, args, kwargs, timeout):
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(self.size, thread_name_prefix=self.name)
+        try:
+            future = self._executor.submit(fn, *args, **kwargs)
+        except BaseException:
+            self._finished()
+            raise
+        future.add_done_callback(lambda _: self._finished())
+        try:
+            return future.result(timeout)
+        except FutureTimeout:
+            # still queued: it never needs to run
+            future.cancel()
+            raise PoolTimeout(f"{self.name} call timed out after {timeout}s")
+
+    def submit(self, fn, *args, callback=None, **kwargs):
+        """Fire-and-forget: run fn in the background, then callback(result).
+
+        The callback runs in a background task, so it may emit. Failures are
+        logged, not raised.
+        """
+        def task():
+            try:
+                result = self.run(fn, *args, **kwargs)
+            except Exception:
+                logging.exception(f"{self.name} background call failed")
+                return
+            if callback is not None:
+                callback(result)
+        socketio.start_background_task(task)
@@ -0,0 +1,110 @@
+# backend/schema.py
+"""Indexes the app's queries rely on, and a check that they are used.
+
+    python src/schema.py           # create any missing indexes
+    python src/schema.py --check   # also explain() the hot queries; exit 1 on a COLLSCAN
+"""
+import logging
+import os
+import sys
+
+from pymongo import ASCENDING, DESCENDING
+from pymongo.errors import ConnectionFailure, OperationFailure
+
+# run ensure_indexes() when the app starts / also verify the query plans
+ENSURE_INDEXES = os.environ.get('MONGO_ENSURE_INDEXES', '1') == '1'
+CHECK_QUERY_PLANS = os.environ.get('MONGO_CHECK_QUERY_PLANS', '0') == '1'
+
+# collection -> [(keys, options)]; names are fixed so re-running is a no-op
+INDEXES = {
+    'users': [
+        ([('username', ASCENDING)], {'name': 'username_unique', 'unique': True}),
+    ],
+    'players': [
+        # stats are upserted by username, so this also stops duplicate rows
+        ([('username', ASCENDING)], {'name': 'username_unique', 'unique': True}),
+        ([('max_score', DESCENDING)], {'name': 'max_score_desc'}),
+    ],
+    'grid_chunks': [
+        ([('world', ASCENDING)], {'name': 'world'}),
+    ],
+}
+
+# (description, collection, filter, sort) for every query on a hot path
+QUERIES = [
+    ('signup / login / profile lookup', 'users', {'username': 'x'}, None),
+    ('player stats', 'players', {'username': 'x'}, None),
+    ('leaderboard', 'players', {'max_score': {'$exists': True}}, [('max_score', DESCENDING)]),
+    ('grid restore', 'grid_chunks', {'world': 'main'}, None),
+]
+
+
+class QueryPlanError(Exception):
+    """Raised by check_query_plans() when a hot query would scan a whole collection."""
+
+
+def ensure_indexes(db):
+    """Create the indexes in INDEXES that don't exist yet; returns their names."""
+    created = []
+    for collection, indexes in INDEXES.items():
+        for keys, options in indexes:
+            try:
+                created.append(db[collection].create_index(keys, **options))
+            except OperationFailure as e:
+                # e.g. existing duplicate usernames block a unique index;
+                # the app still works, just slower, so don't refuse to start
+                logging.error(f"could not create index {collection}.{options['name']}: {e}")
+    return created
+
+
+def plan_stages(plan):
+    """Every stage name in an explain() plan tree."""
+    stages = [plan['stage']] if 'stage' in plan else []
+    for key in ('inputStage', 'queryPlan'):
+        if key in plan:
+            stages += plan_stages(plan[key])
+    for child in plan.get('inputStages', []):
+        stages += plan_stages(child)
+    return stages
+
+
+def check_query_plans(db):
+    """explain() each query in QUERIES; raise QueryPlanError if any is a COLLSCAN."""
+    scans = []
+    for description, collection, query, sort in QUERIES:
+        cursor = db[collection].find(query).limit(1)
+        if sort:
+            cursor = cursor.sort(sort)
+        plan = cursor.explain()['queryPlanner']['winningPlan']
+        stages = plan_stages(plan)
+        logging.info(f"query plan for {description}: {' <- '.join(stages)}")
+        if 'COLLSCAN' in stages:
+            scans.append(f"{description} ({collection} {query})")
+    if scans:
+        raise QueryPlanError("collection scan in: " + ", ".join(scans))
+
+
+def init_schema(db):
+    """Startup hook: ensure indexes, and check plans if MONGO_CHECK_QUERY_PLANS=1."""
+    if ENSURE_INDEXES:
+        try:
+            ensure_indexes(db)
+        except ConnectionFailure as e:
+            logging.error(f"could not reach MongoDB to create indexes: {e}")
+            return
+    if CHECK_QUERY_PLANS:
+        check_query_plans(db)
+
+
+if __name__ == '__main__':
+    from db import db
+
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+    print("indexes:", ", ".join(ensure_indexes(db)))
+    if '--check' in sys.argv[1:]:
+        try:
+            check_query_plans(db)
+        except QueryPlanError as e:
+            print(e, file=sys.stderr)
+            sys.exit(1)
+        print("all queries use an index")
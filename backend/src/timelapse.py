@@ -0,0 +1,99 @@
+# backend/timelapse.py
+"""Render a room's paint journal (GRID_JOURNAL_DIR) as an animated timelapse.
+
+    python src/timelapse.py --journal /journal main -o main.webp
+    python src/timelapse.py --journal /journal main --start 2024-05-01T12:00 --frames 600 -o noon.gif
+
+Frames are evenly spaced between --start and --end (default: the first and
+last journaled paint); the extension of --out picks WebP or GIF. Players
+are drawn in their game colors from --colors (a JSON {username: "#rrggbb"}
+file), or in a color derived from their name.
+"""
+import argparse
+import hashlib
+import json
+import sys
+from datetime import datetime
+
+from PIL import Image
+
+from game.journal import JournalReader
+
+BACKGROUND = (255, 255, 255)
+
+
+def name_color(username):
+    """A stable color for a player without a stored one."""
+    digest = hashlib.md5(username.encode('utf-8')).digest()
+    return tuple(64 + b % 160 for b in digest[:3])
+
+
+def hex_color(color):
+    return tuple(int(color[i:i + 2], 16) for i in (1, 3, 5))
+
+
+def frame_times(start, end, count):
+    if count <= 1 or end <= start:
+        return [end]
+    step = (end - start) / (count - 1)
+    return [start + i * step for i in range(count)]
+
+
+def render(reader, times, scale=4, colors=None):
+    """Yield one RGB image per timestamp."""
+    colors = colors or {}
+    # journal owner id -> RGB, as one flat lookup table
+    lut = bytearray(BACKGROUND)
+    for username in reader.names[1:]:
+        color = colors.get(username)
+        lut += bytes(hex_color(color) if color else name_color(username))
+    size = (reader.cols * scale, reader.rows * scale)
+    for _, owners in reader.frames(times):
+        rgb = b''.join(lut[3 * i:3 * i + 3] for i in owners)
+        image = Image.frombytes('RGB', (reader.cols, reader.rows), rgb)
+        yield image.resize(size, Image.Resampling.NEAREST) if scale != 1 else image
+
+
+def parse_time(value):
+    try:
+        return float(value)
+    except ValueError:
+        return datetime.fromisoformat(value).timestamp()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('room', help='room shard, e.g. main or main-2')
+    parser.add_argument('--journal', required=True, help='GRID_JOURNAL_DIR of the server')
+    parser.add_argument('-o', '--out', required=True, help='output .webp or .gif')
+    parser.add_argument('--start', type=parse_time, help='unix seconds or ISO time (local)')
+    parser.add_argument('--end', type=parse_time, help='unix seconds or ISO time (local)')
+    parser.add_argument('--frames', type=int, default=300)
+    parser.add_argument('--fps', type=float, default=30)
+    parser.add_argument('--scale', type=int, default=4, help='pixels per cell')
+    parser.add_argument('--colors', help='JSON file of {username: "#rrggbb"}')
+    args = parser.parse_args(argv)
+
+    reader = JournalReader(args.journal, args.room)
+    span = reader.span()
+    if span is None:
+        sys.exit(f"the {args.room} journal is empty")
+    start = span[0] if args.start is None else args.start
+    end = span[1] if args.end is None else args.end
+    colors = None
+    if args.colors:
+        with open(args.colors, encoding='utf-8') as f:
+            colors = json.load(f)
+
+    times = frame_times(start, end, args.frames)
+    frames = render(reader, times, args.scale, colors)
+    first = next(frames)
+    fmt = 'GIF' if args.out.lower().endswith('.gif') else 'WEBP'
+    first.save(args.out, fmt, save_all=True, append_images=frames,
+               duration=round(1000 / args.fps), loop=0)
+    print(f"{args.out}: {len(times)} frames, {reader.cols}x{reader.rows} cells, "
+          f"{reader.index_at(end) - reader.index_at(start)} paints")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,82 @@
+# backend/user_cache.py
+import os
+import time
+from collections import OrderedDict
+
+from db import users_collection, db_call
+from metrics import export
+
+# how many profiles to keep, and for how long (seconds)
+USER_CACHE_SIZE = int(os.environ.get('USER_CACHE_SIZE', 10000))
+USER_CACHE_TTL = float(os.environ.get('USER_CACHE_TTL', 300))
+
+# the rarely-changing fields handlers read from `users`; never the password
+PROFILE_FIELDS = {"_id": 0, "username": 1, "avatar": 1, "avatar_id": 1, "color": 1, "achievements": 1}
+
+_MISSING = object()
+
+
+class TTLCache:
+    """LRU cache whose entries also expire `ttl` seconds after being stored."""
+
+    def __init__(self, maxsize, ttl):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        # key -> (expires_at, value), least recently used first
+        self._data = OrderedDict()
+        self.metrics = {'hits': 0, 'misses': 0, 'evictions': 0, 'expired': 0}
+
+    def get(self, key, default=_MISSING):
+        entry = self._data.get(key)
+        if entry is not None:
+            if entry[0] > time.monotonic():
+                self._data.move_to_end(key)
+                self.metrics['hits'] += 1
+                return entry[1]
+            del self._data[key]
+            self.metrics['expired'] += 1
+        self.metrics['misses'] += 1
+        return default
+
+    def set(self, key, value):
+        self._data[key] = (time.monotonic() + self.ttl, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+            self.metrics['evictions'] += 1
+
+    def invalidate(self, key):
+        self._data.pop(key, None)
+
+    def __len__(self):
+        return len(self._data)
+
+
+profile_cache = TTLCache(USER_CACHE_SIZE, USER_CACHE_TTL)
+export('profile_cache', lambda: dict(profile_cache.metrics, size=len(profile_cache)))
+
+
+def get_user_profile(username):
+    """Read-through lookup of a user's profile fields; None if no such user.
+
+    Unknown usernames are cached too (signup invalidates them). A failed or
+    timed-out query is not cached, and returns None.
+    """
+    profile = profile_cache.get(username)
+    if profile is not _MISSING:
+        return profile
+    profile = db_call(users_collection.find_one, {"username": username}, PROFILE_FIELDS,
+                      default=_MISSING)
+    if profile is _MISSING:
+        return None
+    profile_cache.set(username, profile)
+    return profile
+
+
+def invalidate_profile(username):
+    """Drop a cached profile after its fields changed in Mongo.
+
+    With several workers, this only clears the local copy. The others may
+    serve the old value for up to USER_CACHE_TTL.
+    """
+    profile_cache.invalidate(username)
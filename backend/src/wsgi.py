@@ -0,0 +1,5 @@
+# backend/wsgi.py
+"""Production entry point for gunicorn, see gunicorn.conf.py."""
+from app import create_app
+
+app = create_app()
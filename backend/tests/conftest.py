@@ -0,0 +1,52 @@
+# backend/tests/conftest.py
+import os
+import sys
+
+import pytest
+
+# the server imports its modules flat from src/ (gunicorn.conf.py chdirs there)
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+
+@pytest.fixture(scope='session')
+def app():
+    """The whole app on an in-memory MongoDB, started and ready for sockets."""
+    mongomock = pytest.importorskip('mongomock')
+    import db
+
+    # before anything does `from db import ...`
+    client = mongomock.MongoClient()
+    db.mongo_client = client
+    db.db = client['fantastic_game']
+    db.users_collection = db.db['users']
+    db.player_collection = db.db['players']
+    db.grid_chunks_collection = db.db['grid_chunks']
+
+    from app import create_app
+    from extensions import socketio
+    from health import startup
+
+    app = create_app()
+    for _ in range(200):
+        if startup.ready:
+            break
+        socketio.sleep(0.05)
+    assert startup.ready, startup.error
+    return app
+
+
+@pytest.fixture
+def socket_client(app):
+    """Make Socket.IO test clients; disconnects them afterwards."""
+    from extensions import socketio
+
+    clients = []
+
+    def connect():
+        client = socketio.test_client(app)
+        clients.append(client)
+        return client
+    yield connect
+    for client in clients:
+        if client.is_connected():
+            client.disconnect()
@@ -0,0 +1,30 @@
+# backend/tests/test_analytics.py
+from array import array
+
+from game.analytics import GridAnalytics
+from game.grid import GridStore
+
+
+class InlinePool:
+    def run(self, fn, *args):
+        return fn(*args)
+
+
+def test_analytics_names_every_id_while_another_worker_paints():
+    grid = GridStore(2, 1)
+    grid.paint(0, 0, 'ann')
+
+    class RacingGrid:
+        """Through the broker, 'bob' paints between any two calls."""
+
+        def __getattr__(self, name):
+            if name == 'owners':
+                grid.paint(1, 0, 'bob')
+            return getattr(grid, name)
+
+    analytics = GridAnalytics(None, RacingGrid(), array('I', bytes(8)), 2, 1,
+                              pool=InlinePool())
+    analytics.refresh()
+
+    assert set(analytics.result()['players']) <= {'ann', 'bob'}
+    assert 'ann' in analytics.result()['players']
@@ -0,0 +1,65 @@
+# backend/tests/test_game_routes.py
+# the app's modules are imported inside the tests: the `app` fixture has to
+# swap in the test database before game.routes is first imported
+
+import pytest
+
+
+def join(client, monkeypatch, username, start, **data):
+    """Join with the player starting at `start` (x, y)."""
+    import game.routes as routes
+
+    coords = iter(start)
+    monkeypatch.setattr(routes.random, 'randint', lambda a, b: next(coords, a))
+    client.emit('join_game', dict(data, username=username, room='main'))
+    monkeypatch.undo()
+    return client.get_received()
+
+
+def paints_by(received, username):
+    return [(p['x'], p['y']) for m in received if m['name'] == 'tick'
+            for p in m['args'][0]['paints'] if p['username'] == username]
+
+
+def test_tab_without_viewport_gets_paints_outside_its_view(socket_client, monkeypatch):
+    from extensions import socketio
+
+    # no `aoi` / `view`: the JSON fallback, holding the whole grid
+    watcher = socket_client()
+    received = join(watcher, monkeypatch, 'watcher', (0, 0))
+    assert 'grid_state' in [m['name'] for m in received]
+
+    # far outside the default 25x25 view around (0, 0)
+    painter = socket_client()
+    join(painter, monkeypatch, 'painter', (90, 90), aoi=True, binary=True)
+    painter.emit('move', {'dir': 'left'})
+    socketio.sleep(0.2)
+
+    assert (89, 90) in paints_by(watcher.get_received(), 'painter')
+
+
+def test_join_gives_the_seat_back_when_the_shard_fails_to_load(socket_client, monkeypatch):
+    import game.routes as routes
+
+    def unavailable(name):
+        raise RuntimeError('mongo is down')
+    monkeypatch.setattr(routes, 'get_room', unavailable)
+    with pytest.raises(RuntimeError):
+        join(socket_client(), monkeypatch, 'unlucky', (5, 5))
+
+    assert routes.room_registry.shard_of('unlucky') is None
+    assert not routes.players.has('unlucky')
+
+
+def test_player_stats_leave_out_the_stored_color(app):
+    import game.routes as routes
+
+    routes.player_collection.insert_one({
+        'username': 'painted', 'color': '#123456', 'games_played': 1,
+        'total_score': 4, 'max_score': 4, 'min_score': 4, 'average_score': 4})
+
+    response = app.test_client().get('/api/game/player-stats?username=painted')
+
+    assert response.status_code == 200
+    assert response.get_json()['max_score'] == 4
+    assert 'color' not in response.get_json()
@@ -0,0 +1,54 @@
+# backend/tests/test_grid.py
+import pytest
+
+from game import grid as grid_module
+from game.grid import GridStore
+
+
+def test_paint_moves_ownership_and_counts():
+    grid = GridStore(4, 4)
+    assert grid.paint(1, 1, 'ann') is None
+    assert grid.paint(1, 1, 'bob') == 'ann'
+    assert grid.owner(1, 1) == 'bob'
+    assert grid.count('ann') == 0
+    assert grid.count('bob') == 1
+    assert len(grid) == 1
+
+
+def test_owner_ids_are_reused_after_vacating(monkeypatch):
+    monkeypatch.setattr(grid_module, 'MAX_OWNERS', 3)
+    vacated = []
+    grid = GridStore(2, 2, on_vacated=vacated.append)
+    for i, name in enumerate(['a', 'b', 'c']):
+        grid.paint(i % 2, i // 2, name)
+    with pytest.raises(ValueError):
+        grid.paint(1, 1, 'd')
+
+    # 'a' loses its only cell, so its id is free for 'd'
+    assert grid.paint(0, 0, 'c') == 'a'
+    assert vacated == ['a']
+    grid.paint(1, 1, 'd')
+    assert grid.owner(1, 1) == 'd'
+    assert grid.count('a') == 0
+    assert grid.owner_id('a') == grid_module.EMPTY
+    assert sorted(name for _, name, _ in grid.owners()) == ['b', 'c', 'd']
+
+
+def test_changes_since_never_names_a_reused_id(monkeypatch):
+    monkeypatch.setattr(grid_module, 'MAX_OWNERS', 2)
+    grid = GridStore(2, 1)
+    grid.paint(0, 0, 'a')
+    version = grid.version()
+    grid.paint(0, 0, 'b')
+    grid.paint(1, 0, 'c')
+    _, changes = grid.changes_since(version)
+    assert sorted(changes) == [(0, 0, 'b'), (1, 0, 'c')]
+
+
+def test_load_region_releases_owners_it_overwrote():
+    grid = GridStore(2, 1)
+    grid.paint(0, 0, 'a')
+    grid.load_region(0, 0, 2, 1, [1, 1], ['b'])
+    assert grid.count('b') == 2
+    assert grid.owner_id('a') == grid_module.EMPTY
+    assert grid.scores() == {'b': 2}
@@ -0,0 +1,93 @@
+# backend/tests/test_journal.py
+from game import journal as journal_module
+from game.grid import GridStore
+from game.journal import GridJournal, JournalReader
+from game.rooms import Room
+
+
+class FakeSocketIO:
+    def start_background_task(self, fn, *args):
+        return None
+
+    def sleep(self, seconds):
+        pass
+
+
+def make_room(tmp_path, grid):
+    journal = GridJournal(str(tmp_path), 'main', grid.cols, grid.rows)
+    return Room('main', grid, None, FakeSocketIO(), grid.cols, grid.rows,
+                None, None, journal=journal)
+
+
+def test_full_owner_table_drops_paints_but_not_the_game(tmp_path, monkeypatch):
+    monkeypatch.setattr(journal_module, 'MAX_OWNERS', 2)
+    grid = GridStore(4, 1)
+    room = make_room(tmp_path, grid)
+    for x, name in enumerate(['a', 'b', 'c', 'd']):
+        room.paint(x, 0, name)
+    room.journal.close()
+
+    assert grid.scores() == {'a': 1, 'b': 1, 'c': 1, 'd': 1}
+    assert room.journal.metrics['dropped'] == 2
+    reader = JournalReader(str(tmp_path), 'main')
+    assert reader.names == [None, 'a', 'b']
+    assert reader.index_at(float('inf')) == 2
+
+
+def test_full_owner_table_survives_a_restart(tmp_path, monkeypatch):
+    monkeypatch.setattr(journal_module, 'MAX_OWNERS', 1)
+    grid = GridStore(2, 1)
+    room = make_room(tmp_path, grid)
+    room.paint(0, 0, 'a')
+    room.journal.close()
+
+    # reopened with a grid holding an owner the table has no room for
+    grid.paint(1, 0, 'b')
+    room = make_room(tmp_path, grid)
+    room.journal.keyframe_from(grid)
+    room.paint(1, 0, 'c')
+    assert grid.owner(1, 0) == 'c'
+    assert room.journal.metrics['dropped'] == 1
+    room.journal.close()
+
+
+class Stop(Exception):
+    pass
+
+
+class LoopSocketIO:
+    """Runs the started task inline, for `ticks` sleeps."""
+
+    def __init__(self, ticks):
+        self.ticks = ticks
+        self.task = None
+
+    def start_background_task(self, fn, *args):
+        self.task = lambda: fn(*args)
+        return self.task
+
+    def sleep(self, seconds):
+        if not self.ticks:
+            raise Stop
+        self.ticks -= 1
+
+
+def test_keyframes_are_written_by_the_background_task(tmp_path):
+    journal = GridJournal(str(tmp_path), 'main', 2, 1, keyframe_records=2)
+    socketio = LoopSocketIO(ticks=1)
+    journal.start(socketio)
+    journal.record(0, 0, 'a', at=1.0)
+    journal.record(1, 0, 'b', at=2.0)
+
+    # the paint that took the keyframe didn't write it
+    assert JournalReader(str(tmp_path), 'main').keyframe_count == 0
+    try:
+        socketio.task()
+    except Stop:
+        pass
+    assert journal.metrics['keyframes'] == 1
+    journal.close()
+
+    reader, grid = journal_module.replay(str(tmp_path), 'main', 2.0)
+    assert reader.keyframe_count == 1
+    assert (grid.owner(0, 0), grid.owner(1, 0)) == ('a', 'b')
@@ -0,0 +1,26 @@
+# backend/tests/test_leaderboard.py
+from game.leaderboard import Leaderboard
+
+
+def test_record_game_for_player_on_the_board():
+    board = Leaderboard(size=3)
+    board.warm([{"username": "ann", "max_score": 10, "games_played": 2, "average_score": 6}])
+    assert board.record_game("ann", 3) is False
+    assert board.top(1) == [{"username": "ann", "max_score": 10, "games_played": 3, "average_score": 5}]
+
+
+def test_record_game_for_player_not_on_the_board():
+    board = Leaderboard(size=3)
+    assert board.record_game("bob", 7) is True
+    assert board.top(1) == [{"username": "bob", "max_score": 7, "games_played": 1, "average_score": 7}]
+
+    # the stored stats from before this session arrive afterwards
+    board.fill("bob", {"username": "bob", "max_score": 9, "games_played": 2, "average_score": 4})
+    assert board.top(1) == [{"username": "bob", "max_score": 9, "games_played": 3, "average_score": 5}]
+
+
+def test_record_game_below_a_full_board():
+    board = Leaderboard(size=1)
+    board.warm([{"username": "ann", "max_score": 10, "games_played": 1, "average_score": 10}])
+    assert board.record_game("bob", 4) is False
+    assert [e["username"] for e in board.top(5)] == ["ann"]
@@ -0,0 +1,27 @@
+# backend/tests/test_log_path.py
+import re
+
+from log_path import BODY_CAPTURE, BODY_LIMIT, body_text
+
+
+def test_password_crossing_the_body_limit_is_redacted():
+    body = '{"note": "' + 'x' * 2030 + '", "password": "' + 's' * 100 + '"}'
+    assert body.index('"password"') < BODY_LIMIT < len(body)
+
+    logged = body_text(body.encode(), 'request')
+
+    assert len(logged) <= BODY_LIMIT
+    assert not re.search('s{5}', logged)
+
+
+def test_password_cut_off_by_the_capture_is_redacted():
+    body = '{"note": "x", "password": "' + 's' * BODY_CAPTURE
+    logged = body_text(body.encode()[:BODY_CAPTURE], 'request')
+
+    assert logged == '{"note": "x", "password": "[REDACTED]"'
+
+
+def test_escaped_quote_does_not_end_the_secret():
+    logged = body_text(b'{"token": "ab\\"cd", "x": 1}', 'request')
+
+    assert logged == '{"token": "[REDACTED]", "x": 1}'
@@ -0,0 +1,26 @@
+# backend/tests/test_metrics.py
+import socketio as python_socketio
+
+import metrics
+
+
+def test_sent_messages_are_counted_once_per_recipient(monkeypatch):
+    """metrics.py counts in python-socketio's private Server._send_eio_packet;
+    if an upgrade stops routing emits through it, this fails."""
+    monkeypatch.setattr(metrics, 'sent', {})
+    server = python_socketio.Server(async_mode='threading')
+    frames = []
+    monkeypatch.setattr(server.eio, 'send_packet', lambda eio_sid, pkt: frames.append(pkt))
+    server._send_eio_packet = metrics._count_sent(server._send_eio_packet)
+    for eio_sid in ('a', 'b'):
+        sid = server.manager.connect(eio_sid, '/')
+        server.manager.enter_room(sid, '/', 'main:0:0', eio_sid)
+
+    server.emit('tick', {'moves': [], 'paints': []}, to='main:0:0')
+    server.emit('grid_snapshot', {'cells': b'\x00' * 100}, to='main:0:0')
+
+    assert metrics.sent['tick'][0] == 2
+    assert metrics.sent['grid_snapshot'][0] == 2
+    # the binary attachment counts towards its event
+    assert metrics.sent['grid_snapshot'][1] > 2 * 100
+    assert sum(n for n, _ in metrics.sent.values()) == 4 < len(frames)
@@ -0,0 +1,49 @@
+# backend/tests/test_movement.py
+import pytest
+
+from game import movement
+from game.movement import MoveLimiter, parse_step
+
+
+@pytest.mark.parametrize('data, step', [
+    ({'dir': 'up'}, (0, -1)),
+    ({'dir': 'right'}, (1, 0)),
+    ({'dx': 0, 'dy': 1}, (0, 1)),
+    ({'dx': -1, 'dy': 0}, (-1, 0)),
+])
+def test_single_steps_are_accepted(data, step):
+    assert parse_step(data) == step
+
+
+@pytest.mark.parametrize('data', [
+    None,
+    'up',
+    ['up'],
+    {},
+    {'dir': 'north'},
+    {'dir': ['up']},
+    {'dir': {'x': 1}},
+    {'dx': 1, 'dy': 1},
+    {'dx': 5, 'dy': 0},
+    {'dx': 0, 'dy': 0},
+    {'dx': 1.0, 'dy': 0},
+    {'dx': True, 'dy': 0},
+    {'dx': '1', 'dy': 0},
+])
+def test_malformed_moves_are_rejected(data):
+    assert parse_step(data) is None
+
+
+def test_moves_beyond_the_rate_are_dropped(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(movement.time, 'monotonic', lambda: now[0])
+    limiter = MoveLimiter(rate=10, burst=3)
+
+    assert [limiter.allow('ann') for _ in range(4)] == [True, True, True, False]
+    # other players (and their tabs) have their own budget
+    assert limiter.allow('bob')
+
+    # a quarter second buys two more moves at 10 per second
+    now[0] += 0.25
+    assert [limiter.allow('ann') for _ in range(3)] == [True, True, False]
+    assert limiter.metrics == {'allowed': 6, 'dropped': 2}
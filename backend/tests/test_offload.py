@@ -0,0 +1,35 @@
+# backend/tests/test_offload.py
+import threading
+
+import eventlet
+import pytest
+
+from offload import PoolSaturated, PoolTimeout, WorkerPool
+
+
+def wait_until(condition, seconds=2.0):
+    for _ in range(int(seconds / 0.01)):
+        if condition():
+            return True
+        eventlet.sleep(0.01)
+    return condition()
+
+
+@pytest.mark.parametrize('use_eventlet', [False, True], ids=['threads', 'eventlet'])
+def test_timed_out_call_keeps_its_slot_until_it_returns(monkeypatch, use_eventlet):
+    pool = WorkerPool(f'slow-{use_eventlet}', 1, 0, 0.05)
+    monkeypatch.setattr(pool, '_eventlet', lambda: use_eventlet)
+    release = threading.Event()
+
+    with pytest.raises(PoolTimeout):
+        pool.run(release.wait, 5)
+    # the call is still on its thread, so the only slot is still taken
+    assert pool.pending() == 1
+    with pytest.raises(PoolSaturated):
+        pool.run(lambda: 42)
+
+    release.set()
+    assert wait_until(lambda: pool.pending() == 0)
+    assert pool.run(lambda: 42) == 42
+    assert pool.metrics['timeouts'] == 1
+    assert pool.metrics['rejected'] == 1
@@ -0,0 +1,58 @@
+# backend/tests/test_persistence.py
+import pytest
+
+from game.grid import GridStore
+from game.persistence import WriteBehind
+
+
+class FakeCollection:
+    def __init__(self):
+        self.batches = []
+        self.fail = False
+
+    def bulk_write(self, ops, ordered=True):
+        if self.fail:
+            raise ConnectionError('mongo is down')
+        self.batches.append(ops)
+
+
+def chunk_ids(batches):
+    return sorted(op._filter['_id'] for batch in batches for op in batch)
+
+
+def make_write_behind(grid):
+    return WriteBehind(None, grid, grid.cols, grid.rows, FakeCollection(), FakeCollection(),
+                       chunk_size=grid.chunk_size)
+
+
+def test_dirty_chunks_are_written_once():
+    grid = GridStore(64, 32, chunk_size=32)
+    persistence = make_write_behind(grid)
+    grid.paint(1, 1, 'ann')
+    grid.paint(2, 1, 'ann')
+    grid.paint(40, 1, 'bob')
+
+    assert persistence.flush() == 2
+    assert chunk_ids(persistence.chunks_collection.batches) == ['main:0:0', 'main:1:0']
+    # nothing changed since
+    assert persistence.flush() == 0
+    assert len(persistence.chunks_collection.batches) == 1
+
+
+def test_failed_flush_is_retried():
+    grid = GridStore(64, 32, chunk_size=32)
+    persistence = make_write_behind(grid)
+    grid.paint(1, 1, 'ann')
+    persistence.record_game('ann', 1)
+    persistence.chunks_collection.fail = True
+
+    with pytest.raises(ConnectionError):
+        persistence.flush()
+    # kept for the next round
+    assert persistence.pending_stats('ann') == [1, 1, 1, 1]
+
+    persistence.chunks_collection.fail = False
+    assert persistence.flush() == 2
+    assert chunk_ids(persistence.chunks_collection.batches) == ['main:0:0']
+    assert len(persistence.stats_collection.batches) == 1
+    assert persistence.pending_stats('ann') is None
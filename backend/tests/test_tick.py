@@ -0,0 +1,65 @@
+# backend/tests/test_tick.py
+from game.tick import TickScheduler
+
+
+class RecordingSocketIO:
+    def __init__(self):
+        self.sent = []
+
+    def emit(self, event, data, to=None):
+        self.sent.append((event, to, data))
+
+
+def ticks(socketio):
+    return {to: data for event, to, data in socketio.sent if event == 'tick'}
+
+
+def test_one_tick_per_chunk_room_per_interval():
+    socketio = RecordingSocketIO()
+    ticker = TickScheduler(socketio, version_of=lambda: 7)
+    ticker.queue_move('main:0:0', {'username': 'ann', 'x': 1, 'y': 0})
+    ticker.queue_move('main:0:0', {'username': 'ann', 'x': 2, 'y': 0})
+    ticker.queue_paint('main:0:0', {'x': 1, 'y': 0, 'username': 'ann'})
+    ticker.queue_paint('main:0:0', {'x': 2, 'y': 0, 'username': 'ann'})
+    ticker.queue_paint('main:1:0', {'x': 40, 'y': 0, 'username': 'bob'})
+    ticker.queue_paint('main:1:0', {'x': 40, 'y': 0, 'username': 'cy'})
+    ticker.flush()
+
+    assert len(socketio.sent) == 2
+    assert ticks(socketio) == {
+        # only ann's latest position, every painted cell
+        'main:0:0': {'moves': [{'username': 'ann', 'x': 2, 'y': 0}],
+                     'paints': [{'x': 1, 'y': 0, 'username': 'ann'},
+                                {'x': 2, 'y': 0, 'username': 'ann'}],
+                     'version': 7},
+        # a repainted cell is sent once, as its latest owner
+        'main:1:0': {'moves': [], 'paints': [{'x': 40, 'y': 0, 'username': 'cy'}], 'version': 7},
+    }
+
+    # nothing queued since: nothing sent
+    ticker.flush()
+    assert len(socketio.sent) == 2
+
+
+def test_whole_room_gets_every_chunk_in_one_tick():
+    socketio = RecordingSocketIO()
+    ticker = TickScheduler(socketio, whole='main:all')
+    ticker.queue_paint('main:0:0', {'x': 1, 'y': 0, 'username': 'ann'})
+    ticker.queue_paint('main:1:0', {'x': 40, 'y': 0, 'username': 'bob'})
+    ticker.flush()
+
+    assert len(socketio.sent) == 3
+    assert [p['username'] for p in ticks(socketio)['main:all']['paints']] == ['ann', 'bob']
+
+
+def test_scores_are_pushed_at_most_once_per_interval():
+    socketio = RecordingSocketIO()
+    scores = {'ann': 3}
+    ticker = TickScheduler(socketio, score_of=scores.get, scores_interval=60)
+    ticker.score_changed('main', 'ann')
+    ticker.flush()
+    scores['ann'] = 4
+    ticker.score_changed('main', 'ann')
+    ticker.flush()
+
+    assert socketio.sent == [('scores', 'main', {'scores': {'ann': 3}})]
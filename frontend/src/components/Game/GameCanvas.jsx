@@ -29,10 +29,6 @@ function GameCanvas({ username }) {
   const dirRef          = useRef(null);
   const moveIntervalRef = useRef(null);
 
-  // keep the latest position in a ref so our interval always uses fresh coords
-  const positionRef = useRef(position);
-  useEffect(() => { positionRef.current = position }, [position]);
-
 
   const [isConnected, setIsConnected] = useState(false);
 
@@ -109,12 +105,15 @@ function GameCanvas({ username }) {
     };
   }, [username, isConnected]);
 
+  // live cell counts from the server (`scores` events): username → cells
+  const scoresRef = useRef({});
+  // grid version we hold (per server epoch) and our last socket id, so a
+  // reconnect can ask for only the cells that changed while we were gone
+  const gridSyncRef = useRef({ epoch: null, version: -1, sid: null });
+
   // helper function for leaderboard
-  function recomputeLeaderboard(gridMap) {
-    const counts = {};
-    Object.values(gridMap).forEach(({ username }) => {
-      counts[username] = (counts[username] || 0) + 1;
-    });
+  function recomputeLeaderboard(scores) {
+    const counts = { ...scores };
     // include disconnected players too if zero
     Object.keys(players).concat(username).forEach(u => {
       if (!(u in counts)) counts[u] = 0;
@@ -223,7 +222,35 @@ function GameCanvas({ username }) {
     const onConnect = () => {
       // console.log('✅ Connected to WebSocket server');
       setIsConnected(true);
-      socket.emit('join_game', { username, room: 'main' });
+      // ask for the compact binary grid data when we can inflate it, and
+      // then only for the chunks around our viewport
+      const binary = typeof DecompressionStream !== 'undefined';
+      const sync = gridSyncRef.current;
+      socket.emit('join_game', {
+        username,
+        room: 'main',
+        binary,
+        aoi: binary,
+        view: { cols: VIEW_COLS, rows: VIEW_ROWS },
+        resume: sync.epoch ? { epoch: sync.epoch, version: sync.version, sid: sync.sid } : undefined
+      });
+      sync.sid = socket.id;
+    };
+
+    // every grid payload says which version it brings us up to
+    const seenVersion = (version) => {
+      const sync = gridSyncRef.current;
+      if (typeof version === 'number' && version > sync.version) sync.version = version;
+    };
+
+    const onGridVersion = ({ epoch, version }) => {
+      const sync = gridSyncRef.current;
+      if (epoch !== sync.epoch) {
+        // a restarted server: our old version numbers mean nothing now
+        sync.epoch = epoch;
+        sync.version = -1;
+      }
+      seenVersion(version);
     };
 
     const onDisconnect = () => {
@@ -234,6 +261,10 @@ function GameCanvas({ username }) {
     const onConnectError = (error) => {
       // console.error('Connection error:', error);
       setIsConnected(false);
+      // refused by the server (still starting up): socket.io won't retry by itself
+      if (!socket.active) {
+        setTimeout(() => socket.connect(), 1000);
+      }
     };
 
     const onPlayerJoined = (data) => {
@@ -274,7 +305,6 @@ function GameCanvas({ username }) {
       // Paint their starting cell immediately
       setGrid(prev => {
         const g = { ...prev, [`${data.position.x},${data.position.y}`]: { username: data.username, color: data.color } };
-        recomputeLeaderboard(g);
         return g;
       });
 
@@ -426,7 +456,6 @@ function GameCanvas({ username }) {
       // Paint starting cell immediately
       setGrid(prev => {
         const g = { ...prev, [`${data.position.x},${data.position.y}`]: { username: username, color: data.color } };
-        recomputeLeaderboard(g);
         return g;
       });
 
@@ -441,7 +470,6 @@ function GameCanvas({ username }) {
         g[`${c.x},${c.y}`] = { username: c.username, color: c.color };
       });
       setGrid(g);
-      recomputeLeaderboard(g);
 
       // save the authoritative color map from the server
       if (user_colors) {
@@ -449,20 +477,151 @@ function GameCanvas({ username }) {
       }
     };
 
-    const onCellPainted = (c) => {
-      setGrid(prev => {
-        const g = {
-          ...prev,
-          [`${c.x},${c.y}`]: { username: c.username, color:c.color }
-        };
-        recomputeLeaderboard(g);
-        return g;
+    // grid updates are applied strictly in arrival order: a snapshot is
+    // inflated asynchronously, and ticks that arrive meanwhile must land
+    // on top of it instead of being overwritten by it
+    let gridUpdates = Promise.resolve();
+    const inOrder = (apply) => {
+      gridUpdates = gridUpdates.then(apply).catch(err => console.warn('grid update failed', err));
+    };
+
+    // binary grid data: deflated little-endian uint16 owner id per cell (row-major)
+    const inflateOwners = async (cells) => {
+      const stream = new Blob([cells]).stream().pipeThrough(new DecompressionStream('deflate'));
+      return new DataView(await new Response(stream).arrayBuffer());
+    };
+
+    const paletteMaps = (palette) => {
+      const byId = {};
+      const colors = {};
+      palette.forEach(p => {
+        byId[p.id] = { username: p.username, color: p.color };
+        colors[p.username] = p.color;
+      });
+      return { byId, colors };
+    };
+
+    const onGridSnapshot = ({ cols, cells, palette, version }) => {
+      // inflate right away, apply once everything received before it is
+      const inflated = inflateOwners(cells);
+      inOrder(async () => {
+        const view = await inflated;
+        const { byId, colors } = paletteMaps(palette);
+
+        const g = {};
+        for (let i = 0; i < view.byteLength / 2; i++) {
+          const owner = view.getUint16(i * 2, true);
+          if (byId[owner]) g[`${i % cols},${Math.floor(i / cols)}`] = byId[owner];
+        }
+        setGrid(g);
+        setServerColors(prev => ({ ...prev, ...colors }));
+        seenVersion(version);
+      });
+    };
+
+    // area-of-interest chunks that just scrolled into view: replace those cells
+    const onChunkState = ({ chunks }) => {
+      const inflated = Promise.all(
+        chunks.map(async c => ({ ...c, ...paletteMaps(c.palette), view: await inflateOwners(c.cells) }))
+      );
+      inOrder(async () => {
+        const decoded = await inflated;
+
+        setGrid(prev => {
+          const g = { ...prev };
+          decoded.forEach(({ x, y, cols, rows, byId, view }) => {
+            for (let i = 0; i < cols * rows; i++) {
+              const key = `${x + i % cols},${y + Math.floor(i / cols)}`;
+              const owner = view.getUint16(i * 2, true);
+              if (byId[owner]) g[key] = byId[owner];
+              else delete g[key];
+            }
+          });
+          return g;
+        });
+
+        setServerColors(prev => {
+          const out = { ...prev };
+          decoded.forEach(({ colors }) => Object.assign(out, colors));
+          return out;
+        });
       });
+    };
+
+    // live scores: a full map on join, then only the players whose score changed
+    const onScores = ({ scores, full }) => {
+      const merged = { ...(full ? {} : scoresRef.current), ...scores };
+      Object.keys(merged).forEach(u => { if (!merged[u]) delete merged[u]; });
+      scoresRef.current = merged;
+      recomputeLeaderboard(merged);
+    };
+
+    const onCellPainted = (c) => {
+      inOrder(() => {
+        setGrid(prev => {
+          const g = {
+            ...prev,
+            [`${c.x},${c.y}`]: { username: c.username, color:c.color }
+          };
+          return g;
+        });
 
-      // palette update (in case someone's color changed on the server)
-      setServerColors(prev => ({ ...prev, [c.username]: c.color }));
+        // palette update (in case someone's color changed on the server)
+        setServerColors(prev => ({ ...prev, [c.username]: c.color }));
+      });
     }
 
+    // one batched server tick: latest position per player + cells painted since the last tick
+    const onTick = ({ moves, paints, version }) => {
+      moves.forEach(onPlayerMoved);
+      inOrder(() => {
+        applyPaints(paints);
+        seenVersion(version);
+      });
+    };
+
+    // our room shard is hosted by another game worker: reconnect with
+    // ?worker=, which nginx routes to it (once, in case it's misconfigured)
+    const onRoomRedirect = ({ room, worker }) => {
+      const query = socket.io.opts.query || {};
+      if (query.worker === worker) {
+        console.warn(`room ${room} is on worker ${worker}, but we were sent back`);
+        return;
+      }
+      socket.io.opts.query = { ...query, worker };
+      socket.disconnect().connect();
+    };
+
+    const onRoomFull = ({ room }) => {
+      console.warn(`room ${room} is full`);
+    };
+
+    // cells changed while we were reconnecting
+    const onGridDelta = ({ cells, version }) => {
+      inOrder(() => {
+        applyPaints(cells);
+        seenVersion(version);
+      });
+    };
+
+    const applyPaints = (paints) => {
+      if (paints.length) {
+        setGrid(prev => {
+          const g = { ...prev };
+          paints.forEach(c => {
+            g[`${c.x},${c.y}`] = { username: c.username, color: c.color };
+          });
+          return g;
+        });
+
+        setServerColors(prev => {
+          const out = { ...prev };
+          paints.forEach(c => { out[c.username] = c.color; });
+          return out;
+        });
+      }
+    };
+
     socket.on('connect', onConnect);
     socket.on('disconnect', onDisconnect);
     socket.on('connect_error', onConnectError);
@@ -472,7 +631,15 @@ function GameCanvas({ username }) {
     socket.on('game_state', onGameState);
     socket.on('player_data', onPlayerData);
     socket.on('grid_state', onGridState);
+    socket.on('grid_snapshot', onGridSnapshot);
+    socket.on('chunk_state', onChunkState);
+    socket.on('scores', onScores);
     socket.on('cell_painted', onCellPainted);
+    socket.on('tick', onTick);
+    socket.on('grid_version', onGridVersion);
+    socket.on('grid_delta', onGridDelta);
+    socket.on('room_redirect', onRoomRedirect);
+    socket.on('room_full', onRoomFull);
 
     return () => {
       socket.off('connect', onConnect);
@@ -484,7 +651,15 @@ function GameCanvas({ username }) {
       socket.off('game_state', onGameState);
       socket.off('player_data', onPlayerData);
       socket.off('grid_state', onGridState);
+      socket.off('grid_snapshot', onGridSnapshot);
+      socket.off('chunk_state', onChunkState);
+      socket.off('scores', onScores);
       socket.off('cell_painted', onCellPainted);
+      socket.off('tick', onTick);
+      socket.off('grid_version', onGridVersion);
+      socket.off('grid_delta', onGridDelta);
+      socket.off('room_redirect', onRoomRedirect);
+      socket.off('room_full', onRoomFull);
     };
   }, [socket, username]);
 
@@ -495,18 +670,15 @@ function GameCanvas({ username }) {
 
     const MOVE_RATE = 100;  // milliseconds between moves; tweak to taste
     const keyMap = {
-      ArrowUp:    { dx:  0, dy: -1 },
-      ArrowDown:  { dx:  0, dy:  1 },
-      ArrowLeft:  { dx: -1, dy:  0 },
-      ArrowRight: { dx:  1, dy:  0 }
-    };
-
-    // perform a move using the very latest position
-    const doMove = ({ dx, dy }) => {
-      const { x, y } = positionRef.current;
-      const nx = Math.max(0, Math.min(WORLD_COLS - 1, x + dx));
-      const ny = Math.max(0, Math.min(WORLD_ROWS - 1, y + dy));
-      socket.emit('move', { position: { x: nx, y: ny } });
+      ArrowUp:    { dx:  0, dy: -1, dir: 'up' },
+      ArrowDown:  { dx:  0, dy:  1, dir: 'down' },
+      ArrowLeft:  { dx: -1, dy:  0, dir: 'left' },
+      ArrowRight: { dx:  1, dy:  0, dir: 'right' }
+    };
+
+    // ask the server for one step; our new position comes back in a tick
+    const doMove = ({ dir }) => {
+      socket.emit('move', { dir });
     };
 
     // start or restart moving in this direction
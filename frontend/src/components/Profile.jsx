@@ -5,6 +5,8 @@ import getCroppedImg from '../utils/cropImage';
 
 export default function Profile({ username, backToGame }) {
   const [avatar, setAvatar] = useState(null);
+  // every stored size of it: { webp: { 32: url, ... }, png: { ... } }
+  const [avatars, setAvatars] = useState(null);
   const [file, setFile] = useState(null);
   const [msg, setMsg] = useState('');
   const [playerStats, setPlayerStats] = useState(null);
@@ -20,7 +22,7 @@ export default function Profile({ username, backToGame }) {
   // load existing avatar
   useEffect(() => {
     axios.get(`/api/auth/profile?username=${username}`, { withCredentials: true })
-      .then(r => setAvatar(r.data.avatar))
+      .then(r => { setAvatar(r.data.avatar); setAvatars(r.data.avatars); })
       .catch(() => {});
   }, [username]);
 
@@ -82,6 +84,7 @@ export default function Profile({ username, backToGame }) {
       // refresh preview
       const r = await axios.get(`/api/auth/profile?username=${username}`, { withCredentials: true });
       setAvatar(r.data.avatar);
+      setAvatars(r.data.avatars);
       setMsg("Uploaded!");
       setImageSrc(null);            // clear out the crop UI
     } catch {
@@ -115,16 +118,19 @@ export default function Profile({ username, backToGame }) {
         <div className="profile-section">
           <h3>Profile Picture</h3>
           {avatar
-            ? <img
-                src={avatar}
-                alt="Avatar"
-                style={{
-                  width:128,
-                  height:128,
-                  objectFit:'cover',
-                  // borderRadius:'50%'
-                }}
-              />
+            ? <picture>
+                {avatars && <source type="image/webp" srcSet={avatars.webp[128]} />}
+                <img
+                  src={avatars ? avatars.png[128] : avatar}
+                  alt="Avatar"
+                  style={{
+                    width:128,
+                    height:128,
+                    objectFit:'cover',
+                    // borderRadius:'50%'
+                  }}
+                />
+              </picture>
             : <p>No avatar yet</p>
           }
 